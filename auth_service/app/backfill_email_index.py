@@ -0,0 +1,30 @@
+from botocore.exceptions import ClientError
+from database import users_table, emails_table, normalize_email
+
+# One-off: reserve emails of users registered before the UserEmails table existed
+def backfill():
+    count = 0
+    kwargs = {"ProjectionExpression": "username, email"}
+    while True:
+        response = users_table.scan(**kwargs)
+        for user in response.get("Items", []):
+            if not user.get("email"):
+                continue
+            try:
+                emails_table.put_item(
+                    Item={"email": normalize_email(user["email"]), "username": user["username"]},
+                    ConditionExpression="attribute_not_exists(email) OR username = :username",
+                    ExpressionAttributeValues={":username": user["username"]}
+                )
+                count += 1
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                print(f"Duplicate email for '{user['username']}': {user['email']}")
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    print(f"Reserved {count} emails.")
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,20 @@
+from database import users_table, username_index_table, username_index_entries
+
+# One-off: index usernames registered before the search index existed
+def backfill():
+    count = 0
+    kwargs = {"ProjectionExpression": "username"}
+    with username_index_table.batch_writer(overwrite_by_pkeys=["prefix", "rank_key"]) as batch:
+        while True:
+            response = users_table.scan(**kwargs)
+            for user in response.get("Items", []):
+                for entry in username_index_entries(user["username"]):
+                    batch.put_item(Item=entry)
+                count += 1
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    print(f"Indexed {count} usernames.")
+
+if __name__ == "__main__":
+    backfill()
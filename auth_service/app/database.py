@@ -1,46 +1,40 @@
-import os
-import boto3
-from dotenv import load_dotenv
-from botocore.exceptions import ClientError
-
-load_dotenv()
-
-# Check AWS credentials
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_REGION")
-
-if not AWS_ACCESS_KEY or not AWS_SECRET_KEY:
-    raise RuntimeError("AWS_ACCESS_KEY_ID or AWS_SECRET_ACCESS_KEY environment variable is not set.")
-
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY
+from snapper_common.aws import lazy_client, lazy_table
+from snapper_common.storage import AsyncStorage, StorageTimeoutError
+from snapper_common.dynamo import TableSchema, SchemaBootstrap, serialize
+from snapper_common.users import users_table_name, users_schema, username_index_table_name, username_index_entries, username_index_schema
+
+table_name = users_table_name
+users_table = lazy_table(table_name)
+
+# Email reservations keyed by normalized email, written together with the user item
+emails_table_name = "UserEmails"
+emails_table = lazy_table(emails_table_name)
+
+def normalize_email(email: str):
+    return email.strip().lower()
+
+# Build a TransactWriteItems Put action from a plain item
+def transact_put(table: str, item: dict, condition: str = None):
+    put = {
+        "TableName": table,
+        "Item": serialize(item)
+    }
+    if condition:
+        put["ConditionExpression"] = condition
+    return {"Put": put}
+
+# Search index entries are written here at registration, user_service only reads them
+username_index_table = lazy_table(username_index_table_name)
+
+users_store = AsyncStorage(users_table)
+dynamodb_client_store = AsyncStorage(lazy_client("dynamodb"))
+
+# Tables owned by this service (Users shares its definition with user_service)
+emails_schema = TableSchema(
+    TableName=emails_table_name,
+    KeySchema=[{"AttributeName": "email", "KeyType": "HASH"}],
+    AttributeDefinitions=[{"AttributeName": "email", "AttributeType": "S"}]
 )
 
-table_name = "Users"
-users_table = dynamodb.Table(table_name)
-
-# Create users table if it doesn't exist
-def create_table():
-    try:
-        existing_tables = [table.name for table in dynamodb.tables.all()]
-        if table_name not in existing_tables:
-            table = dynamodb.create_table(
-                TableName=table_name,
-                KeySchema=[{"AttributeName": "username", "KeyType": "HASH"}],
-                AttributeDefinitions=[{"AttributeName": "username", "AttributeType": "S"}],
-                BillingMode="PAY_PER_REQUEST"
-            )
-            
-            print(f"Table '{table_name}' created.")
-            
-            table.wait_until_exists()
-            
-            print(f"Table '{table_name}' ready to use.")
-        else:
-            print(f"Table '{table_name}' already exists.")
-    except ClientError as e:
-        print(f"Create table error: {e}")
\ No newline at end of file
+SCHEMAS = (users_schema, emails_schema, username_index_schema)
+schema_bootstrap = SchemaBootstrap(*SCHEMAS)
@@ -1,9 +1,38 @@
 from routes import auth
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from database import StorageTimeoutError, schema_bootstrap
+from contextlib import asynccontextmanager
+from passwords import password_hasher, PasswordPoolBusy
+from tokens import cache_metrics
 
-app = FastAPI()
+# Start the bcrypt workers and table bootstrap on startup and stop them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    schema_bootstrap.start()
+    password_hasher.start()
+    yield
+    password_hasher.close()
+    await schema_bootstrap.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 
+# Storage calls that exceed STORAGE_TIMEOUT surface as 503 instead of hanging the request
+@app.exception_handler(StorageTimeoutError)
+async def storage_timeout_handler(request: Request, exc: StorageTimeoutError):
+    return JSONResponse(status_code=503, content={"detail": "Storage timeout"})
+
+# Saturated bcrypt pool: fail fast so clients back off instead of queueing
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(status_code=503, content={"detail": "Authentication busy, retry shortly"}, headers={"Retry-After": "1"})
+
+# Password pool and verify cache counters
+@app.get("/metrics")
+async def get_metrics():
+    return {"passwords": password_hasher.metrics(), "verify_cache": cache_metrics()}
+
 @app.get("/")
 def root():
     return {"message": "Auth Service Running"}
\ No newline at end of file
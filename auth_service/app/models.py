@@ -1,3 +1,4 @@
+from typing import List
 from pydantic import BaseModel, EmailStr
 
 class User(BaseModel):
@@ -11,4 +12,7 @@ class LoginRequest(BaseModel):
 
 class TokenResponse(BaseModel):
     access_token: str
-    token_type: str
\ No newline at end of file
+    token_type: str
+
+class VerifyBatchRequest(BaseModel):
+    tokens: List[str]
\ No newline at end of file
@@ -0,0 +1,110 @@
+import os
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# bcrypt runs in its own process pool so a login burst never starves the event loop or the
+# threadpool. Beyond PASSWORD_MAX_PENDING queued hashes new requests are rejected right away.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(PASSWORD_WORKERS * 4)))
+PASSWORD_TIMEOUT = float(os.getenv("PASSWORD_TIMEOUT", "10"))
+
+class PasswordPoolBusy(Exception):
+    pass
+
+_contexts = {}
+
+# Worker side: one CryptContext per process and cost
+def _get_context(rounds: int):
+    if rounds not in _contexts:
+        from passlib.context import CryptContext
+        _contexts[rounds] = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    return _contexts[rounds]
+
+def _hash(password: str, rounds: int):
+    return _get_context(rounds).hash(password)
+
+# Cost factor of a bcrypt hash ($2b$<rounds>$...), None if it can't be read
+def hash_rounds(hashed: str):
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+# Returns (valid, new_hash), new_hash is set when the stored hash uses another cost
+def _verify(password: str, hashed: str, rounds: int):
+    context = _get_context(rounds)
+    if not context.verify(password, hashed):
+        return False, None
+    if hash_rounds(hashed) != rounds:
+        return True, context.hash(password)
+    return True, None
+
+class PasswordHasher:
+    def __init__(self):
+        self._pool = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+
+    def start(self):
+        if self._pool is None:
+            # Spawned workers don't inherit the server's event loop, sockets and AWS clients
+            self._pool = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # A hash counts as pending until its worker finishes, not until the caller stops
+    # waiting, so timed out requests can't let the queue grow past PASSWORD_MAX_PENDING.
+    # Runs on the pool's management thread.
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    async def _run(self, fn, *args):
+        if self._pending >= PASSWORD_MAX_PENDING:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        self.start()
+        with self._lock:
+            self._pending += 1
+        try:
+            pool_future = self._pool.submit(fn, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        pool_future.add_done_callback(self._done)
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(pool_future), PASSWORD_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise PasswordPoolBusy()
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str):
+        return await self._run(_hash, password, BCRYPT_ROUNDS)
+
+    async def verify(self, password: str, hashed: str):
+        return await self._run(_verify, password, hashed, BCRYPT_ROUNDS)
+
+    def metrics(self):
+        return {
+            "workers": PASSWORD_WORKERS,
+            "pending": self._pending,
+            "max_pending": PASSWORD_MAX_PENDING,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "rounds": BCRYPT_ROUNDS
+        }
+
+password_hasher = PasswordHasher()
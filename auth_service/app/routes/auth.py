@@ -1,103 +1,151 @@
-import os
-import jwt
 import uuid
-import datetime
+import asyncio
 from dotenv import load_dotenv
-from database import users_table
-from passlib.context import CryptContext
-from boto3.dynamodb.conditions import Key, Attr
-from models import User, LoginRequest, TokenResponse
-from fastapi import APIRouter, HTTPException, Request
+from botocore.exceptions import ClientError
+from database import (
+    table_name, users_store, dynamodb_client_store, emails_table_name,
+    username_index_table_name, username_index_entries, normalize_email, transact_put
+)
+from passwords import password_hasher
+from tokens import create_jwt_token, verify, revoke, TokenRejected, VERIFY_BATCH_MAX
+from models import User, LoginRequest, TokenResponse, VerifyBatchRequest
+from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
 
 load_dotenv()
 
-# .env variables
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
-JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
-
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-# Hash the password
-def hash_password(password: str):
-    return pwd_context.hash(password)
 
-# Verify the password
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Hash the password (bcrypt process pool)
+async def hash_password(password: str):
+    return await password_hasher.hash(password)
 
-# Create JWT token
-def create_jwt_token(username: str):
-    expiration = datetime.datetime.utcnow() + datetime.timedelta(hours=2)
-    token_data = {"sub": username, "exp": expiration}
-    return jwt.encode(token_data, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+# Verify the password, returns (valid, new_hash) where new_hash replaces a hash of another cost
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-# Decode JWT token
-def decode_jwt_token(token: str):
+# Store a rehashed password unless it changed in the meantime
+async def update_password_hash(username: str, old_hash: str, new_hash: str):
     try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload.get("sub")
-    except jwt.ExpiredSignatureError:
-        return None
+        await users_store.update_item(
+            Key={"username": username},
+            UpdateExpression="SET password = :new",
+            ConditionExpression="password = :old",
+            ExpressionAttributeValues={":new": new_hash, ":old": old_hash}
+        )
+    except ClientError as e:
+        print(f"Password rehash skipped for {username}: {e}")
 
-# Register new user
+# Register new user. The user item, the email reservation and the search index
+# entries are written in one transaction, conditional writes enforce uniqueness.
 @router.post("/register")
-def register(user: User):
-    user_id = str(uuid.uuid4())
-    response = users_table.query(
-        KeyConditionExpression=Key("username").eq(user.username)
-    )
-    
-    if response.get("Items"):
+async def register(user: User):
+    # Taken usernames are turned away before paying for a bcrypt hash,
+    # the conditional put below still catches concurrent registrations
+    existing = await users_store.get_item(Key={"username": user.username}, ProjectionExpression="username")
+    if "Item" in existing:
         raise HTTPException(status_code=400, detail="Username already exists.")
     
-    email_response = users_table.scan(
-        FilterExpression=Attr("email").eq(user.email),
-        ProjectionExpression="email"
-    )
-    
-    if email_response.get("Items"):
-        raise HTTPException(status_code=400, detail="Email already in use.")
+    user_id = str(uuid.uuid4())
+    email = normalize_email(user.email)
+    actions = [
+        transact_put(
+            table_name,
+            {
+                "user_id": user_id,
+                "username": user.username,
+                "email": user.email,
+                "password": await hash_password(user.password)
+            },
+            condition="attribute_not_exists(username)"
+        ),
+        transact_put(
+            emails_table_name,
+            {"email": email, "username": user.username},
+            condition="attribute_not_exists(email)"
+        ),
+    ]
+    # Make the new user searchable
+    actions.extend(transact_put(username_index_table_name, entry) for entry in username_index_entries(user.username))
     
-    users_table.put_item(Item={
-        "user_id": user_id,
-        "username": user.username,
-        "email": user.email,
-        "password": hash_password(user.password)
-    })
+    try:
+        await dynamodb_client_store.transact_write_items(TransactItems=actions)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "TransactionCanceledException":
+            raise
+        reasons = [r.get("Code") for r in e.response.get("CancellationReasons", [])]
+        if reasons and reasons[0] == "ConditionalCheckFailed":
+            raise HTTPException(status_code=400, detail="Username already exists.")
+        if len(reasons) > 1 and reasons[1] == "ConditionalCheckFailed":
+            raise HTTPException(status_code=400, detail="Email already in use.")
+        raise HTTPException(status_code=409, detail="Registration conflict, please retry.")
     
     return {"message": "User successfully registered!", "user_id": user_id}
 
-# Login and token generation
+# Login and token generation, hashes stored with another cost are upgraded after the response
 @router.post("/login", response_model=TokenResponse)
-def login(login_data: LoginRequest):
-    response = users_table.query(
-        KeyConditionExpression=Key("username").eq(login_data.username)
+async def login(login_data: LoginRequest, background_tasks: BackgroundTasks):
+    response = await users_store.get_item(
+        Key={"username": login_data.username},
+        ProjectionExpression="username, password, token_epoch"
     )
     
-    items = response.get("Items", [])
-    if not items or not verify_password(login_data.password, items[0]["password"]):
+    user = response.get("Item")
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    valid, new_hash = await verify_password(login_data.password, user["password"])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_jwt_token(items[0]["username"])
+    if new_hash:
+        background_tasks.add_task(update_password_hash, user["username"], user["password"], new_hash)
+    
+    token = create_jwt_token(user["username"], user.get("token_epoch", 0))
     
     return {"access_token": token, "token_type": "bearer"}
 
-# Token verification
-@router.get("/verify")
-def verify_token(request: Request):
+# Read the bearer token from the Authorization header
+def get_bearer_token(request: Request):
     token = request.headers.get("Authorization")
     if not token or not token.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Token not found")
+    return token.split("Bearer ")[1]
+
+# Token verification (cached by token hash, revocation checked through the user's token epoch)
+@router.get("/verify")
+async def verify_token(request: Request):
+    try:
+        return await verify(get_bearer_token(request))
+    except TokenRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+# Verify several tokens in one call, results are in request order
+@router.post("/verify/batch")
+async def verify_tokens(data: VerifyBatchRequest):
+    if len(data.tokens) > VERIFY_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {VERIFY_BATCH_MAX} tokens per request")
     
-    token = token.split("Bearer ")[1]
-    username = decode_jwt_token(token)
-    if not username:
-        raise HTTPException(status_code=401, detail="Invalid token")
+    async def check(token: str):
+        try:
+            return {"valid": True, **(await verify(token))}
+        except TokenRejected as e:
+            return {"valid": False, "detail": e.detail}
     
-    response = users_table.get_item(Key={"username": username})
-    user = response.get("Item")
-    if not user:
+    return {"results": await asyncio.gather(*(check(token) for token in data.tokens))}
+
+# Revoke every token issued to the current user so far (log out everywhere)
+@router.post("/revoke")
+async def revoke_tokens(request: Request):
+    try:
+        user = await verify(get_bearer_token(request))
+    except TokenRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    try:
+        epoch = await revoke(user["username"])
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
         raise HTTPException(status_code=404, detail="User not found")
     
-    return {"username": username, "email": user["email"]}
\ No newline at end of file
+    return {"message": "Tokens revoked", "token_epoch": epoch}
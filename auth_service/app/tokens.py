@@ -0,0 +1,156 @@
+import os
+import time
+import jwt
+import hashlib
+from collections import OrderedDict
+from dotenv import load_dotenv
+from database import users_store
+
+load_dotenv()
+
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
+
+# Verified tokens are cached by hash until their exp, rejected ones for a short while.
+# A user's token_epoch is re-read at most every AUTH_EPOCH_CACHE_TTL seconds, so a revocation
+# takes effect on this replica right away and on the other auth replicas within that interval.
+# Services verifying locally (snapper_common.security) also re-read it after AUTH_EPOCH_CACHE_TTL,
+# so a revoked token stops working everywhere within that interval of the revocation.
+AUTH_VERIFY_CACHE_SIZE = int(os.getenv("AUTH_VERIFY_CACHE_SIZE", "100000"))
+AUTH_NEGATIVE_CACHE_SIZE = int(os.getenv("AUTH_NEGATIVE_CACHE_SIZE", "10000"))
+AUTH_NEGATIVE_CACHE_TTL = float(os.getenv("AUTH_NEGATIVE_CACHE_TTL", "60"))
+AUTH_EPOCH_CACHE_SIZE = int(os.getenv("AUTH_EPOCH_CACHE_SIZE", "100000"))
+AUTH_EPOCH_CACHE_TTL = float(os.getenv("AUTH_EPOCH_CACHE_TTL", "5"))
+VERIFY_BATCH_MAX = int(os.getenv("VERIFY_BATCH_MAX", "100"))
+
+class TokenRejected(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+# Bounded LRU where every entry carries its own expiry (unix time)
+class ExpiringLRU:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def get(self, key):
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= time.time():
+            self._items.pop(key, None)
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key, value, expires: float):
+        self._items[key] = (expires, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def pop(self, key):
+        self._items.pop(key, None)
+
+    def __len__(self):
+        return len(self._items)
+
+verified_tokens = ExpiringLRU(AUTH_VERIFY_CACHE_SIZE)
+rejected_tokens = ExpiringLRU(AUTH_NEGATIVE_CACHE_SIZE)
+user_states = ExpiringLRU(AUTH_EPOCH_CACHE_SIZE)
+
+class VerifyMetrics:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.revoked = 0
+
+metrics = VerifyMetrics()
+
+def token_hash(token: str):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def create_jwt_token(username: str, epoch: int = 0, hours: int = 2):
+    expiration = time.time() + hours * 3600
+    return jwt.encode({"sub": username, "exp": int(expiration), "epoch": int(epoch)}, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+# {"username", "email", "token_epoch"} of a user, None if the user doesn't exist
+async def load_user_state(username: str):
+    state = user_states.get(username)
+    if state is not None:
+        return state
+
+    response = await users_store.get_item(
+        Key={"username": username},
+        ProjectionExpression="username, email, token_epoch"
+    )
+    item = response.get("Item")
+    if not item:
+        return None
+    state = {"username": item["username"], "email": item.get("email"), "token_epoch": int(item.get("token_epoch", 0))}
+    user_states.set(username, state, time.time() + AUTH_EPOCH_CACHE_TTL)
+    return state
+
+def _reject(key: str, status_code: int, detail: str, until: float = None):
+    rejected_tokens.set(key, (status_code, detail), until or time.time() + AUTH_NEGATIVE_CACHE_TTL)
+    raise TokenRejected(status_code, detail)
+
+# Verify a token, returns {"username", "email"} or raises TokenRejected
+async def verify(token: str):
+    key = token_hash(token)
+    rejected = rejected_tokens.get(key)
+    if rejected is not None:
+        metrics.negative_hits += 1
+        raise TokenRejected(*rejected)
+
+    claims = verified_tokens.get(key)
+    if claims is not None:
+        metrics.hits += 1
+    else:
+        metrics.misses += 1
+        try:
+            payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM], options={"require": ["exp", "sub"]})
+        except jwt.InvalidTokenError:
+            _reject(key, 401, "Invalid token")
+        claims = {"username": payload["sub"], "epoch": int(payload.get("epoch", 0)), "exp": int(payload["exp"])}
+        verified_tokens.set(key, claims, claims["exp"])
+
+    state = await load_user_state(claims["username"])
+    if state is None:
+        verified_tokens.pop(key)
+        _reject(key, 404, "User not found")
+    if claims["epoch"] < state["token_epoch"]:
+        metrics.revoked += 1
+        verified_tokens.pop(key)
+        _reject(key, 401, "Token revoked", until=claims["exp"])
+
+    return {"username": state["username"], "email": state["email"]}
+
+# Invalidate every token issued to the user so far
+async def revoke(username: str):
+    result = await users_store.update_item(
+        Key={"username": username},
+        UpdateExpression="ADD token_epoch :one",
+        ConditionExpression="attribute_exists(username)",
+        ExpressionAttributeValues={":one": 1},
+        ReturnValues="ALL_NEW"
+    )
+    item = result["Attributes"]
+    state = {"username": item["username"], "email": item.get("email"), "token_epoch": int(item["token_epoch"])}
+    user_states.set(username, state, time.time() + AUTH_EPOCH_CACHE_TTL)
+    return state["token_epoch"]
+
+def cache_metrics():
+    return {
+        "hits": metrics.hits,
+        "misses": metrics.misses,
+        "negative_hits": metrics.negative_hits,
+        "revoked": metrics.revoked,
+        "verified_size": len(verified_tokens),
+        "rejected_size": len(rejected_tokens),
+        "user_state_size": len(user_states)
+    }
@@ -0,0 +1,22 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(TESTS_DIR)))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "app"))
+
+from snapper_common.testing import aws  # noqa: F401
+import pytest
+from fastapi.testclient import TestClient
+from snapper_common.dynamo import create_tables
+from database import SCHEMAS
+
+@pytest.fixture(autouse=True)
+def tables(aws):
+    create_tables(*SCHEMAS)
+
+@pytest.fixture
+def client():
+    from main import app
+    with TestClient(app) as client:
+        yield client
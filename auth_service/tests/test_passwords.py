@@ -0,0 +1,41 @@
+import time
+import asyncio
+import pytest
+import passwords
+from passwords import PasswordHasher, PasswordPoolBusy
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher()
+    yield hasher
+    hasher.close()
+
+def test_hash_and_verify(hasher):
+    async def scenario():
+        hashed = await hasher.hash("secret")
+        return await hasher.verify("secret", hashed), await hasher.verify("wrong", hashed)
+
+    assert asyncio.run(scenario()) == ((True, None), (False, None))
+    assert hasher.metrics()["pending"] == 0
+
+def test_timed_out_work_stays_pending_until_the_worker_finishes(hasher, monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_TIMEOUT", 0.2)
+    monkeypatch.setattr(passwords, "PASSWORD_MAX_PENDING", 1)
+    hasher.start()
+    # Worker start-up is not part of the measured wait
+    asyncio.run(hasher._run(time.sleep, 0))
+
+    async def scenario():
+        with pytest.raises(PasswordPoolBusy):
+            await hasher._run(time.sleep, 1.5)
+        # The worker is still busy with the abandoned call, admission control must see it
+        assert hasher.metrics()["pending"] == 1
+        with pytest.raises(PasswordPoolBusy):
+            await hasher._run(time.sleep, 0)
+        assert hasher.rejected == 1
+
+    asyncio.run(scenario())
+    deadline = time.monotonic() + 10
+    while hasher.metrics()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert hasher.metrics()["pending"] == 0
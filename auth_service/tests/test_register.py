@@ -0,0 +1,47 @@
+from boto3.dynamodb.conditions import Key
+from database import username_index_table, users_table
+from passwords import password_hasher
+from snapper_common.users import search_prefix
+
+def register(client, username, email=None, password="correct-horse"):
+    return client.post("/auth/register", json={
+        "username": username,
+        "email": email or f"{username}@example.com",
+        "password": password
+    })
+
+def test_register_indexes_username_prefixes(client):
+    response = register(client, "Alice")
+    assert response.status_code == 200
+
+    assert users_table.get_item(Key={"username": "Alice"})["Item"]["email"] == "Alice@example.com"
+    for query in ("a", "Al", "alice"):
+        items = username_index_table.query(KeyConditionExpression=Key("prefix").eq(search_prefix(query)))["Items"]
+        assert [item["username"] for item in items] == ["Alice"]
+
+def test_register_then_login(client):
+    assert register(client, "bob", password="s3cret-pass").status_code == 200
+
+    response = client.post("/auth/login", json={"username": "bob", "password": "s3cret-pass"})
+    assert response.status_code == 200
+    token = response.json()["access_token"]
+    assert client.get("/auth/verify", headers={"Authorization": f"Bearer {token}"}).json()["username"] == "bob"
+
+def test_taken_username_is_rejected_before_hashing(client, monkeypatch):
+    assert register(client, "carol").status_code == 200
+
+    async def fail_hash(password):
+        raise AssertionError("password hashed for a taken username")
+    monkeypatch.setattr(password_hasher, "hash", fail_hash)
+
+    response = register(client, "carol", email="other@example.com")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already exists."
+
+def test_taken_email_is_rejected(client):
+    assert register(client, "dave", email="Dave@Example.com").status_code == 200
+
+    response = register(client, "dave2", email="dave@example.com")
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already in use."
+    assert "Item" not in users_table.get_item(Key={"username": "dave2"})
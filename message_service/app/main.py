@@ -1,9 +1,27 @@
 from routes import message
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from database import StorageTimeoutError, schema_bootstrap
+from contextlib import asynccontextmanager
+from snapper_common.http_client import http_client
 
-app = FastAPI()
+# Open shared resources on startup and release them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    schema_bootstrap.start()
+    await http_client.start()
+    yield
+    await http_client.close()
+    await schema_bootstrap.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(message.router, prefix="/messages", tags=["Messages"])
 
+# Storage calls that exceed STORAGE_TIMEOUT surface as 503 instead of hanging the request
+@app.exception_handler(StorageTimeoutError)
+async def storage_timeout_handler(request: Request, exc: StorageTimeoutError):
+    return JSONResponse(status_code=503, content={"detail": "Storage timeout"})
+
 @app.get("/")
 def root():
     return {"message": "Message Service Running"}
\ No newline at end of file
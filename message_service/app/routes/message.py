@@ -1,26 +1,23 @@
+import json
+import time
 import uuid
-import os
+import base64
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Request
-from database import messages_table
+from boto3.dynamodb.conditions import Key, Attr
+from botocore.exceptions import ClientError
+from fastapi import APIRouter, Depends, HTTPException, Query
+from snapper_common.security import TokenVerifier
+from database import messages_store, users_store
+from snapper_common.inbox import inbox_store, inbox_last_activity_index, record_message
 from models import MessageCreate, MessageOut
-import aiohttp
 
 load_dotenv()
 
-# .env variables
-AUTH_PATH = os.getenv("AUTH_PATH")
-
 router = APIRouter()
 
-# Call auth service to verify user token 
-async def get_current_user(request: Request):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(AUTH_PATH, headers=request.headers) as resp:
-            if resp.status != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return await resp.json()
+# Verify user token locally (signature, exp and user existence)
+get_current_user = TokenVerifier(users_store)
 
 # Save the message to db
 @router.post("/", response_model=MessageOut)
@@ -43,18 +40,89 @@ async def create_message(data: MessageCreate, user: dict = Depends(get_current_u
         "content": data.content,
         "expires_at": expires_at
     }
-    messages_table.put_item(Item=item)
+    await messages_store.put_item(Item=item)
+    await record_message(item)
     
     return item
 
-# Get the conversation with the other user
+# Opaque pagination cursor wrapping a DynamoDB LastEvaluatedKey
+def encode_cursor(last_key: dict):
+    return base64.urlsafe_b64encode(json.dumps(last_key).encode()).decode()
+
+def decode_cursor(cursor: str, key_name: str, key_value: str):
+    try:
+        last_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(last_key, dict) or last_key.get(key_name) != key_value:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return last_key
+
+# List the user's conversations, most recent activity first, with one query per page.
+# Rows past their expires_at are hidden until the TTL sweep removes them.
+@router.get("/inbox")
+async def get_inbox(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    user: dict = Depends(get_current_user)
+):
+    username = user["username"]
+    kwargs = {
+        "IndexName": inbox_last_activity_index,
+        "KeyConditionExpression": Key("username").eq(username),
+        "FilterExpression": Attr("expires_at").gt(int(time.time())),
+        "ScanIndexForward": False,  # latest activity first
+        "Limit": limit
+    }
+    if cursor:
+        kwargs["ExclusiveStartKey"] = decode_cursor(cursor, "username", username)
+    
+    resp = await inbox_store.query(**kwargs)
+    next_cursor = encode_cursor(resp["LastEvaluatedKey"]) if "LastEvaluatedKey" in resp else None
+    
+    return {"conversations": resp.get("Items", []), "next_cursor": next_cursor}
+
+# Reset the unread counter of a conversation
+@router.post("/conversations/{other_user}/read")
+async def mark_conversation_read(other_user: str, user: dict = Depends(get_current_user)):
+    try:
+        await inbox_store.update_item(
+            Key={"username": user["username"], "other_user": other_user},
+            UpdateExpression="SET unread_count = :zero",
+            ConditionExpression="attribute_exists(username)",
+            ExpressionAttributeValues={":zero": 0}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    return {"other_user": other_user, "unread_count": 0}
+
+# Get the conversation with the other user.
+# Without since: newest -> oldest pages, follow next_cursor for older messages.
+# With since (a created_at the client already has): only newer messages, oldest -> newest.
 @router.get("/conversations/{other_user}")
-async def get_conversation(other_user: str, user: dict = Depends(get_current_user)):
+async def get_conversation(
+    other_user: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str = None,
+    since: str = None,
+    user: dict = Depends(get_current_user)
+):
     conversation_id = "#".join(sorted([user["username"], other_user]))
-    resp = messages_table.query(
-        KeyConditionExpression="conversation_id = :cid",
-        ExpressionAttributeValues={":cid": conversation_id},
-        ScanIndexForward=True  # oldest → newest
-    )
+    kwargs = {
+        "KeyConditionExpression": Key("conversation_id").eq(conversation_id),
+        "ScanIndexForward": False,  # newest → oldest
+        "Limit": limit
+    }
+    if since:
+        kwargs["KeyConditionExpression"] = Key("conversation_id").eq(conversation_id) & Key("created_at").gt(since)
+        kwargs["ScanIndexForward"] = True  # oldest → newest
+    if cursor:
+        kwargs["ExclusiveStartKey"] = decode_cursor(cursor, "conversation_id", conversation_id)
+    
+    resp = await messages_store.query(**kwargs)
+    next_cursor = encode_cursor(resp["LastEvaluatedKey"]) if "LastEvaluatedKey" in resp else None
     
-    return resp.get("Items", [])
+    return {"messages": resp.get("Items", []), "next_cursor": next_cursor}
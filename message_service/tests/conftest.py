@@ -0,0 +1,35 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(TESTS_DIR)))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "app"))
+
+from snapper_common.testing import aws  # noqa: F401
+import pytest
+from fastapi.testclient import TestClient
+from snapper_common.dynamo import create_tables
+from snapper_common.security import UserCache
+from snapper_common.users import users_schema
+from database import SCHEMAS, users_table
+from routes import message as message_routes
+
+# Users is created by auth/user service in a deployment
+@pytest.fixture(autouse=True)
+def tables(aws):
+    create_tables(*SCHEMAS, users_schema)
+
+@pytest.fixture
+def client(monkeypatch):
+    from main import app
+    cache = message_routes.get_current_user.cache
+    monkeypatch.setattr(message_routes.get_current_user, "cache", UserCache(cache.max_size, cache.ttl))
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def add_user():
+    def add(*usernames: str, token_epoch: int = 0):
+        for username in usernames:
+            users_table.put_item(Item={"username": username, "email": f"{username}@example.com", "token_epoch": token_epoch})
+    return add
@@ -0,0 +1,22 @@
+import jwt
+from snapper_common.http_client import http_client
+from snapper_common.testing import auth_headers, make_token
+
+def test_tokens_are_verified_without_calling_auth_service(client, add_user, monkeypatch):
+    async def no_http(*args, **kwargs):
+        raise AssertionError("auth_service was called")
+    monkeypatch.setattr(http_client, "request", no_http)
+    add_user("alice")
+
+    assert client.get("/messages/inbox", headers=auth_headers("alice")).status_code == 200
+
+    forged = jwt.encode({"sub": "alice", "exp": 4102444800}, "other-secret", algorithm="HS256")
+    assert client.get("/messages/inbox", headers={"Authorization": f"Bearer {forged}"}).status_code == 401
+    assert client.get("/messages/inbox", headers=auth_headers("nobody")).status_code == 401
+    assert client.get("/messages/inbox").status_code == 401
+
+def test_revoked_tokens_are_rejected(client, add_user):
+    add_user("bob", token_epoch=2)
+
+    assert client.get("/messages/inbox", headers={"Authorization": f"Bearer {make_token('bob', epoch=1)}"}).status_code == 401
+    assert client.get("/messages/inbox", headers=auth_headers("bob", epoch=2)).status_code == 200
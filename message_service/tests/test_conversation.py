@@ -0,0 +1,45 @@
+from snapper_common.testing import auth_headers
+
+def send(client, sender, recipient, content):
+    response = client.post("/messages/", json={"to": recipient, "content": content}, headers=auth_headers(sender))
+    assert response.status_code == 200
+    return response.json()
+
+def read_pages(client, username, other_user, limit, **params):
+    contents, cursor = [], None
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/messages/conversations/{other_user}", params=query, headers=auth_headers(username))
+        assert response.status_code == 200
+        contents.extend(message["content"] for message in response.json()["messages"])
+        cursor = response.json()["next_cursor"]
+        if not cursor:
+            return contents
+
+def test_conversation_pages_newest_first(client, add_user):
+    add_user("alice", "bob")
+    for i in range(7):
+        send(client, "alice" if i % 2 else "bob", "bob" if i % 2 else "alice", f"m{i}")
+
+    expected = [f"m{i}" for i in reversed(range(7))]
+    for limit in (1, 3, 50):
+        assert read_pages(client, "alice", "bob", limit) == expected
+    assert read_pages(client, "bob", "alice", 2) == expected
+
+def test_since_returns_only_newer_messages_oldest_first(client, add_user):
+    add_user("alice", "bob")
+    sent = [send(client, "alice", "bob", f"m{i}") for i in range(5)]
+
+    assert read_pages(client, "bob", "alice", 2, since=sent[1]["created_at"]) == ["m2", "m3", "m4"]
+    assert read_pages(client, "bob", "alice", 2, since=sent[4]["created_at"]) == []
+
+def test_cursor_from_another_conversation_is_rejected(client, add_user):
+    add_user("alice", "bob", "carol")
+    for i in range(3):
+        send(client, "alice", "bob", f"m{i}")
+    cursor = client.get("/messages/conversations/bob", params={"limit": 1}, headers=auth_headers("alice")).json()["next_cursor"]
+
+    stolen = client.get("/messages/conversations/alice", params={"cursor": cursor}, headers=auth_headers("carol"))
+    assert stolen.status_code == 400
+    garbage = client.get("/messages/conversations/bob", params={"cursor": "not-a-cursor"}, headers=auth_headers("alice"))
+    assert garbage.status_code == 400
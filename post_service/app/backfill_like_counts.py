@@ -0,0 +1,23 @@
+from database import posts_table
+
+# One-off: set like_count from the likes set on posts created before the counter existed
+def backfill():
+    updated = 0
+    kwargs = {"FilterExpression": "attribute_not_exists(like_count)"}
+    while True:
+        response = posts_table.scan(**kwargs)
+        for post in response.get("Items", []):
+            posts_table.update_item(
+                Key={"post_id": post["post_id"]},
+                UpdateExpression="SET like_count = :count",
+                ConditionExpression="attribute_exists(post_id) AND attribute_not_exists(like_count)",
+                ExpressionAttributeValues={":count": len(post.get("likes", set()))}
+            )
+            updated += 1
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    print(f"Backfilled like_count on {updated} posts.")
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,52 @@
+import time
+from boto3.dynamodb.conditions import Key
+from database import dynamodb, posts_table
+from timeline import timeline_entries, _batch_put, FANOUT_FOLLOWER_THRESHOLD, PULL_PARTITION
+
+follows_table = dynamodb.Table("Follows")
+
+# Followers from the user_service follow graph
+def load_followers(username: str):
+    followers = []
+    kwargs = {"KeyConditionExpression": Key("username").eq(username) & Key("edge").begins_with("follower#")}
+    while True:
+        response = follows_table.query(**kwargs)
+        followers.extend(item["other_user"] for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            return followers
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# One-off: push posts created before fan-out on write existed into follower timelines.
+# Safe to re-run, it also adds the pinned references of posts pinned before they existed.
+def backfill():
+    now = int(time.time())
+    followers_cache = {}
+    entries = []
+    pull_authors = set()
+    kwargs = {}
+    while True:
+        response = posts_table.scan(**kwargs)
+        for post in response.get("Items", []):
+            if int(post.get("expires_at", now + 1)) <= now:
+                continue
+
+            author = post["username"]
+            if author not in followers_cache:
+                followers_cache[author] = load_followers(author)
+            followers = followers_cache[author]
+
+            if len(followers) > FANOUT_FOLLOWER_THRESHOLD:
+                pull_authors.add(author)
+                followers = []
+            entries.extend(entry for username in followers + [author] for entry in timeline_entries(username, post))
+
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    entries.extend({"username": PULL_PARTITION, "sort_key": author} for author in pull_authors)
+    _batch_put(entries)
+    print(f"Backfilled {len(entries)} timeline entries.")
+
+if __name__ == "__main__":
+    backfill()
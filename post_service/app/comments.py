@@ -0,0 +1,166 @@
+import os
+import json
+import uuid
+import base64
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Key
+from database import comments_table, comments_store, posts_store, run_storage, StorageTimeoutError
+
+load_dotenv()
+
+# How many of the latest comments stay denormalized on the post item
+RECENT_COMMENTS = int(os.getenv("RECENT_COMMENTS", "3"))
+RECENT_COMMENTS_RETRIES = 3
+
+def comment_sort_key(comment: dict):
+    return f"{comment['created_at']}#{comment['comment_id']}"
+
+# Comment row, expires with the post it belongs to
+def comment_item(post: dict, comment: dict):
+    item = {
+        "post_id": post["post_id"],
+        "comment_id": str(uuid.uuid4()),
+        "username": comment["username"],
+        "comment": comment["comment"],
+        "created_at": comment["created_at"],
+        "expires_at": int(post["expires_at"])
+    }
+    item["sort_key"] = comment_sort_key(item)
+    return item
+
+# What the post keeps of a comment
+def comment_summary(item: dict):
+    return {key: item[key] for key in ("comment_id", "username", "comment", "created_at")}
+
+def _is_conditional_failure(error: ClientError):
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+# Bump comment_count and roll recent_comments forward. recent_comments is replaced with an
+# optimistic check on its previous value, under heavy contention only the count is updated.
+# Returns the new post attributes, None if the post is gone.
+async def add_comment(post: dict, item: dict):
+    recent = post.get("recent_comments")
+    for _ in range(RECENT_COMMENTS_RETRIES):
+        values = {
+            ":recent": ((recent or []) + [comment_summary(item)])[-RECENT_COMMENTS:],
+            ":one": 1
+        }
+        if recent is None:
+            condition = "attribute_exists(post_id) AND attribute_not_exists(recent_comments)"
+        else:
+            condition = "attribute_exists(post_id) AND recent_comments = :previous"
+            values[":previous"] = recent
+        try:
+            result = await posts_store.update_item(
+                Key={"post_id": post["post_id"]},
+                UpdateExpression="SET recent_comments = :recent ADD comment_count :one",
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values,
+                ReturnValues="ALL_NEW"
+            )
+            return result["Attributes"]
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+        response = await posts_store.get_item(
+            Key={"post_id": post["post_id"]},
+            ProjectionExpression="post_id, recent_comments"
+        )
+        if "Item" not in response:
+            return None
+        recent = response["Item"].get("recent_comments")
+
+    try:
+        result = await posts_store.update_item(
+            Key={"post_id": post["post_id"]},
+            UpdateExpression="ADD comment_count :one",
+            ConditionExpression="attribute_exists(post_id)",
+            ExpressionAttributeValues={":one": 1},
+            ReturnValues="ALL_NEW"
+        )
+        return result["Attributes"]
+    except ClientError as e:
+        if not _is_conditional_failure(e):
+            raise
+        return None
+
+def encode_cursor(last_key: dict):
+    return base64.urlsafe_b64encode(json.dumps(last_key).encode()).decode()
+
+def decode_cursor(post_id: str, cursor: str):
+    try:
+        last_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+    # Exactly the table key with string values, anything else would reach DynamoDB as a bad ExclusiveStartKey
+    if not isinstance(last_key, dict) or set(last_key) != {"post_id", "sort_key"}:
+        raise ValueError("Invalid cursor")
+    if not all(isinstance(value, str) for value in last_key.values()) or last_key["post_id"] != post_id:
+        raise ValueError("Invalid cursor")
+    return last_key
+
+# One page of a post's comments, newest first
+async def list_comments(post_id: str, limit: int, cursor: str = None):
+    kwargs = {
+        "KeyConditionExpression": Key("post_id").eq(post_id),
+        "ScanIndexForward": False,
+        "Limit": limit
+    }
+    if cursor:
+        kwargs["ExclusiveStartKey"] = decode_cursor(post_id, cursor)
+    response = await comments_store.query(**kwargs)
+    comments = [comment_summary(item) for item in response.get("Items", [])]
+    next_cursor = encode_cursor(response["LastEvaluatedKey"]) if "LastEvaluatedKey" in response else None
+    return comments, next_cursor
+
+def _delete_comments(post_id: str):
+    kwargs = {
+        "KeyConditionExpression": Key("post_id").eq(post_id),
+        "ProjectionExpression": "post_id, sort_key"
+    }
+    with comments_table.batch_writer() as batch:
+        while True:
+            response = comments_table.query(**kwargs)
+            for key in response.get("Items", []):
+                batch.delete_item(Key=key)
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Background task of delete_post, leftovers would expire with the post anyway
+async def delete_post_comments(post: dict):
+    try:
+        await run_storage(_delete_comments, post["post_id"], timeout=60)
+    except (ClientError, StorageTimeoutError) as e:
+        print(f"Comment cleanup failed for post {post['post_id']}: {e}")
+
+def _update_comment_expiry(post_id: str, expires_at: int):
+    kwargs = {"KeyConditionExpression": Key("post_id").eq(post_id)}
+    with comments_table.batch_writer() as batch:
+        while True:
+            response = comments_table.query(**kwargs)
+            for item in response.get("Items", []):
+                batch.put_item(Item={**item, "expires_at": expires_at})
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# Background task after a pin/unpin so comments keep living as long as the post
+async def propagate_comment_expiry(post: dict):
+    if not post.get("comment_count"):
+        return
+    try:
+        await run_storage(_update_comment_expiry, post["post_id"], int(post["expires_at"]), timeout=60)
+    except (ClientError, StorageTimeoutError) as e:
+        print(f"Comment expiry update failed for post {post['post_id']}: {e}")
+
+# Post as returned to clients: comment count and latest comments instead of the legacy full list
+def compact_post(post: dict):
+    legacy = post.pop("comments", None)
+    if legacy is not None and "comment_count" not in post:
+        post["comment_count"] = len(legacy)
+        post["recent_comments"] = legacy[-RECENT_COMMENTS:]
+    post.setdefault("comment_count", 0)
+    post.setdefault("recent_comments", [])
+    return post
@@ -1,4 +1,5 @@
-from database import create_table
+from database import SCHEMAS
+from snapper_common.dynamo import create_tables
 
 if __name__ == "__main__":
-    create_table()
\ No newline at end of file
+    create_tables(*SCHEMAS)
\ No newline at end of file
@@ -1,101 +1,156 @@
-import os
-import boto3
-from dotenv import load_dotenv
-from botocore.exceptions import ClientError
-
-load_dotenv()
-
-# Check AWS credentials
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_REGION")
-S3_BUCKET = os.getenv("S3_BUCKET")
-
-if not AWS_ACCESS_KEY or not AWS_SECRET_KEY:
-    raise RuntimeError("AWS_ACCESS_KEY_ID or AWS_SECRET_ACCESS_KEY environment variable is not set.")
-
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY
+from snapper_common.aws import lazy_resource, lazy_client, lazy_table
+from snapper_common.s3 import S3_BUCKET, s3_client, object_url, object_key
+from snapper_common.storage import AsyncStorage, StorageTimeoutError, run_storage
+from snapper_common.dynamo import TableSchema, SchemaBootstrap, serialize, cancellation_reasons
+from snapper_common.single_flight import single_flight, single_flight_metrics
+
+# Shared boto3 resource, built on first use (see snapper_common.aws)
+dynamodb = lazy_resource("dynamodb")
+
+table_name = "Posts"
+posts_table = lazy_table(table_name)
+
+# Per-follower timeline of post references, filled on post creation (fan-out on write)
+timelines_table_name = "Timelines"
+timelines_table = lazy_table(timelines_table_name)
+
+# Comments per post ordered by time, they expire together with the post
+comments_table_name = "Comments"
+comments_table = lazy_table(comments_table_name)
+
+# Sharded like mode: one row per like and the count spread over several shard rows per post
+likes_table_name = "Likes"
+likes_table = lazy_table(likes_table_name)
+like_shards_table_name = "LikeShards"
+like_shards_table = lazy_table(like_shards_table_name)
+
+# Images of expiring posts bucketed by the hour they expire in, swept by the expiry reaper
+expiry_sweep_table_name = "PostExpirySweep"
+expiry_sweep_table = lazy_table(expiry_sweep_table_name)
+
+# Presigned upload keys waiting for their post, consumed when the post is committed
+pending_uploads_table_name = "PendingUploads"
+pending_uploads_table = lazy_table(pending_uploads_table_name)
+
+# Users table is owned by user/auth service, read here only to verify tokens locally
+users_table = lazy_table("Users")
+
+dynamodb_store = AsyncStorage(dynamodb)
+dynamodb_client_store = AsyncStorage(lazy_client("dynamodb"))
+posts_store = AsyncStorage(posts_table)
+timelines_store = AsyncStorage(timelines_table)
+expiry_sweep_store = AsyncStorage(expiry_sweep_table)
+comments_store = AsyncStorage(comments_table)
+likes_store = AsyncStorage(likes_table)
+like_shards_store = AsyncStorage(like_shards_table)
+pending_uploads_store = AsyncStorage(pending_uploads_table)
+users_store = AsyncStorage(users_table)
+s3_store = AsyncStorage(s3_client)
+
+# Full Posts item, None if the post doesn't exist
+@single_flight()
+async def get_post_item(post_id: str):
+    response = await posts_store.get_item(Key={"post_id": post_id})
+    return response.get("Item")
+
+# Tables owned by this service
+posts_schema = TableSchema(
+    TableName=table_name,
+    KeySchema=[
+        {"AttributeName": "post_id", "KeyType": "HASH"},
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "post_id", "AttributeType": "S"},
+        {"AttributeName": "username", "AttributeType": "S"},
+        {"AttributeName": "created_at", "AttributeType": "S"},
+    ],
+    GlobalSecondaryIndexes=[
+        {
+            "IndexName": "username-created_at-index",
+            "KeySchema": [
+                {"AttributeName": "username", "KeyType": "HASH"},
+                {"AttributeName": "created_at", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "ALL"}
+        }
+    ],
+    ttl_attribute="expires_at"
 )
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=AWS_REGION,
+timelines_schema = TableSchema(
+    TableName=timelines_table_name,
+    KeySchema=[
+        {"AttributeName": "username", "KeyType": "HASH"},
+        {"AttributeName": "sort_key", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "username", "AttributeType": "S"},
+        {"AttributeName": "sort_key", "AttributeType": "S"},
+    ],
+    ttl_attribute="expires_at"
 )
 
-table_name = "Posts"
-posts_table = dynamodb.Table(table_name)
-
-# Enable TTL on the table
-def enable_ttl(table_name: str, ttl_attribute: str = "expires_at"):
-    client = boto3.client(
-        "dynamodb",
-        region_name=AWS_REGION,
-        aws_access_key_id=AWS_ACCESS_KEY,
-        aws_secret_access_key=AWS_SECRET_KEY
-    )
-    try:
-        desc = client.describe_time_to_live(TableName=table_name)
-        if desc["TimeToLiveDescription"]["TimeToLiveStatus"] == "ENABLED":
-            print(f"TTL already enabled on '{table_name}'.")
-            return
-    except ClientError as e:
-        print(f"TTL error: {e}")
-        
-    try:
-        client.update_time_to_live(
-            TableName=table_name,
-            TimeToLiveSpecification={
-                "Enabled": True,
-                "AttributeName": ttl_attribute
-            }
-        )
-        print(f"TTL enabled on '{table_name}' using attribute '{ttl_attribute}'.")
-    except ClientError as e:
-        print(f"Enable TTL error: {e}")
-
-# Create Posts table if it doesn't exist
-def create_table():
-    try:
-        existing_tables = [table.name for table in dynamodb.tables.all()]
-        if table_name not in existing_tables:
-            table = dynamodb.create_table(
-                TableName=table_name,
-                KeySchema=[
-                    {"AttributeName": "post_id", "KeyType": "HASH"},
-                ],
-                AttributeDefinitions=[
-                    {"AttributeName": "post_id", "AttributeType": "S"},
-                    {"AttributeName": "username", "AttributeType": "S"},
-                    {"AttributeName": "created_at", "AttributeType": "S"},
-                ],
-                GlobalSecondaryIndexes=[
-                    {
-                        "IndexName": "username-created_at-index",
-                        "KeySchema": [
-                            {"AttributeName": "username", "KeyType": "HASH"},
-                            {"AttributeName": "created_at", "KeyType": "RANGE"}
-                        ],
-                        "Projection": {"ProjectionType": "ALL"}
-                    }
-                ],
-                BillingMode="PAY_PER_REQUEST"
-            )
-            
-            print(f"Table '{table_name}' created.")
-            
-            table.wait_until_exists()
-            
-            print(f"Table '{table_name}' ready to use.")
-            
-            enable_ttl(table_name)
-        else:
-            print(f"Table '{table_name}' already exists.")
-            enable_ttl(table_name)
-    except ClientError as e:
-        print(f"Create table error: {e}")
\ No newline at end of file
+comments_schema = TableSchema(
+    TableName=comments_table_name,
+    KeySchema=[
+        {"AttributeName": "post_id", "KeyType": "HASH"},
+        {"AttributeName": "sort_key", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "post_id", "AttributeType": "S"},
+        {"AttributeName": "sort_key", "AttributeType": "S"},
+    ],
+    ttl_attribute="expires_at"
+)
+
+likes_schema = TableSchema(
+    TableName=likes_table_name,
+    KeySchema=[
+        {"AttributeName": "post_id", "KeyType": "HASH"},
+        {"AttributeName": "username", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "post_id", "AttributeType": "S"},
+        {"AttributeName": "username", "AttributeType": "S"},
+    ],
+    ttl_attribute="expires_at"
+)
+
+like_shards_schema = TableSchema(
+    TableName=like_shards_table_name,
+    KeySchema=[
+        {"AttributeName": "post_id", "KeyType": "HASH"},
+        {"AttributeName": "shard", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "post_id", "AttributeType": "S"},
+        {"AttributeName": "shard", "AttributeType": "N"},
+    ],
+    ttl_attribute="expires_at"
+)
+
+# Entries are removed by the reaper, no TTL
+expiry_sweep_schema = TableSchema(
+    TableName=expiry_sweep_table_name,
+    KeySchema=[
+        {"AttributeName": "bucket", "KeyType": "HASH"},
+        {"AttributeName": "post_id", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "bucket", "AttributeType": "S"},
+        {"AttributeName": "post_id", "AttributeType": "S"},
+    ]
+)
+
+pending_uploads_schema = TableSchema(
+    TableName=pending_uploads_table_name,
+    KeySchema=[{"AttributeName": "upload_key", "KeyType": "HASH"}],
+    AttributeDefinitions=[{"AttributeName": "upload_key", "AttributeType": "S"}],
+    ttl_attribute="expires_at"
+)
+
+SCHEMAS = (
+    posts_schema, timelines_schema, comments_schema, likes_schema, like_shards_schema,
+    expiry_sweep_schema, pending_uploads_schema
+)
+schema_bootstrap = SchemaBootstrap(*SCHEMAS)
@@ -0,0 +1,236 @@
+import os
+import hmac
+import json
+import math
+import time
+import heapq
+import base64
+import asyncio
+import hashlib
+from collections import deque
+from dotenv import load_dotenv
+from boto3.dynamodb.conditions import Key, Attr
+from database import dynamodb_store, posts_store, timelines_store, table_name
+
+load_dotenv()
+
+# Max parallel per-author queries and adaptive per-author page bounds
+FEED_CONCURRENCY = int(os.getenv("FEED_CONCURRENCY", "16"))
+FEED_MIN_PAGE = int(os.getenv("FEED_MIN_PAGE", "5"))
+FEED_MAX_PAGE = int(os.getenv("FEED_MAX_PAGE", "100"))
+
+# Feed cursors are signed so clients can't forge positions
+FEED_CURSOR_SECRET = os.getenv("FEED_CURSOR_SECRET") or os.getenv("JWT_SECRET_KEY") or ""
+
+def _b64encode(data: bytes):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _b64decode(data: str):
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(payload: bytes):
+    return hmac.new(FEED_CURSOR_SECRET.encode(), payload, hashlib.sha256).digest()[:16]
+
+# A feed is read in two phases: the pinned posts, then everything else
+PINNED = "pinned"
+REGULAR = "regular"
+
+# Opaque continuation cursor: the phase and the last merged (created_at, post_id) position
+# for this user. A regular cursor without a position starts at the newest post.
+def encode_cursor(username: str, phase: str, position):
+    data = {"u": username, "ph": phase}
+    if position:
+        data["c"], data["p"] = position
+    payload = json.dumps(data, separators=(",", ":")).encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload))}"
+
+# Returns (phase, position), cursors from before the pinned phase existed are regular
+def decode_cursor(username: str, cursor: str):
+    try:
+        payload_part, signature_part = cursor.split(".", 1)
+        payload = _b64decode(payload_part)
+        if not hmac.compare_digest(_sign(payload), _b64decode(signature_part)):
+            raise ValueError("Bad cursor signature")
+        data = json.loads(payload)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(data, dict) or data.get("u") != username:
+        raise ValueError("Invalid cursor")
+    phase = data.get("ph", REGULAR)
+    if phase not in (PINNED, REGULAR):
+        raise ValueError("Invalid cursor")
+    if "c" not in data and "p" not in data and phase == REGULAR:
+        return phase, None
+    if not isinstance(data.get("c"), str) or not isinstance(data.get("p"), str):
+        raise ValueError("Invalid cursor")
+    return phase, (data["c"], data["p"])
+
+# Newest-first items of one partition, fetched page by page, starting below an optional
+# (created_at, post_id) position. Reference streams (timelines) hold post_id pointers
+# that are resolved after merging.
+class QueryStream:
+    def __init__(self, store, key_condition, index_name: str = None, page_size: int = None, is_ref: bool = False, before=None, filter_expression=None):
+        self.store = store
+        self.key_condition = key_condition
+        self.index_name = index_name
+        self.filter_expression = filter_expression
+        self.page_size = page_size
+        self.is_ref = is_ref
+        self.before = tuple(before) if before else None
+        self.buffer = deque()
+        self.last_key = None
+        self.exhausted = False
+
+    async def fetch(self):
+        kwargs = {
+            "KeyConditionExpression": self.key_condition,
+            "ScanIndexForward": False,  # newest -> oldest
+            "Limit": self.page_size
+        }
+        if self.index_name:
+            kwargs["IndexName"] = self.index_name
+        if self.filter_expression is not None:
+            kwargs["FilterExpression"] = self.filter_expression
+        if self.last_key:
+            kwargs["ExclusiveStartKey"] = self.last_key
+
+        while True:
+            response = await self.store.query(**kwargs)
+            items = response.get("Items", [])
+            if self.before:
+                # Key condition is inclusive on created_at, skip what the previous page already returned
+                items = [item for item in items if (item.get("created_at", ""), item.get("post_id", "")) < self.before]
+            self.buffer.extend(items)
+            self.last_key = response.get("LastEvaluatedKey")
+            self.exhausted = self.last_key is None
+            # A stream that needs another page is active, ask for more next time
+            self.page_size = min(self.page_size * 2, FEED_MAX_PAGE)
+            if self.buffer or self.exhausted:
+                break
+            kwargs["ExclusiveStartKey"] = self.last_key
+            kwargs["Limit"] = self.page_size
+
+# Posts of one author from the username index (pull path)
+def author_stream(username: str, page_size: int = None, before=None, pinned_only: bool = False):
+    key_condition = Key("username").eq(username)
+    if before:
+        key_condition = key_condition & Key("created_at").lte(before[0])
+    return QueryStream(
+        posts_store,
+        key_condition,
+        index_name="username-created_at-index",
+        page_size=page_size,
+        before=before,
+        filter_expression=Attr("pinned").eq(True) if pinned_only else None
+    )
+
+# Post references pushed to a user's timeline (fan-out on write path)
+def timeline_stream(username: str, page_size: int = None, before=None):
+    key_condition = Key("username").eq(username)
+    if before:
+        # Sort keys are "created_at#post_id", "$" sorts right after "#"
+        key_condition = key_condition & Key("sort_key").lt(f"{before[0]}$")
+    return QueryStream(timelines_store, key_condition, page_size=page_size, is_ref=True, before=before)
+
+# Heap entry ordering posts newest first
+class _HeapEntry:
+    __slots__ = ("sort_key", "stream")
+
+    def __init__(self, post: dict, stream: QueryStream):
+        self.sort_key = (post.get("created_at", ""), post.get("post_id", ""))
+        self.stream = stream
+
+    def __lt__(self, other):
+        return self.sort_key > other.sort_key
+
+# Load full posts for timeline references with BatchGetItem (100 keys per call)
+async def load_posts(post_ids):
+    posts = {}
+    post_ids = list(dict.fromkeys(post_ids))
+    for i in range(0, len(post_ids), 100):
+        request = {table_name: {"Keys": [{"post_id": post_id} for post_id in post_ids[i:i + 100]]}}
+        while request:
+            response = await dynamodb_store.batch_get_item(RequestItems=request)
+            for item in response.get("Responses", {}).get(table_name, []):
+                posts[item["post_id"]] = item
+            request = response.get("UnprocessedKeys") or None
+    return posts
+
+# Resolve references and drop deleted, expired or no longer followed posts
+# (and pinned ones in the regular phase, they were served first)
+async def _resolve(candidates, allowed_authors, pinned):
+    ref_ids = [item["post_id"] for item, is_ref in candidates if is_ref]
+    loaded = await load_posts(ref_ids) if ref_ids else {}
+    now = int(time.time())
+
+    posts = []
+    for item, is_ref in candidates:
+        post = loaded.get(item["post_id"]) if is_ref else item
+        if not post:
+            continue
+        if int(post.get("expires_at", now + 1)) <= now:
+            continue
+        if allowed_authors is not None and post.get("username") not in allowed_authors:
+            continue
+        if pinned is not None and bool(post.get("pinned", False)) != pinned:
+            continue
+        posts.append(post)
+    return posts
+
+# Fetch streams concurrently and k-way merge them until the page is full.
+# pinned=True keeps only pinned posts, False only the others, None every post.
+# Returns the page and the last merged position, or None when nothing is left.
+async def build_feed(streams, limit: int, allowed_authors=None, pinned: bool = None):
+    if not streams or limit <= 0:
+        return [], None
+
+    page_size = min(max(FEED_MIN_PAGE, math.ceil(limit / len(streams))), limit, FEED_MAX_PAGE)
+    for stream in streams:
+        if stream.page_size is None:
+            stream.page_size = page_size
+    semaphore = asyncio.Semaphore(FEED_CONCURRENCY)
+
+    async def fill(stream: QueryStream):
+        async with semaphore:
+            await stream.fetch()
+
+    await asyncio.gather(*(fill(stream) for stream in streams))
+
+    heap = [_HeapEntry(stream.buffer[0], stream) for stream in streams if stream.buffer]
+    heapq.heapify(heap)
+
+    posts = []
+    seen = set()
+    stalled = []
+    position = None
+    while (heap or stalled) and len(posts) < limit:
+        # Streams drained at the end of the previous round are refilled only if more posts are needed
+        if stalled:
+            await asyncio.gather(*(fill(stream) for stream in stalled))
+            for stream in stalled:
+                if stream.buffer:
+                    heapq.heappush(heap, _HeapEntry(stream.buffer[0], stream))
+            stalled = []
+
+        candidates = []
+        while heap and len(posts) + len(candidates) < limit:
+            entry = heapq.heappop(heap)
+            stream = entry.stream
+            item = stream.buffer.popleft()
+            position = entry.sort_key
+            if item["post_id"] not in seen:
+                seen.add(item["post_id"])
+                candidates.append((item, stream.is_ref))
+
+            if not stream.buffer and not stream.exhausted:
+                if len(posts) + len(candidates) >= limit:
+                    stalled.append(stream)
+                    continue
+                await stream.fetch()
+            if stream.buffer:
+                heapq.heappush(heap, _HeapEntry(stream.buffer[0], stream))
+
+        posts.extend(await _resolve(candidates, allowed_authors, pinned))
+
+    has_more = bool(heap or stalled)
+    return posts, position if has_more else None
@@ -0,0 +1,26 @@
+import asyncio
+from botocore.exceptions import ClientError
+from database import posts_store, StorageTimeoutError, object_key
+from snapper_common.images import generate_variants, sized_url
+
+# Background task after a post is stored: variants for every image, in post_img_src order
+async def process_post_images(post: dict):
+    keys = [object_key(url) for url in post.get("post_img_src", [])]
+    if not keys:
+        return
+    try:
+        variants = await asyncio.gather(*(generate_variants(key) for key in keys))
+        await posts_store.update_item(
+            Key={"post_id": post["post_id"]},
+            UpdateExpression="SET post_img_variants = :variants",
+            ConditionExpression="attribute_exists(post_id)",
+            ExpressionAttributeValues={":variants": list(variants)}
+        )
+    except (ClientError, StorageTimeoutError, asyncio.TimeoutError, OSError) as e:
+        print(f"Image variants failed for post {post['post_id']}: {e}")
+
+# Image URLs of a post in the requested size class
+def post_images(post: dict, size: str):
+    urls = post.get("post_img_src", [])
+    variants = post.get("post_img_variants") or [None] * len(urls)
+    return [sized_url(url, variant, size) for url, variant in zip(urls, variants)]
@@ -0,0 +1,245 @@
+import os
+import time
+import random
+from datetime import datetime
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Key
+from database import (
+    posts_store, dynamodb_store, dynamodb_client_store, like_shards_store, likes_table, like_shards_table, run_storage,
+    table_name, likes_table_name, like_shards_table_name, serialize, cancellation_reasons, StorageTimeoutError
+)
+
+load_dotenv()
+
+# "item" keeps the likes set and like_count on the post item, "sharded" writes one row per
+# like and spreads the count over LIKE_SHARDS rows so a viral post is not a single hot key.
+# The mode is per deployment, posts are not migrated between modes.
+LIKE_COUNTER_MODE = os.getenv("LIKE_COUNTER_MODE", "item").lower()
+LIKE_SHARDS = int(os.getenv("LIKE_SHARDS", "8"))
+
+LIKE_TOGGLE_ATTEMPTS = 3
+
+# Regular posts expire a day after they are written, pinned ones later
+POST_LIFETIME = 86400
+
+# Concurrent toggles of the same like kept changing it under every attempt
+class LikeConflict(Exception):
+    pass
+
+def _is_conditional_failure(error: ClientError):
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+# Item mode: like only if not liked yet, one conditional write
+async def _like_item(post_id: str, username: str):
+    result = await posts_store.update_item(
+        Key={"post_id": post_id},
+        UpdateExpression="ADD likes :user, like_count :one",
+        ConditionExpression="attribute_exists(post_id) AND NOT contains(likes, :name)",
+        ExpressionAttributeValues={":user": {username}, ":name": username, ":one": 1},
+        ReturnValues="UPDATED_NEW"
+    )
+    return int(result["Attributes"]["like_count"])
+
+async def _unlike_item(post_id: str, username: str):
+    result = await posts_store.update_item(
+        Key={"post_id": post_id},
+        UpdateExpression="DELETE likes :user ADD like_count :minus",
+        ConditionExpression="contains(likes, :name)",
+        ExpressionAttributeValues={":user": {username}, ":name": username, ":minus": -1},
+        ReturnValues="UPDATED_NEW"
+    )
+    return int(result["Attributes"]["like_count"])
+
+def _shard_update(post_id: str, delta: int, expires_at: int):
+    return {"Update": {
+        "TableName": like_shards_table_name,
+        "Key": serialize({"post_id": post_id, "shard": random.randrange(LIKE_SHARDS)}),
+        "UpdateExpression": "ADD like_count :delta SET expires_at = :exp",
+        "ExpressionAttributeValues": serialize({":delta": delta, ":exp": expires_at})
+    }}
+
+# The post exists and expires no later than the rows written for it
+def _post_check(post_id: str, expires_at: int):
+    return {"ConditionCheck": {
+        "TableName": table_name,
+        "Key": serialize({"post_id": post_id}),
+        "ConditionExpression": "attribute_exists(post_id) AND expires_at <= :exp",
+        "ExpressionAttributeValues": serialize({":exp": expires_at})
+    }}
+
+# Sharded mode, one transaction per toggle.
+# Action order: [like row, count shard, post check]
+async def _like_sharded(post_id: str, username: str, expires_at: int):
+    await dynamodb_client_store.transact_write_items(TransactItems=[
+        {"Put": {
+            "TableName": likes_table_name,
+            "Item": serialize({
+                "post_id": post_id,
+                "username": username,
+                "created_at": datetime.utcnow().isoformat(),
+                "expires_at": expires_at
+            }),
+            "ConditionExpression": "attribute_not_exists(username)"
+        }},
+        _shard_update(post_id, 1, expires_at),
+        _post_check(post_id, expires_at)
+    ])
+
+async def _unlike_sharded(post_id: str, username: str, expires_at: int):
+    await dynamodb_client_store.transact_write_items(TransactItems=[
+        {"Delete": {
+            "TableName": likes_table_name,
+            "Key": serialize({"post_id": post_id, "username": username}),
+            "ConditionExpression": "attribute_exists(username)"
+        }},
+        _shard_update(post_id, -1, expires_at),
+        _post_check(post_id, expires_at)
+    ])
+
+async def _post_expiry(post_id: str):
+    response = await posts_store.get_item(Key={"post_id": post_id}, ProjectionExpression="post_id, expires_at")
+    if "Item" not in response:
+        return None
+    return int(response["Item"]["expires_at"])
+
+# Write first: ADD if the user isn't in the set, else the mirror DELETE, the count comes back
+# with the write. Both conditions failing means the post is gone or a concurrent toggle won.
+async def _toggle_item(post_id: str, username: str):
+    for _ in range(LIKE_TOGGLE_ATTEMPTS):
+        try:
+            return True, await _like_item(post_id, username)
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+        try:
+            return False, await _unlike_item(post_id, username)
+        except ClientError as e:
+            if not _is_conditional_failure(e):
+                raise
+        if await _post_expiry(post_id) is None:
+            return None
+    raise LikeConflict()
+
+# Same write-first toggle as a transaction: a failed like-row condition means already liked.
+# Rows are written with the expiry of a regular post, which is never earlier than the post's own;
+# only when the post check fails (post gone, or pinned until later) is the post read.
+async def _toggle_sharded(post_id: str, username: str):
+    expires_at = int(time.time()) + POST_LIFETIME
+    for _ in range(LIKE_TOGGLE_ATTEMPTS):
+        try:
+            await _like_sharded(post_id, username, expires_at)
+            return True, await sharded_like_count(post_id)
+        except ClientError as e:
+            reasons = cancellation_reasons(e)
+            if reasons is None:
+                raise
+        if reasons[2] != "ConditionalCheckFailed":
+            try:
+                await _unlike_sharded(post_id, username, expires_at)
+                return False, await sharded_like_count(post_id)
+            except ClientError as e:
+                reasons = cancellation_reasons(e)
+                if reasons is None:
+                    raise
+        if reasons[2] == "ConditionalCheckFailed":
+            expires_at = await _post_expiry(post_id)
+            if expires_at is None:
+                return None
+    raise LikeConflict()
+
+# Like or unlike, returns (liked, like_count) or None if the post doesn't exist.
+# Raises LikeConflict when every attempt lost to a concurrent toggle.
+async def toggle_like(post_id: str, username: str):
+    if LIKE_COUNTER_MODE == "sharded":
+        result = await _toggle_sharded(post_id, username)
+    else:
+        result = await _toggle_item(post_id, username)
+    if result is None:
+        return None
+    liked, count = result
+    return liked, max(count, 0)
+
+async def sharded_like_count(post_id: str):
+    response = await like_shards_store.query(KeyConditionExpression=Key("post_id").eq(post_id))
+    return sum(int(item.get("like_count", 0)) for item in response.get("Items", []))
+
+async def _batch_get(keys_by_table):
+    items = {name: [] for name in keys_by_table}
+    entries = [(name, key) for name, keys in keys_by_table.items() for key in keys]
+    for i in range(0, len(entries), 100):
+        request = {}
+        for name, key in entries[i:i + 100]:
+            request.setdefault(name, {"Keys": []})["Keys"].append(key)
+        while request:
+            response = await dynamodb_store.batch_get_item(RequestItems=request)
+            for name, found in response.get("Responses", {}).items():
+                items[name].extend(found)
+            request = response.get("UnprocessedKeys") or None
+    return items
+
+# Replace the likes set with like_count and whether the user liked the post
+async def load_like_state(posts, username: str):
+    if LIKE_COUNTER_MODE != "sharded":
+        for post in posts:
+            likes = post.pop("likes", None) or set()
+            post["liked"] = username in likes
+            post["like_count"] = max(int(post.get("like_count", len(likes))), 0)
+        return posts
+
+    post_ids = list(dict.fromkeys(post["post_id"] for post in posts))
+    found = await _batch_get({
+        like_shards_table_name: [{"post_id": post_id, "shard": shard} for post_id in post_ids for shard in range(LIKE_SHARDS)],
+        likes_table_name: [{"post_id": post_id, "username": username} for post_id in post_ids]
+    })
+    counts = {}
+    for shard in found[like_shards_table_name]:
+        counts[shard["post_id"]] = counts.get(shard["post_id"], 0) + int(shard.get("like_count", 0))
+    liked = {like["post_id"] for like in found[likes_table_name]}
+    for post in posts:
+        post.pop("likes", None)
+        post["liked"] = post["post_id"] in liked
+        post["like_count"] = max(counts.get(post["post_id"], 0), 0)
+    return posts
+
+# Like rows and count shards of a post, with the sort key attribute of each table
+SHARDED_TABLES = ((likes_table, "username"), (like_shards_table, "shard"))
+
+def _query_all(table, post_id: str):
+    kwargs = {"KeyConditionExpression": Key("post_id").eq(post_id)}
+    while True:
+        response = table.query(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+def _rewrite_expiry(post_id: str, expires_at: int):
+    for table, _ in SHARDED_TABLES:
+        with table.batch_writer() as batch:
+            for item in list(_query_all(table, post_id)):
+                batch.put_item(Item={**item, "expires_at": expires_at})
+
+def _delete_rows(post_id: str):
+    for table, sort_key in SHARDED_TABLES:
+        with table.batch_writer() as batch:
+            for item in list(_query_all(table, post_id)):
+                batch.delete_item(Key={"post_id": post_id, sort_key: item[sort_key]})
+
+# Background task after a pin/unpin, like rows and shards live as long as the post
+async def propagate_like_expiry(post: dict):
+    if LIKE_COUNTER_MODE != "sharded":
+        return
+    try:
+        await run_storage(_rewrite_expiry, post["post_id"], int(post["expires_at"]), timeout=60)
+    except (ClientError, StorageTimeoutError) as e:
+        print(f"Like expiry update failed for post {post['post_id']}: {e}")
+
+# Background task of delete_post, leftovers would expire with the post anyway
+async def delete_post_likes(post: dict):
+    if LIKE_COUNTER_MODE != "sharded":
+        return
+    try:
+        await run_storage(_delete_rows, post["post_id"], timeout=60)
+    except (ClientError, StorageTimeoutError) as e:
+        print(f"Like cleanup failed for post {post['post_id']}: {e}")
@@ -1,9 +1,40 @@
 from routes import post
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from database import StorageTimeoutError, single_flight_metrics, schema_bootstrap
+from contextlib import asynccontextmanager
+from snapper_common.http_client import http_client
+from snapper_common.images import close_image_pool
+from reaper import reaper
 
-app = FastAPI()
+# Open shared resources on startup and release them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    schema_bootstrap.start()
+    await http_client.start()
+    reaper.start()
+    yield
+    await reaper.close()
+    close_image_pool()
+    await http_client.close()
+    await schema_bootstrap.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(post.router, prefix="/posts", tags=["Posts"])
 
+# Storage calls that exceed STORAGE_TIMEOUT surface as 503 instead of hanging the request
+@app.exception_handler(StorageTimeoutError)
+async def storage_timeout_handler(request: Request, exc: StorageTimeoutError):
+    return JSONResponse(status_code=503, content={"detail": "Storage timeout"})
+
+# Read coalescing and expiry reaper counters
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "single_flight": single_flight_metrics(),
+        "reaper": {"reaped_posts": reaper.reaped_posts, "deleted_objects": reaper.deleted_objects}
+    }
+
 @app.get("/")
 async def root():
     return {"message": "Post Service Running"}
@@ -0,0 +1,46 @@
+import uuid
+from database import posts_table, comments_table
+from comments import comment_sort_key, comment_summary, RECENT_COMMENTS
+
+# Same id for the same legacy comment on every run, so a re-run after a crash between the
+# batch write and the REMOVE overwrites the rows it already wrote instead of duplicating them
+def legacy_comment_id(post_id: str, index: int):
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"snapper:posts/{post_id}/comments/{index}"))
+
+# One-off: move the legacy comments list of every post into the Comments table
+def migrate():
+    migrated = 0
+    kwargs = {"FilterExpression": "attribute_exists(comments)"}
+    while True:
+        response = posts_table.scan(**kwargs)
+        for post in response.get("Items", []):
+            summaries = []
+            with comments_table.batch_writer() as batch:
+                for index, comment in enumerate(post.get("comments", [])):
+                    item = {
+                        "post_id": post["post_id"],
+                        "comment_id": legacy_comment_id(post["post_id"], index),
+                        "username": comment.get("username"),
+                        "comment": comment.get("comment", ""),
+                        "created_at": comment.get("created_at", post["created_at"]),
+                        "expires_at": int(post["expires_at"])
+                    }
+                    item["sort_key"] = comment_sort_key(item)
+                    batch.put_item(Item=item)
+                    summaries.append(comment_summary(item))
+
+            posts_table.update_item(
+                Key={"post_id": post["post_id"]},
+                UpdateExpression="SET comment_count = :count, recent_comments = :recent REMOVE comments",
+                ConditionExpression="attribute_exists(post_id)",
+                ExpressionAttributeValues={":count": len(summaries), ":recent": summaries[-RECENT_COMMENTS:]}
+            )
+            migrated += 1
+
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    print(f"Migrated comments of {migrated} posts.")
+
+if __name__ == "__main__":
+    migrate()
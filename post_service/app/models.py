@@ -1,6 +1,6 @@
 import uuid
 import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel, Field
 
 class Post(BaseModel):
@@ -9,7 +9,9 @@ class Post(BaseModel):
     post_text: str
     post_img_src: List[str] = []
     likes: Optional[List[str]] = None
-    comments: List[dict] = []
+    like_count: int = 0
+    comment_count: int = 0
+    recent_comments: List[dict] = []
     created_at:str = Field(default_factory=lambda: datetime.datetime.utcnow().isoformat())
     pinned: bool = False
     expires_at: int = Field(
@@ -24,3 +26,16 @@ class Comment(BaseModel):
     username: Optional[str] = None 
     comment: str
     created_at:str = Field(default_factory=lambda: datetime.datetime.utcnow().isoformat())
+
+class UploadSpec(BaseModel):
+    content_type: str
+    size: int
+    
+class UploadRequest(BaseModel):
+    files: List[UploadSpec]
+    method: Literal["post", "put"] = "post"
+    
+class PostCommit(BaseModel):
+    post_text: str
+    pinned: bool = False
+    keys: List[str] = []
@@ -0,0 +1,57 @@
+import time
+from datetime import datetime, timezone
+from database import posts_table, expiry_sweep_table, s3_client, S3_BUCKET
+from reaper import expiry_bucket, post_image_keys, image_keys, S3_DELETE_BATCH
+
+# Uploads younger than this may still be waiting for a presigned commit
+MIN_ORPHAN_AGE = 86400
+
+# Live posts and the image keys they reference
+def load_posts():
+    kwargs = {}
+    while True:
+        response = posts_table.scan(**kwargs)
+        yield from response.get("Items", [])
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# One-off bulk sweep: register live posts created before the reaper existed, then delete
+# every object under posts/ that no post references (images of posts TTL already removed)
+def reap_orphans():
+    now = int(time.time())
+    referenced = set()
+    tracked = 0
+    with expiry_sweep_table.batch_writer(overwrite_by_pkeys=["bucket", "post_id"]) as batch:
+        for post in load_posts():
+            keys = post_image_keys(post)
+            referenced.update(image_keys(keys))
+            if keys and not post.get("pinned") and int(post["expires_at"]) > now:
+                batch.put_item(Item={
+                    "bucket": expiry_bucket(post["expires_at"]),
+                    "post_id": post["post_id"],
+                    "expires_at": int(post["expires_at"]),
+                    "image_keys": keys
+                })
+                tracked += 1
+
+    cutoff = datetime.now(timezone.utc).timestamp() - MIN_ORPHAN_AGE
+    orphans = []
+    deleted = 0
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=S3_BUCKET, Prefix="posts/"):
+        for obj in page.get("Contents", []):
+            if obj["Key"] not in referenced and obj["LastModified"].timestamp() < cutoff:
+                orphans.append({"Key": obj["Key"]})
+            if len(orphans) == S3_DELETE_BATCH:
+                s3_client.delete_objects(Bucket=S3_BUCKET, Delete={"Objects": orphans, "Quiet": True})
+                deleted += len(orphans)
+                orphans = []
+    if orphans:
+        s3_client.delete_objects(Bucket=S3_BUCKET, Delete={"Objects": orphans, "Quiet": True})
+        deleted += len(orphans)
+
+    print(f"Tracked {tracked} posts, deleted {deleted} orphaned objects.")
+
+if __name__ == "__main__":
+    reap_orphans()
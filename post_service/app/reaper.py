@@ -0,0 +1,197 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from dotenv import load_dotenv
+from botocore.exceptions import BotoCoreError, ClientError
+from boto3.dynamodb.conditions import Key, Attr
+from database import expiry_sweep_table, expiry_sweep_store, s3_store, run_storage, object_key, S3_BUCKET, StorageTimeoutError
+from snapper_common.images import variant_key, IMAGE_SIZES
+from feed import load_posts
+
+load_dotenv()
+
+# The reaper wakes up every REAPER_INTERVAL seconds and sweeps the hour buckets up to now,
+# resuming from the watermark it keeps in the sweep table. Without one (first run)
+# it looks REAPER_LOOKBACK_HOURS back.
+REAPER_ENABLED = os.getenv("REAPER_ENABLED", "true").lower() == "true"
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "60"))
+REAPER_LOOKBACK_HOURS = int(os.getenv("REAPER_LOOKBACK_HOURS", "48"))
+
+# DeleteObjects takes at most 1000 keys per call
+S3_DELETE_BATCH = 1000
+
+REAPER_ERRORS = (ClientError, BotoCoreError, StorageTimeoutError, asyncio.TimeoutError)
+
+# Sweep table item holding the start of the first hour bucket not yet fully swept
+WATERMARK_KEY = {"bucket": "#watermark", "post_id": "#watermark"}
+
+def expiry_bucket(expires_at: int):
+    return datetime.utcfromtimestamp(int(expires_at)).strftime("%Y%m%d%H")
+
+# Originals plus the WebP variants derived from them
+def image_keys(original_keys):
+    keys = list(original_keys)
+    keys.extend(variant_key(key, size) for key in original_keys for size in IMAGE_SIZES)
+    return keys
+
+def post_image_keys(post: dict):
+    return [object_key(url) for url in post.get("post_img_src", [])]
+
+def sweep_key(post: dict):
+    return {"bucket": expiry_bucket(post["expires_at"]), "post_id": post["post_id"]}
+
+# Register the images of an expiring post with the sweep (pinned posts don't expire)
+async def track_post(post: dict):
+    keys = post_image_keys(post)
+    if post.get("pinned") or not keys:
+        return
+    await expiry_sweep_store.put_item(Item={
+        **sweep_key(post),
+        "expires_at": int(post["expires_at"]),
+        "image_keys": keys
+    })
+
+async def untrack_post(post: dict):
+    if post_image_keys(post):
+        await expiry_sweep_store.delete_item(Key=sweep_key(post))
+
+# Batched multi-object delete, returns the keys S3 could not delete
+async def delete_objects(keys):
+    failed = []
+    keys = list(dict.fromkeys(keys))
+    for i in range(0, len(keys), S3_DELETE_BATCH):
+        chunk = keys[i:i + S3_DELETE_BATCH]
+        try:
+            response = await s3_store.delete_objects(
+                Bucket=S3_BUCKET,
+                Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True}
+            )
+        except REAPER_ERRORS as e:
+            print(f"Failed to delete {len(chunk)} objects from S3: {e}")
+            failed.extend(chunk)
+            continue
+        failed.extend(error["Key"] for error in response.get("Errors", []))
+    return failed
+
+# Background task of delete_post. On failure the sweep entry stays, so the reaper retries at expiry.
+async def delete_post_objects(post: dict):
+    keys = post_image_keys(post)
+    if not keys:
+        return
+    try:
+        failed = await delete_objects(image_keys(keys))
+        if failed:
+            print(f"Failed to delete {failed} of post {post['post_id']} from S3")
+            return
+        await untrack_post(post)
+    except REAPER_ERRORS as e:
+        print(f"Image cleanup failed for post {post['post_id']}: {e}")
+
+def _batch_delete_entries(keys):
+    with expiry_sweep_table.batch_writer(overwrite_by_pkeys=["bucket", "post_id"]) as batch:
+        for key in keys:
+            batch.delete_item(Key=key)
+
+# Deletes the images of TTL-expired posts, reading the hour buckets of the sweep table
+class ExpiryReaper:
+    def __init__(self):
+        self._task = None
+        self._swept_until = None
+        self.reaped_posts = 0
+        self.deleted_objects = 0
+
+    def start(self):
+        if REAPER_ENABLED:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    # Nothing may end the loop, a dead reaper would let S3 orphans pile up silently
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"Expiry sweep failed: {e!r}")
+            await asyncio.sleep(REAPER_INTERVAL)
+
+    async def _load_watermark(self, current: int):
+        if self._swept_until is None:
+            response = await expiry_sweep_store.get_item(Key=WATERMARK_KEY, ConsistentRead=True)
+            item = response.get("Item")
+            self._swept_until = int(item["swept_until"]) if item else current - REAPER_LOOKBACK_HOURS * 3600
+        return self._swept_until
+
+    # Only moves forward, another replica may already be further along
+    async def _save_watermark(self, hour: int):
+        if hour <= self._swept_until:
+            return
+        self._swept_until = hour
+        try:
+            await expiry_sweep_store.put_item(
+                Item={**WATERMARK_KEY, "swept_until": hour},
+                ConditionExpression="attribute_not_exists(swept_until) OR swept_until < :hour",
+                ExpressionAttributeValues={":hour": hour}
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+
+    # Sweep every bucket since the watermark, which advances after each completed bucket,
+    # so a long outage is caught up on rather than skipped. The current hour is revisited next time.
+    async def sweep(self):
+        now = int(time.time())
+        current = now - now % 3600
+        hour = await self._load_watermark(current)
+        while hour <= current:
+            await self._sweep_bucket(expiry_bucket(hour), now)
+            hour += 3600
+            await self._save_watermark(min(hour, current))
+
+    async def _sweep_bucket(self, bucket: str, now: int):
+        kwargs = {
+            "KeyConditionExpression": Key("bucket").eq(bucket),
+            "FilterExpression": Attr("expires_at").lte(now)
+        }
+        while True:
+            response = await expiry_sweep_store.query(**kwargs)
+            entries = response.get("Items", [])
+            if entries:
+                await self._reap(entries, now)
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    async def _reap(self, entries, now: int):
+        # A post that was pinned or extended since is still live, only its stale entry goes
+        posts = await load_posts([entry["post_id"] for entry in entries])
+        expired = []
+        done = []
+        for entry in entries:
+            post = posts.get(entry["post_id"])
+            if post and int(post.get("expires_at", now + 1)) > now:
+                done.append({"bucket": entry["bucket"], "post_id": entry["post_id"]})
+            else:
+                expired.append(entry)
+
+        keys = [key for entry in expired for key in image_keys(entry.get("image_keys", []))]
+        failed = set(await delete_objects(keys)) if keys else set()
+        for entry in expired:
+            if failed.isdisjoint(image_keys(entry.get("image_keys", []))):
+                done.append({"bucket": entry["bucket"], "post_id": entry["post_id"]})
+                self.reaped_posts += 1
+        self.deleted_objects += len(keys) - len(failed)
+
+        if done:
+            await run_storage(_batch_delete_entries, done, timeout=60)
+
+reaper = ExpiryReaper()
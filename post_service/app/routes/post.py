@@ -1,13 +1,21 @@
 import os
-import uuid
+import asyncio
 import aiohttp
-from typing import List
+from typing import List, Literal
 from dotenv import load_dotenv
-from boto3.dynamodb.conditions import Key
 from datetime import datetime, timedelta
-from database import posts_table, s3_client
-from models import Post, Comment, PostUpdate
-from fastapi import APIRouter, HTTPException, Request, Depends, UploadFile, File, Form
+from feed import PINNED, REGULAR, build_feed, timeline_stream, author_stream, encode_cursor, decode_cursor
+from timeline import get_pull_authors, pinned_partition, backfill_author, remove_author, add_to_own_timeline, fan_out_post, propagate_post_update, remove_post
+from snapper_common.security import TokenVerifier
+from users_api import fetch_following
+from images import process_post_images, post_images
+from comments import comment_item, add_comment, list_comments, delete_post_comments, propagate_comment_expiry, compact_post
+from likes import LikeConflict, toggle_like, load_like_state, propagate_like_expiry, delete_post_likes
+from reaper import track_post, untrack_post, delete_post_objects
+from uploads import UploadError, upload_files, presign_upload, reserve_uploads, verify_uploads, put_post_with_uploads, UPLOAD_MAX_FILES
+from database import posts_store, users_store, comments_store, get_post_item, object_url
+from models import Post, Comment, PostUpdate, UploadRequest, PostCommit
+from fastapi import APIRouter, HTTPException, Request, Depends, UploadFile, File, Form, BackgroundTasks, Query
 
 load_dotenv()
 
@@ -18,86 +26,84 @@ AWS_REGION = os.getenv("AWS_REGION")
 S3_BUCKET = os.getenv("S3_BUCKET")
 AUTH_PATH = os.getenv("AUTH_PATH")
 USER_PATH = os.getenv("USER_PATH")
-ALLOWED_EXT = {"jpg", "jpeg", "png"}
-ALLOWED_CT = {"image/jpeg", "image/png"}
 
 router = APIRouter()
 
-# Call auth service to verify user token
-async def get_current_user(request: Request):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(AUTH_PATH, headers=request.headers) as resp:
-            if resp.status != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return await resp.json()
-
-# Get full user data (returns only safe fields)
-async def get_full_user(request: Request):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(f"{USER_PATH}/me", headers=request.headers) as resp:
-            if resp.status != 200:
-                raise HTTPException(status_code=resp.status, detail="Failed to fetch user data")
-            return await resp.json()
+# Verify user token locally (signature, exp and user existence)
+get_current_user = TokenVerifier(users_store)
 
 # Get your posts, and the people you follow
 @router.get("/")
-async def get_feed(user_response: dict = Depends(get_full_user), limit: int = 50):
-    user = user_response.get("user", {})
-    if not user:
-        raise HTTPException(status_code=404, detail="Failed to fetch user data")
+async def get_feed(
+    request: Request,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: str = None,
+    size: Literal["original", "medium", "thumb"] = "original",
+    user: dict = Depends(get_current_user)
+):
+    try:
+        following = set(await fetch_following(request.headers.get("Authorization")))
+    except (RuntimeError, aiohttp.ClientError, asyncio.TimeoutError):
+        raise HTTPException(status_code=503, detail="Failed to fetch user data")
     
-    usernames_to_fetch = set(user.get("following", []))
-    usernames_to_fetch.add(user["username"]) 
-    posts = []
-    for username in usernames_to_fetch:
-        response = posts_table.query(
-            IndexName="username-created_at-index",
-            KeyConditionExpression=Key("username").eq(username),
-            ScanIndexForward=False,  # newest -> oldest
-            Limit=limit
-        )
-        items = response.get("Items", [])
-        posts.extend(items)
-        
-    posts = sorted(
-        posts,
-        key=lambda p: (not p.get("pinned", False), p.get("created_at", "")),
-        reverse=False
-    )
+    phase, before = PINNED, None
+    if cursor:
+        try:
+            phase, before = decode_cursor(user["username"], cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    return {"posts": posts[:limit]}
+    # Pushed posts come from the user's timeline, high-follower authors are pulled and merged in
+    allowed_authors = following | {user["username"]}
+    pull_authors = (await get_pull_authors()) & following
+    
+    # Pinned posts lead the feed across pages, the regular phase continues on the same
+    # page once they run out and leaves them out. A pinned-partition ref whose post was
+    # unpinned since (propagation failed) is dropped there, so no post shows up in both.
+    posts, position = [], None
+    if phase == PINNED:
+        streams = [timeline_stream(pinned_partition(user["username"]), page_size=limit, before=before)]
+        streams.extend(author_stream(author, before=before, pinned_only=True) for author in pull_authors)
+        posts, position = await build_feed(streams, limit, allowed_authors=allowed_authors, pinned=True)
+        if position is None:
+            phase, before = REGULAR, None
+    if phase == REGULAR and len(posts) < limit:
+        streams = [timeline_stream(user["username"], page_size=limit, before=before)]
+        streams.extend(author_stream(author, before=before) for author in pull_authors)
+        regular, position = await build_feed(streams, limit - len(posts), allowed_authors=allowed_authors, pinned=False)
+        posts.extend(regular)
+        next_cursor = encode_cursor(user["username"], REGULAR, position) if position else None
+    else:
+        # A page filled by pinned posts continues with the rest of the pinned phase or the top of the regular one
+        next_cursor = encode_cursor(user["username"], phase, position) if posts else None
+    
+    # Likes become like_count/liked, a size class swaps in the WebP variants (originals where not generated yet)
+    await load_like_state(posts, user["username"])
+    for post in posts:
+        compact_post(post)
+        if size != "original":
+            post["post_img_src"] = post_images(post, size)
+            post.pop("post_img_variants", None)
+    
+    return {"posts": posts, "next_cursor": next_cursor}
 
-# Create a new post
-@router.post("/")
-async def create_post(
-    post_text: str = Form(...),
-    pinned: bool = Form(False),
-    files: List[UploadFile] = File(None),
-    user_data: dict = Depends(get_current_user)
-):
-    username = user_data["username"]
-    file_urls = []
-    if files:
-        for file in files:
-            filename = file.filename or ""
-            ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
-            ctype = (file.content_type or "").lower()
-            if ext not in ALLOWED_EXT or ctype not in ALLOWED_CT:
-                raise HTTPException(status_code=400, detail="Only JPG/PNG images are allowed.")
-            
-            if ext == "jpeg":
-                ext = "jpg"
-                
-            s3_key = f"posts/{username}/{uuid.uuid4()}.{ext}"
-            s3_client.upload_fileobj(
-                file.file,
-                S3_BUCKET,
-                s3_key,
-                ExtraArgs={"ContentType": ctype}
-            )
-            file_url = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
-            file_urls.append(file_url)
-            
+# Called by user_service right after a follow, with the follower's token
+@router.post("/timeline/{author}")
+async def follow_timeline(author: str, user: dict = Depends(get_current_user)):
+    entries = await backfill_author(user["username"], author)
+    
+    return {"message": "Timeline updated", "entries": entries}
+
+# Called by user_service right after an unfollow, with the follower's token
+@router.delete("/timeline/{author}")
+async def unfollow_timeline(author: str, user: dict = Depends(get_current_user)):
+    entries = await remove_author(user["username"], author)
+    
+    return {"message": "Timeline updated", "entries": entries}
+
+# Store the post, put it on the author's timeline and fan it out in the background.
+# Presigned keys are claimed together with the post write (UploadError if already used).
+async def save_post(request: Request, background_tasks: BackgroundTasks, username: str, post_text: str, pinned: bool, keys: List[str], presigned: bool = False):
     if pinned:
         expires_at = int(datetime(2100, 1, 1).timestamp())
     else:
@@ -106,14 +112,75 @@ async def create_post(
     post = Post(
         username=username,
         post_text=post_text,
-        post_img_src=file_urls,
-        comments=[],
+        post_img_src=[object_url(key) for key in keys],
         created_at=datetime.utcnow().isoformat(),
         pinned=pinned,
         expires_at=expires_at
     )
     
-    posts_table.put_item(Item=post.dict(exclude={"likes"}))
+    item = post.dict(exclude={"likes"})
+    if presigned and keys:
+        await put_post_with_uploads(item, username, keys)
+    else:
+        await posts_store.put_item(Item=item)
+    await asyncio.gather(add_to_own_timeline(item), track_post(item))
+    background_tasks.add_task(fan_out_post, item, request.headers.get("Authorization"))
+    background_tasks.add_task(process_post_images, item)
+    
+    return post
+
+# Create a new post (images are uploaded through the service, concurrently)
+@router.post("/")
+async def create_post(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    post_text: str = Form(...),
+    pinned: bool = Form(False),
+    files: List[UploadFile] = File(None),
+    user_data: dict = Depends(get_current_user)
+):
+    username = user_data["username"]
+    keys = []
+    if files:
+        try:
+            keys = await upload_files(username, files)
+        except UploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+            
+    post = await save_post(request, background_tasks, username, post_text, pinned, keys)
+    
+    return {"message": "Post created", "post": post}
+
+# Presigned upload targets, the client sends the images straight to S3 and then commits the post
+@router.post("/uploads")
+async def create_uploads(data: UploadRequest, user_data: dict = Depends(get_current_user)):
+    if not data.files or len(data.files) > UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Request between 1 and {UPLOAD_MAX_FILES} uploads.")
+    try:
+        uploads = [
+            presign_upload(user_data["username"], spec.content_type.lower(), spec.size, data.method)
+            for spec in data.files
+        ]
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await reserve_uploads(user_data["username"], [upload["key"] for upload in uploads])
+    
+    return {"uploads": uploads}
+
+# Create a post from images uploaded with presigned targets
+@router.post("/commit")
+async def commit_post(
+    data: PostCommit,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user_data: dict = Depends(get_current_user)
+):
+    username = user_data["username"]
+    try:
+        await verify_uploads(username, data.keys)
+        post = await save_post(request, background_tasks, username, data.post_text, data.pinned, data.keys, presigned=True)
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     return {"message": "Post created", "post": post}
 
@@ -125,8 +192,7 @@ async def edit_post(
     user_data: dict = Depends(get_current_user)
 ):
     username = user_data['username']
-    response = posts_table.get_item(Key={"post_id": post_id})
-    post = response.get("Item")
+    post = await get_post_item(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -136,21 +202,27 @@ async def edit_post(
     if updated_post.post_text is None:
         raise HTTPException(status_code=400, detail="No valid fields to update")
     
-    result = posts_table.update_item(
+    result = await posts_store.update_item(
         Key={"post_id": post_id},
         UpdateExpression="SET post_text = :text",
         ExpressionAttributeValues={":text": updated_post.post_text},
         ReturnValues="ALL_NEW"
     )
     
-    return {"message": "Post updated", "post": result["Attributes"]}
+    await load_like_state([result["Attributes"]], username)
+    
+    return {"message": "Post updated", "post": compact_post(result["Attributes"])}
 
 # Delete a post
 @router.delete("/{post_id}")
-async def delete_post(post_id: str, user_data: dict = Depends(get_current_user)):
+async def delete_post(
+    post_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user_data: dict = Depends(get_current_user)
+):
     username = user_data["username"]
-    response = posts_table.get_item(Key={"post_id": post_id})
-    post = response.get("Item")
+    post = await get_post_item(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -158,45 +230,34 @@ async def delete_post(post_id: str, user_data: dict = Depends(get_current_user))
         raise HTTPException(status_code=403, detail="Not authorized to delete this post")
     
     img_urls = post.get("post_img_src", [])
-    for url in img_urls:
-        try:
-            key = url.split(f".amazonaws.com/")[-1]
-            s3_client.delete_object(Bucket=S3_BUCKET, Key=key)
-        except Exception as e:
-            print(f"Failed to delete {url} from S3: {e}")
-            
-    posts_table.delete_item(Key={"post_id": post_id})
+    # Images (and their variants) go in one batched delete after the response
+    await posts_store.delete_item(Key={"post_id": post_id})
+    background_tasks.add_task(remove_post, post, request.headers.get("Authorization"))
+    background_tasks.add_task(delete_post_objects, post)
+    background_tasks.add_task(delete_post_comments, post)
+    background_tasks.add_task(delete_post_likes, post)
     
     return {"message": "Post deleted", "deleted_images": img_urls}
 
-# Like a post
+# Like or unlike a post with a single conditional write, only the new like state is returned
 @router.post("/{post_id}/like")
 async def like_post(post_id: str, user_data: dict = Depends(get_current_user)):
-    username = user_data['username']
-    response = posts_table.get_item(Key={"post_id": post_id})
-    post = response.get("Item")
-    if not post:
+    try:
+        result = await toggle_like(post_id, user_data["username"])
+    except LikeConflict:
+        raise HTTPException(status_code=409, detail="Conflicting like update, please retry")
+    if result is None:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    currently_liked = username in set(post.get("likes", []))
-    if currently_liked:
-        update_expr = "DELETE likes :user"
-    else:
-        update_expr = "ADD likes :user"
-        
-    result = posts_table.update_item(
-        Key={"post_id": post_id},
-        UpdateExpression=update_expr,
-        ExpressionAttributeValues={":user": {username}},
-        ReturnValues="ALL_NEW"
-    )
-    
+    liked, like_count = result
     return {
         "message": "Like status updated",
-        "post": result["Attributes"]
+        "post_id": post_id,
+        "liked": liked,
+        "like_count": like_count
     }
 
-# Comment on a post
+# Comment on a post, the comment gets its own row and the post only a count and the latest few
 @router.post("/{post_id}/comment")
 async def comment_post(
     post_id: str,
@@ -204,32 +265,52 @@ async def comment_post(
     user_data: dict = Depends(get_current_user)
 ):
     comment.username = user_data['username']
-    response = posts_table.get_item(Key={"post_id": post_id})
-    post = response.get("Item")
+    post = await get_post_item(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    result = posts_table.update_item(
-        Key={"post_id": post_id},
-        UpdateExpression="SET comments = list_append(if_not_exists(comments, :empty_list), :new_comment)",
-        ExpressionAttributeValues={
-            ":new_comment": [comment.dict()],
-            ":empty_list": []
-        },
-        ReturnValues="ALL_NEW"
-    )
+    item = comment_item(post, comment.dict())
+    await comments_store.put_item(Item=item)
+    updated = await add_comment(post, item)
+    if updated is None:
+        await comments_store.delete_item(Key={"post_id": post_id, "sort_key": item["sort_key"]})
+        raise HTTPException(status_code=404, detail="Post not found")
     
     return {
         "message": "Comment added",
-        "comments": result["Attributes"].get("comments", [])
+        "comment": item,
+        "comment_count": updated.get("comment_count", 0),
+        "recent_comments": updated.get("recent_comments", [])
     }
 
+# Page through the comments of a post, newest first
+@router.get("/{post_id}/comments")
+async def get_comments(
+    post_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str = None,
+    user_data: dict = Depends(get_current_user)
+):
+    if not await get_post_item(post_id):
+        raise HTTPException(status_code=404, detail="Post not found")
+    
+    try:
+        comments, next_cursor = await list_comments(post_id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return {"comments": comments, "next_cursor": next_cursor}
+
 # Pin/Unpin a post (set very far TTL)
 @router.post("/{post_id}/pin")
-async def toggle_pin_post(post_id: str, user_data: dict = Depends(get_current_user)):
+async def toggle_pin_post(
+    post_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user_data: dict = Depends(get_current_user)
+):
     username = user_data["username"]
-    response = posts_table.get_item(Key={"post_id": post_id})
-    post = response.get("Item")
+    post = await get_post_item(post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -243,7 +324,7 @@ async def toggle_pin_post(post_id: str, user_data: dict = Depends(get_current_us
         new_pinned = True
         new_expires = int(datetime(2100, 1, 1).timestamp())
         
-    result = posts_table.update_item(
+    result = await posts_store.update_item(
         Key={"post_id": post_id},
         UpdateExpression="SET pinned = :pinned, expires_at = :expires",
         ExpressionAttributeValues={
@@ -252,8 +333,17 @@ async def toggle_pin_post(post_id: str, user_data: dict = Depends(get_current_us
         },
         ReturnValues="ALL_NEW"
     )
+    # Pinned posts leave the expiry sweep, unpinned ones join the bucket of their new expiry
+    if new_pinned:
+        await untrack_post(post)
+    else:
+        await track_post(result["Attributes"])
+    background_tasks.add_task(propagate_post_update, result["Attributes"], request.headers.get("Authorization"))
+    background_tasks.add_task(propagate_comment_expiry, result["Attributes"])
+    background_tasks.add_task(propagate_like_expiry, result["Attributes"])
+    await load_like_state([result["Attributes"]], username)
     
     return {
         "message": "Post pinned" if new_pinned else "Post unpinned",
-        "post": result["Attributes"]
+        "post": compact_post(result["Attributes"])
     }
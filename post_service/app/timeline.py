@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+import aiohttp
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from boto3.dynamodb.conditions import Key
+from database import timelines_table, timelines_store, posts_store, users_store, run_storage, StorageTimeoutError
+from users_api import fetch_followers
+
+load_dotenv()
+
+# Authors with more followers than this are not fanned out, their posts are pulled at read time
+FANOUT_FOLLOWER_THRESHOLD = int(os.getenv("FANOUT_FOLLOWER_THRESHOLD", "5000"))
+PULL_AUTHORS_CACHE_TTL = float(os.getenv("PULL_AUTHORS_CACHE_TTL", "60"))
+# Recent posts of a newly followed author copied into the follower's timeline
+TIMELINE_BACKFILL_LIMIT = int(os.getenv("TIMELINE_BACKFILL_LIMIT", "50"))
+
+# Pull-based authors are kept in their own partition of the Timelines table
+PULL_PARTITION = "#pull"
+
+# Pinned posts are also referenced from a second per-user partition, so the feed can
+# serve them ahead of everything else without scanning the whole timeline
+PINNED_PREFIX = "#pinned#"
+
+# Errors a background timeline task logs instead of raising
+TASK_ERRORS = (RuntimeError, ClientError, StorageTimeoutError, aiohttp.ClientError, asyncio.TimeoutError)
+
+_pull_authors = None
+_pull_authors_expires = 0.0
+
+# Timeline sort key keeps entries ordered by creation time
+def timeline_sort_key(post: dict):
+    return f"{post['created_at']}#{post['post_id']}"
+
+def timeline_entry(username: str, post: dict):
+    return {
+        "username": username,
+        "sort_key": timeline_sort_key(post),
+        "post_id": post["post_id"],
+        "author": post["username"],
+        "created_at": post["created_at"],
+        "expires_at": int(post["expires_at"])
+    }
+
+def pinned_partition(username: str):
+    return f"{PINNED_PREFIX}{username}"
+
+# Entries that put a post on one user's feed (a second one while the post is pinned)
+def timeline_entries(username: str, post: dict):
+    entries = [timeline_entry(username, post)]
+    if post.get("pinned"):
+        entries.append(timeline_entry(pinned_partition(username), post))
+    return entries
+
+# Keys of every entry a post can have on one user's feed
+def timeline_keys(username: str, post: dict):
+    sort_key = timeline_sort_key(post)
+    return [{"username": username, "sort_key": sort_key}, {"username": pinned_partition(username), "sort_key": sort_key}]
+
+# Authors whose posts are merged in at read time
+async def get_pull_authors():
+    global _pull_authors, _pull_authors_expires
+    if _pull_authors is not None and _pull_authors_expires > time.monotonic():
+        return _pull_authors
+
+    authors = set()
+    kwargs = {"KeyConditionExpression": Key("username").eq(PULL_PARTITION)}
+    while True:
+        response = await timelines_store.query(**kwargs)
+        authors.update(item["sort_key"] for item in response.get("Items", []))
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    _pull_authors = authors
+    _pull_authors_expires = time.monotonic() + PULL_AUTHORS_CACHE_TTL
+    return authors
+
+async def mark_pull_author(username: str):
+    await timelines_store.put_item(Item={"username": PULL_PARTITION, "sort_key": username})
+    if _pull_authors is not None:
+        _pull_authors.add(username)
+
+def _batch_put(entries):
+    with timelines_table.batch_writer(overwrite_by_pkeys=["username", "sort_key"]) as batch:
+        for entry in entries:
+            batch.put_item(Item=entry)
+
+def _batch_delete(keys):
+    with timelines_table.batch_writer(overwrite_by_pkeys=["username", "sort_key"]) as batch:
+        for key in keys:
+            batch.delete_item(Key=key)
+
+# Put the post on the author's own timeline right away
+async def add_to_own_timeline(post: dict):
+    await asyncio.gather(*(
+        timelines_store.put_item(Item=entry) for entry in timeline_entries(post["username"], post)
+    ))
+
+# follower_count is kept on the Users item by user_service's follow/unfollow transaction
+async def _follower_count(author: str):
+    response = await users_store.get_item(Key={"username": author}, ProjectionExpression="follower_count")
+    return int(response.get("Item", {}).get("follower_count", 0))
+
+# Followers that should hold a timeline entry for the author's posts (empty for pull authors).
+# The follower list is only fetched for authors under the threshold, who are fanned out to.
+async def _fanout_targets(author: str, authorization: str):
+    if author in await get_pull_authors():
+        return []
+
+    if await _follower_count(author) > FANOUT_FOLLOWER_THRESHOLD:
+        await mark_pull_author(author)
+        return []
+    return await fetch_followers(authorization)
+
+# Push a new post to every follower timeline (runs as a background task)
+async def fan_out_post(post: dict, authorization: str):
+    try:
+        followers = await _fanout_targets(post["username"], authorization)
+        if followers:
+            entries = [entry for follower in followers for entry in timeline_entries(follower, post)]
+            await run_storage(_batch_put, entries, timeout=60)
+    except TASK_ERRORS as e:
+        print(f"Timeline fan-out failed for {post['post_id']}: {e}")
+
+# Rewrite timeline entries after a pin/unpin so their TTL follows the post,
+# and add or drop the pinned references
+async def propagate_post_update(post: dict, authorization: str):
+    try:
+        followers = await _fanout_targets(post["username"], authorization)
+        usernames = followers + [post["username"]]
+        await run_storage(_batch_put, [entry for username in usernames for entry in timeline_entries(username, post)], timeout=60)
+        if not post.get("pinned"):
+            keys = [{"username": pinned_partition(username), "sort_key": timeline_sort_key(post)} for username in usernames]
+            await run_storage(_batch_delete, keys, timeout=60)
+    except TASK_ERRORS as e:
+        print(f"Timeline update failed for {post['post_id']}: {e}")
+
+# Remove a deleted post from timelines, readers also skip references to missing posts
+async def remove_post(post: dict, authorization: str):
+    try:
+        followers = await _fanout_targets(post["username"], authorization)
+        keys = [key for username in followers + [post["username"]] for key in timeline_keys(username, post)]
+        await run_storage(_batch_delete, keys, timeout=60)
+    except TASK_ERRORS as e:
+        print(f"Timeline cleanup failed for {post['post_id']}: {e}")
+
+# Live posts of one author, newest first. Unpinned posts expire within a day,
+# so apart from pinned ones this is a short read.
+async def _author_posts(author: str):
+    now = int(time.time())
+    kwargs = {
+        "IndexName": "username-created_at-index",
+        "KeyConditionExpression": Key("username").eq(author),
+        "ScanIndexForward": False
+    }
+    while True:
+        response = await posts_store.query(**kwargs)
+        for post in response.get("Items", []):
+            if int(post.get("expires_at", now + 1)) > now:
+                yield post
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+# After a follow: the author's recent posts and every pinned one join the follower's feed.
+# Pull authors are skipped, their posts are merged in at read time anyway.
+async def backfill_author(follower: str, author: str):
+    if author in await get_pull_authors():
+        return 0
+
+    entries = []
+    recent = 0
+    async for post in _author_posts(author):
+        if recent < TIMELINE_BACKFILL_LIMIT:
+            entries.append(timeline_entry(follower, post))
+            recent += 1
+        if post.get("pinned"):
+            entries.append(timeline_entry(pinned_partition(follower), post))
+    if entries:
+        await run_storage(_batch_put, entries, timeout=60)
+    return len(entries)
+
+# After an unfollow: drop the author's posts from the follower's feed
+async def remove_author(follower: str, author: str):
+    keys = [key async for post in _author_posts(author) for key in timeline_keys(follower, post)]
+    if keys:
+        await run_storage(_batch_delete, keys, timeout=60)
+    return len(keys)
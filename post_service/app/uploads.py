@@ -0,0 +1,183 @@
+import os
+import time
+import uuid
+import asyncio
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from database import (
+    s3_client, s3_store, S3_BUCKET, table_name, pending_uploads_table_name, pending_uploads_store,
+    dynamodb_client_store, serialize, cancellation_reasons
+)
+
+load_dotenv()
+
+# Per-request limits for image uploads, proxied or presigned
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", "4"))
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "10"))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+UPLOAD_URL_TTL = int(os.getenv("UPLOAD_URL_TTL", "900"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "60"))
+# How long after its URL expires a presigned upload can still be committed
+UPLOAD_COMMIT_WINDOW = int(os.getenv("UPLOAD_COMMIT_WINDOW", "3600"))
+
+ALLOWED_EXT = {"jpg", "jpeg", "png"}
+ALLOWED_CT = {"image/jpeg", "image/png"}
+CT_EXT = {"image/jpeg": "jpg", "image/png": "png"}
+
+# Each file streams from the spooled upload in parts, without extra transfer threads
+# (concurrency is bounded per request instead)
+TRANSFER_CONFIG = TransferConfig(use_threads=False)
+
+class UploadError(Exception):
+    pass
+
+def post_key_prefix(username: str):
+    return f"posts/{username}/"
+
+def new_post_key(username: str, ext: str):
+    return f"{post_key_prefix(username)}{uuid.uuid4()}.{ext}"
+
+# Extension used for the object key, UploadError if the file is not a JPG/PNG
+def image_extension(filename: str, content_type: str):
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
+    if ext not in ALLOWED_EXT or content_type not in ALLOWED_CT:
+        raise UploadError("Only JPG/PNG images are allowed.")
+    return "jpg" if ext == "jpeg" else ext
+
+async def _delete_keys(keys):
+    if not keys:
+        return
+    try:
+        await s3_store.delete_objects(
+            Bucket=S3_BUCKET,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True}
+        )
+    except Exception as e:
+        print(f"Failed to clean up uploads {keys}: {e}")
+
+# Upload multipart files concurrently (bounded), returns their keys in the original order.
+# Nothing is left behind in the bucket when one of them fails.
+async def upload_files(username: str, files):
+    if len(files) > UPLOAD_MAX_FILES:
+        raise UploadError(f"At most {UPLOAD_MAX_FILES} images per post.")
+
+    uploads = []
+    for file in files:
+        ctype = (file.content_type or "").lower()
+        ext = image_extension(file.filename or "", ctype)
+        uploads.append((file, new_post_key(username, ext), ctype))
+
+    slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+
+    async def upload(file, key, ctype):
+        async with slots:
+            await s3_store.upload_fileobj(
+                file.file,
+                S3_BUCKET,
+                key,
+                ExtraArgs={"ContentType": ctype},
+                Config=TRANSFER_CONFIG,
+                timeout=UPLOAD_TIMEOUT
+            )
+
+    results = await asyncio.gather(*(upload(*entry) for entry in uploads), return_exceptions=True)
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        await _delete_keys([key for (_, key, _), result in zip(uploads, results) if result is None])
+        raise errors[0]
+    return [key for _, key, _ in uploads]
+
+# Presigned direct-to-S3 upload of one image, the bytes never pass through the API.
+# POST enforces type and size range in the policy, PUT signs the declared type and exact size.
+def presign_upload(username: str, content_type: str, size: int, method: str = "post"):
+    if content_type not in ALLOWED_CT:
+        raise UploadError("Only JPG/PNG images are allowed.")
+    if size <= 0 or size > UPLOAD_MAX_BYTES:
+        raise UploadError(f"Images must be between 1 and {UPLOAD_MAX_BYTES} bytes.")
+
+    key = new_post_key(username, CT_EXT[content_type])
+    if method == "put":
+        url = s3_client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": S3_BUCKET, "Key": key, "ContentType": content_type, "ContentLength": size},
+            ExpiresIn=UPLOAD_URL_TTL
+        )
+        return {
+            "key": key,
+            "method": "PUT",
+            "url": url,
+            "headers": {"Content-Type": content_type, "Content-Length": str(size)},
+            "expires_in": UPLOAD_URL_TTL
+        }
+
+    presigned = s3_client.generate_presigned_post(
+        Bucket=S3_BUCKET,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, UPLOAD_MAX_BYTES]
+        ],
+        ExpiresIn=UPLOAD_URL_TTL
+    )
+    return {
+        "key": key,
+        "method": "POST",
+        "url": presigned["url"],
+        "fields": presigned["fields"],
+        "expires_in": UPLOAD_URL_TTL
+    }
+
+# Remember who each presigned key was issued to, commit_post consumes the markers
+async def reserve_uploads(username: str, keys):
+    expires_at = int(time.time()) + UPLOAD_URL_TTL + UPLOAD_COMMIT_WINDOW
+    await asyncio.gather(*(
+        pending_uploads_store.put_item(Item={"upload_key": key, "username": username, "expires_at": expires_at})
+        for key in keys
+    ))
+
+# Store the post and delete its upload markers in one transaction, so a presigned key
+# backs at most one post. Action order: [post, marker per key]
+async def put_post_with_uploads(item: dict, username: str, keys):
+    now = int(time.time())
+    actions = [{"Put": {"TableName": table_name, "Item": serialize(item)}}]
+    actions.extend({"Delete": {
+        "TableName": pending_uploads_table_name,
+        "Key": serialize({"upload_key": key}),
+        "ConditionExpression": "username = :username AND expires_at > :now",
+        "ExpressionAttributeValues": serialize({":username": username, ":now": now})
+    }} for key in keys)
+    try:
+        await dynamodb_client_store.transact_write_items(TransactItems=actions)
+    except ClientError as e:
+        reasons = cancellation_reasons(e)
+        if reasons is None:
+            raise
+        # A consumed, expired or concurrently committed marker
+        if any(reason != "None" for reason in reasons[1:]):
+            raise UploadError("Upload already used or expired.")
+        raise
+
+# Check that presigned uploads exist, belong to the user and respect the limits
+async def verify_uploads(username: str, keys):
+    if len(keys) > UPLOAD_MAX_FILES:
+        raise UploadError(f"At most {UPLOAD_MAX_FILES} images per post.")
+    if len(set(keys)) != len(keys):
+        raise UploadError("Duplicate upload keys.")
+    for key in keys:
+        if not key.startswith(post_key_prefix(username)):
+            raise UploadError("Upload does not belong to the user.")
+
+    async def check(key):
+        try:
+            head = await s3_store.head_object(Bucket=S3_BUCKET, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                raise UploadError(f"Upload '{key}' not found.")
+            raise
+        if head.get("ContentType") not in ALLOWED_CT or head.get("ContentLength", 0) > UPLOAD_MAX_BYTES:
+            await _delete_keys([key])
+            raise UploadError(f"Upload '{key}' is not a valid image.")
+
+    await asyncio.gather(*(check(key) for key in keys))
@@ -0,0 +1,32 @@
+import os
+from dotenv import load_dotenv
+from snapper_common.http_client import http_client
+
+load_dotenv()
+
+USER_PATH = os.getenv("USER_PATH")
+USER_LIST_PAGE_SIZE = int(os.getenv("USER_LIST_PAGE_SIZE", "1000"))
+
+# Page through a user_service follow list (followers/following) of the token owner
+async def _fetch_user_list(path: str, key: str, authorization: str):
+    users = []
+    params = {"limit": USER_LIST_PAGE_SIZE}
+    while True:
+        resp = await http_client.request(
+            "GET",
+            f"{USER_PATH}/{path}",
+            params=params,
+            headers={"Authorization": authorization}
+        )
+        if resp.status != 200:
+            raise RuntimeError(f"Failed to fetch {path} ({resp.status})")
+        users.extend(resp.data.get(key, []))
+        if not resp.data.get("next_cursor"):
+            return users
+        params["cursor"] = resp.data["next_cursor"]
+
+async def fetch_followers(authorization: str):
+    return await _fetch_user_list("followers", "followers", authorization)
+
+async def fetch_following(authorization: str):
+    return await _fetch_user_list("following", "following", authorization)
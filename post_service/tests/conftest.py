@@ -0,0 +1,83 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(TESTS_DIR)))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "app"))
+
+from snapper_common.testing import aws  # noqa: F401
+import jwt
+import pytest
+from fastapi.testclient import TestClient
+from snapper_common.dynamo import create_tables
+from snapper_common.security import UserCache
+from snapper_common.users import users_schema
+from snapper_common.testing import auth_headers
+from database import SCHEMAS, users_table
+import timeline
+from routes import post as post_routes
+
+# Users is created by auth/user service in a deployment
+@pytest.fixture(autouse=True)
+def tables(aws):
+    create_tables(*SCHEMAS, users_schema)
+
+# Stand-in for user_service follow lists: {follower: {followee, ...}}
+@pytest.fixture(autouse=True)
+def following(monkeypatch):
+    graph = {}
+
+    def owner(authorization: str):
+        return jwt.decode(authorization.split("Bearer ")[1], options={"verify_signature": False})["sub"]
+
+    async def fetch_following(authorization: str):
+        return sorted(graph.get(owner(authorization), ()))
+
+    async def fetch_followers(authorization: str):
+        username = owner(authorization)
+        return sorted(follower for follower, followees in graph.items() if username in followees)
+
+    monkeypatch.setattr(post_routes, "fetch_following", fetch_following)
+    monkeypatch.setattr(timeline, "fetch_followers", fetch_followers)
+    monkeypatch.setattr(timeline, "_pull_authors", None)
+    return graph
+
+@pytest.fixture
+def client(monkeypatch):
+    from main import app
+    cache = post_routes.get_current_user.cache
+    monkeypatch.setattr(post_routes.get_current_user, "cache", UserCache(cache.max_size, cache.ttl))
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def add_user():
+    def add(*usernames: str):
+        for username in usernames:
+            users_table.put_item(Item={"username": username, "email": f"{username}@example.com"})
+    return add
+
+# Create a post through the API, returns its post_id
+@pytest.fixture
+def create_post(client):
+    def create(username: str, text: str = "hello", pinned: bool = False):
+        response = client.post("/posts/", data={"post_text": text, "pinned": str(pinned).lower()}, headers=auth_headers(username))
+        assert response.status_code == 200
+        return response.json()["post"]["post_id"]
+    return create
+
+# Follow next_cursor through the whole feed, returns (post texts, pages read)
+@pytest.fixture
+def read_feed(client):
+    def read(username: str, limit: int):
+        texts, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/posts/", params=params, headers=auth_headers(username))
+            assert response.status_code == 200
+            texts.extend(post["post_text"] for post in response.json()["posts"])
+            cursor = response.json()["next_cursor"]
+            pages += 1
+            if not cursor:
+                return texts, pages
+    return read
@@ -0,0 +1,88 @@
+import json
+import base64
+from snapper_common.testing import auth_headers
+from database import comments_table, posts_table
+
+def comment(client, username, post_id, text):
+    response = client.post(f"/posts/{post_id}/comment", json={"comment": text}, headers=auth_headers(username))
+    assert response.status_code == 200
+    return response.json()
+
+def read_comments(client, username, post_id, limit):
+    texts, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(f"/posts/{post_id}/comments", params=params, headers=auth_headers(username))
+        assert response.status_code == 200
+        texts.extend(item["comment"] for item in response.json()["comments"])
+        cursor = response.json()["next_cursor"]
+        if not cursor:
+            return texts
+
+def test_post_keeps_count_and_latest_comments(client, add_user, create_post):
+    add_user("alice", "bob")
+    post_id = create_post("alice")
+    for i in range(5):
+        result = comment(client, "bob", post_id, f"c{i}")
+
+    assert result["comment_count"] == 5
+    assert [item["comment"] for item in result["recent_comments"]] == ["c2", "c3", "c4"]
+    post = posts_table.get_item(Key={"post_id": post_id})["Item"]
+    assert "comments" not in post
+    assert post["comment_count"] == 5
+
+def test_comments_page_newest_first(client, add_user, create_post):
+    add_user("alice", "bob")
+    post_id = create_post("alice")
+    for i in range(5):
+        comment(client, "bob", post_id, f"c{i}")
+
+    expected = ["c4", "c3", "c2", "c1", "c0"]
+    for limit in (1, 2, 20):
+        assert read_comments(client, "alice", post_id, limit) == expected
+
+def test_comment_errors(client, add_user, create_post):
+    add_user("alice")
+    other = create_post("alice")
+    post_id = create_post("alice")
+    for i in range(2):
+        comment(client, "alice", other, f"c{i}")
+    cursor = client.get(f"/posts/{other}/comments", params={"limit": 1}, headers=auth_headers("alice")).json()["next_cursor"]
+
+    assert client.post("/posts/missing/comment", json={"comment": "hi"}, headers=auth_headers("alice")).status_code == 404
+    assert client.get("/posts/missing/comments", headers=auth_headers("alice")).status_code == 404
+    assert client.get(f"/posts/{post_id}/comments", params={"cursor": cursor}, headers=auth_headers("alice")).status_code == 400
+
+def test_deleting_a_post_deletes_its_comments(client, add_user, create_post):
+    add_user("alice", "bob")
+    post_id = create_post("alice")
+    for i in range(3):
+        comment(client, "bob", post_id, f"c{i}")
+
+    assert client.delete(f"/posts/{post_id}", headers=auth_headers("alice")).status_code == 200
+    assert comments_table.scan()["Items"] == []
+
+def test_tampered_cursor_is_rejected(client, add_user, create_post):
+    add_user("alice")
+    post_id = create_post("alice")
+
+    def cursor(key):
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    for key in ({"post_id": post_id, "sort_key": 5}, {"post_id": post_id}, {"post_id": post_id, "sort_key": "a", "x": "b"}, [post_id]):
+        response = client.get(f"/posts/{post_id}/comments", params={"cursor": cursor(key)}, headers=auth_headers("alice"))
+        assert response.status_code == 400
+
+def test_migration_rerun_does_not_duplicate_comments():
+    from migrate_comments import migrate
+    legacy = [{"username": "bob", "comment": f"c{i}", "created_at": f"2024-01-01T00:00:0{i}"} for i in range(4)]
+    post = {"post_id": "p1", "username": "alice", "created_at": "2024-01-01T00:00:00", "expires_at": 4102444800, "comments": legacy}
+    posts_table.put_item(Item=post)
+    migrate()
+    # Crash after the batch write, before the REMOVE: the legacy list is still there
+    posts_table.put_item(Item=post)
+    migrate()
+
+    rows = comments_table.scan()["Items"]
+    assert sorted(row["comment"] for row in rows) == ["c0", "c1", "c2", "c3"]
+    assert posts_table.get_item(Key={"post_id": "p1"})["Item"]["comment_count"] == 4
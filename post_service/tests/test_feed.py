@@ -0,0 +1,68 @@
+from snapper_common.testing import auth_headers
+from database import users_table, posts_table
+
+def test_pinned_posts_lead_every_page_size(client, add_user, following, create_post, read_feed):
+    add_user("alice", "bob")
+    following["alice"] = {"bob"}
+    create_post("bob", "bob pinned", pinned=True)
+    for i in range(4):
+        create_post("bob", f"bob {i}")
+    create_post("alice", "alice pinned", pinned=True)
+    create_post("alice", "alice 0")
+
+    expected = ["alice pinned", "bob pinned", "alice 0", "bob 3", "bob 2", "bob 1", "bob 0"]
+    for limit in (1, 2, 3, 50):
+        assert read_feed("alice", limit)[0] == expected
+
+def test_pin_and_unpin_move_the_post(client, add_user, following, create_post, read_feed):
+    add_user("alice", "bob")
+    following["alice"] = {"bob"}
+    older = create_post("bob", "older")
+    create_post("bob", "newer")
+
+    assert client.post(f"/posts/{older}/pin", headers=auth_headers("bob")).status_code == 200
+    assert read_feed("alice", 1)[0] == ["older", "newer"]
+
+    assert client.post(f"/posts/{older}/pin", headers=auth_headers("bob")).status_code == 200
+    assert read_feed("alice", 1)[0] == ["newer", "older"]
+
+def test_unfollowed_pinned_posts_are_hidden(client, add_user, following, create_post, read_feed):
+    add_user("alice", "bob")
+    following["alice"] = {"bob"}
+    create_post("bob", "bob pinned", pinned=True)
+    following["alice"] = set()
+
+    assert read_feed("alice", 10)[0] == []
+
+def test_invalid_cursor(client, add_user):
+    add_user("alice")
+    response = client.get("/posts/", params={"cursor": "WzFd"}, headers=auth_headers("alice"))
+    assert response.status_code == 400
+
+def test_pull_author_pinned_posts_lead(client, add_user, following, monkeypatch, create_post, read_feed):
+    import timeline
+    monkeypatch.setattr(timeline, "FANOUT_FOLLOWER_THRESHOLD", 0)
+    add_user("alice", "bob")
+    users_table.update_item(Key={"username": "bob"}, UpdateExpression="SET follower_count = :n", ExpressionAttributeValues={":n": 1})
+    following["alice"] = {"bob"}
+    create_post("bob", "bob pinned", pinned=True)
+    create_post("bob", "bob 0")
+    create_post("bob", "bob 1")
+
+    assert read_feed("alice", 1)[0] == ["bob pinned", "bob 1", "bob 0"]
+
+def test_page_size_is_bounded(client, add_user):
+    add_user("alice")
+    for limit in (0, -1, 101):
+        assert client.get("/posts/", params={"limit": limit}, headers=auth_headers("alice")).status_code == 422
+
+def test_unpinned_post_with_a_stale_pinned_entry_is_served_once(client, add_user, following, create_post, read_feed):
+    add_user("alice", "bob")
+    following["alice"] = {"bob"}
+    post_id = create_post("bob", "was pinned", pinned=True)
+    create_post("bob", "bob 0")
+    # Unpinned without its timeline entries being updated
+    posts_table.update_item(Key={"post_id": post_id}, UpdateExpression="SET pinned = :f", ExpressionAttributeValues={":f": False})
+
+    for limit in (1, 10):
+        assert read_feed("alice", limit)[0] == ["bob 0", "was pinned"]
@@ -0,0 +1,40 @@
+import timeline
+from snapper_common.testing import auth_headers
+
+def test_pulled_and_pushed_posts_merge_newest_first(client, add_user, following, create_post, read_feed):
+    add_user("alice", "bob", "carol", "dave")
+    following["alice"] = {"bob", "carol", "dave"}
+    # bob and carol are pulled at read time, dave is pushed to alice's timeline
+    timeline.timelines_table.put_item(Item={"username": timeline.PULL_PARTITION, "sort_key": "bob"})
+    timeline.timelines_table.put_item(Item={"username": timeline.PULL_PARTITION, "sort_key": "carol"})
+
+    expected = []
+    for i in range(3):
+        for author in ("bob", "carol", "dave", "alice"):
+            create_post(author, f"{author} {i}")
+            expected.insert(0, f"{author} {i}")
+
+    for limit in (1, 3, 5, 100):
+        texts, pages = read_feed("alice", limit)
+        assert texts == expected
+        assert pages >= -(-len(expected) // limit)
+
+def test_post_in_timeline_and_author_stream_is_served_once(client, add_user, following, create_post, read_feed):
+    add_user("alice", "bob")
+    following["alice"] = {"bob"}
+    create_post("bob", "pushed")
+    # bob becomes a pull author after the post was fanned out
+    timeline.timelines_table.put_item(Item={"username": timeline.PULL_PARTITION, "sort_key": "bob"})
+    timeline._pull_authors = None
+    create_post("bob", "pulled")
+
+    assert read_feed("alice", 10)[0] == ["pulled", "pushed"]
+
+def test_posts_of_unfollowed_authors_are_dropped(client, add_user, following, create_post):
+    add_user("alice", "bob")
+    following["alice"] = {"bob"}
+    create_post("bob", "bob 0")
+    following["alice"] = set()
+
+    response = client.get("/posts/", headers=auth_headers("alice"))
+    assert response.json()["posts"] == []
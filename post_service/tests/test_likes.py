@@ -0,0 +1,62 @@
+import pytest
+from botocore.exceptions import ClientError
+from snapper_common.testing import auth_headers
+import likes
+from database import posts_table, likes_table
+
+@pytest.fixture(params=["item", "sharded"])
+def like_mode(request, monkeypatch):
+    monkeypatch.setattr(likes, "LIKE_COUNTER_MODE", request.param)
+    return request.param
+
+def test_like_toggles(client, add_user, like_mode, create_post):
+    add_user("alice", "bob", "carol")
+    post_id = create_post("alice")
+
+    def like(username):
+        response = client.post(f"/posts/{post_id}/like", headers=auth_headers(username))
+        assert response.status_code == 200
+        return response.json()["liked"], response.json()["like_count"]
+
+    assert like("bob") == (True, 1)
+    assert like("carol") == (True, 2)
+    assert like("bob") == (False, 1)
+    assert like("bob") == (True, 2)
+
+def test_like_missing_post(client, add_user, like_mode):
+    add_user("alice")
+    assert client.post("/posts/missing/like", headers=auth_headers("alice")).status_code == 404
+
+def test_toggles_write_without_reading_the_post(client, add_user, like_mode, monkeypatch, create_post):
+    add_user("alice", "bob")
+    post_id = create_post("alice")
+
+    async def no_read(post_id):
+        raise AssertionError("post read before toggling")
+    monkeypatch.setattr(likes, "_post_expiry", no_read)
+
+    assert client.post(f"/posts/{post_id}/like", headers=auth_headers("bob")).json()["liked"] is True
+    assert client.post(f"/posts/{post_id}/like", headers=auth_headers("bob")).json()["liked"] is False
+
+def test_sharded_likes_of_pinned_posts_live_as_long_as_the_post(client, add_user, monkeypatch, create_post):
+    monkeypatch.setattr(likes, "LIKE_COUNTER_MODE", "sharded")
+    add_user("alice", "bob")
+    post_id = create_post("alice")
+    assert client.post(f"/posts/{post_id}/pin", headers=auth_headers("alice")).status_code == 200
+
+    response = client.post(f"/posts/{post_id}/like", headers=auth_headers("bob")).json()
+    assert (response["liked"], response["like_count"]) == (True, 1)
+    post = posts_table.get_item(Key={"post_id": post_id})["Item"]
+    like = likes_table.get_item(Key={"post_id": post_id, "username": "bob"})["Item"]
+    assert like["expires_at"] == post["expires_at"]
+
+def test_lost_races_are_a_conflict(client, add_user, monkeypatch, create_post):
+    add_user("alice", "bob")
+    post_id = create_post("alice")
+
+    async def always_conflicting(post_id, username):
+        raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+    monkeypatch.setattr(likes, "_like_item", always_conflicting)
+
+    response = client.post(f"/posts/{post_id}/like", headers=auth_headers("bob"))
+    assert response.status_code == 409
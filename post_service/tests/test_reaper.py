@@ -0,0 +1,85 @@
+import time
+import asyncio
+from snapper_common.aws import get_client
+from snapper_common.testing import TEST_ENV
+from database import posts_table, expiry_sweep_table, object_url
+import reaper as reaper_module
+from reaper import ExpiryReaper, WATERMARK_KEY, track_post, delete_post_objects, image_keys
+
+def add_post(post_id: str, expires_at: int, **attributes):
+    key = f"posts/{post_id}.jpg"
+    s3 = get_client("s3")
+    for object_key in image_keys([key]):
+        s3.put_object(Bucket=TEST_ENV["S3_BUCKET"], Key=object_key, Body=b"img")
+    post = {"post_id": post_id, "username": "bob", "expires_at": expires_at, "post_img_src": [object_url(key)], **attributes}
+    posts_table.put_item(Item=post)
+    asyncio.run(track_post(post))
+    return post
+
+def stored_keys():
+    response = get_client("s3").list_objects_v2(Bucket=TEST_ENV["S3_BUCKET"])
+    return {item["Key"] for item in response.get("Contents", [])}
+
+def sweep_entries():
+    return {item["post_id"] for item in expiry_sweep_table.scan()["Items"] if item["bucket"] != WATERMARK_KEY["bucket"]}
+
+def test_sweep_deletes_images_of_expired_posts_only():
+    now = int(time.time())
+    add_post("gone", now - 10)
+    add_post("extended", now - 10)
+    posts_table.update_item(Key={"post_id": "extended"}, UpdateExpression="SET expires_at = :e", ExpressionAttributeValues={":e": now + 3600})
+    add_post("live", now + 3600)
+
+    reaper = ExpiryReaper()
+    asyncio.run(reaper.sweep())
+
+    assert stored_keys() == set(image_keys(["posts/extended.jpg", "posts/live.jpg"]))
+    assert sweep_entries() == {"live"}
+    assert reaper.reaped_posts == 1
+    assert reaper.deleted_objects == len(image_keys(["posts/gone.jpg"]))
+
+def test_pinned_posts_are_not_tracked():
+    add_post("pinned", int(time.time()) - 10, pinned=True)
+    assert sweep_entries() == set()
+
+def test_deleted_post_objects_are_removed_with_their_entry():
+    post = add_post("deleted", int(time.time()) + 3600)
+    asyncio.run(delete_post_objects(post))
+    assert stored_keys() == set()
+    assert sweep_entries() == set()
+
+def test_sweep_resumes_from_the_watermark_after_an_outage(monkeypatch):
+    now = int(time.time())
+    current = now - now % 3600
+    monkeypatch.setattr(reaper_module, "REAPER_LOOKBACK_HOURS", 1)
+    asyncio.run(ExpiryReaper().sweep())
+    assert expiry_sweep_table.get_item(Key=WATERMARK_KEY)["Item"]["swept_until"] == current
+
+    # Three days down: the post expired long before the lookback window
+    expiry_sweep_table.put_item(Item={**WATERMARK_KEY, "swept_until": current - 72 * 3600})
+    add_post("old", now - 70 * 3600)
+    asyncio.run(ExpiryReaper().sweep())
+
+    assert stored_keys() == set()
+    assert sweep_entries() == set()
+    assert expiry_sweep_table.get_item(Key=WATERMARK_KEY)["Item"]["swept_until"] == current
+
+def test_unexpected_errors_do_not_stop_the_reaper(monkeypatch):
+    monkeypatch.setattr(reaper_module, "REAPER_INTERVAL", 0.01)
+    sweeps = 0
+
+    async def failing_sweep(self):
+        nonlocal sweeps
+        sweeps += 1
+        raise KeyError("boom")
+    monkeypatch.setattr(ExpiryReaper, "sweep", failing_sweep)
+
+    async def scenario():
+        reaper = ExpiryReaper()
+        task = asyncio.create_task(reaper._run())
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(scenario())
+    assert sweeps > 1
@@ -0,0 +1,46 @@
+import asyncio
+from snapper_common.testing import auth_headers
+import timeline
+from database import users_table
+
+def feed(client, username):
+    return [post["post_text"] for post in client.get("/posts/", headers=auth_headers(username)).json()["posts"]]
+
+def test_follow_backfills_and_unfollow_removes(client, add_user, following, monkeypatch, create_post):
+    monkeypatch.setattr(timeline, "TIMELINE_BACKFILL_LIMIT", 2)
+    add_user("alice", "bob")
+    create_post("bob", "pinned", pinned=True)
+    for i in range(3):
+        create_post("bob", f"bob {i}")
+
+    # user_service calls this right after alice follows bob
+    following["alice"] = {"bob"}
+    response = client.post("/posts/timeline/bob", headers=auth_headers("alice"))
+    assert response.status_code == 200
+    assert feed(client, "alice") == ["pinned", "bob 2", "bob 1"]
+
+    following["alice"] = set()
+    assert client.delete("/posts/timeline/bob", headers=auth_headers("alice")).status_code == 200
+    following["alice"] = {"bob"}
+    assert feed(client, "alice") == []
+
+def test_pull_authors_are_not_backfilled(client, add_user, monkeypatch, create_post):
+    add_user("alice", "bob")
+    create_post("bob", "bob 0")
+    monkeypatch.setattr(timeline, "_pull_authors", {"bob"})
+    monkeypatch.setattr(timeline, "_pull_authors_expires", float("inf"))
+
+    assert client.post("/posts/timeline/bob", headers=auth_headers("alice")).json()["entries"] == 0
+
+def test_large_authors_become_pull_authors_without_listing_followers(client, add_user, following, monkeypatch):
+    monkeypatch.setattr(timeline, "FANOUT_FOLLOWER_THRESHOLD", 2)
+    add_user("alice", "bob")
+    following["alice"] = {"bob"}
+    users_table.update_item(Key={"username": "bob"}, UpdateExpression="SET follower_count = :n", ExpressionAttributeValues={":n": 3})
+
+    async def no_listing(authorization: str):
+        raise AssertionError("follower list fetched")
+    monkeypatch.setattr(timeline, "fetch_followers", no_listing)
+
+    client.post("/posts/", data={"post_text": "hello"}, headers=auth_headers("bob"))
+    assert "bob" in asyncio.run(timeline.get_pull_authors())
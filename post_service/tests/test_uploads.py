@@ -0,0 +1,46 @@
+from snapper_common.aws import get_client
+from snapper_common.testing import auth_headers
+from database import S3_BUCKET
+
+def presign(client, username, count=1):
+    response = client.post(
+        "/posts/uploads",
+        json={"files": [{"content_type": "image/png", "size": 3}] * count, "method": "put"},
+        headers=auth_headers(username)
+    )
+    assert response.status_code == 200
+    keys = [upload["key"] for upload in response.json()["uploads"]]
+    # Stand-in for the client's direct PUT to S3
+    for key in keys:
+        get_client("s3").put_object(Bucket=S3_BUCKET, Key=key, Body=b"png", ContentType="image/png")
+    return keys
+
+def commit(client, username, keys):
+    return client.post("/posts/commit", json={"post_text": "hi", "keys": keys}, headers=auth_headers(username))
+
+def test_presigned_key_backs_one_post(client, add_user):
+    add_user("alice")
+    keys = presign(client, "alice", count=2)
+
+    first = commit(client, "alice", keys)
+    assert first.status_code == 200
+    assert len(first.json()["post"]["post_img_src"]) == 2
+
+    second = commit(client, "alice", keys[:1])
+    assert second.status_code == 400
+    assert second.json()["detail"] == "Upload already used or expired."
+
+def test_key_without_reservation_is_rejected(client, add_user):
+    add_user("alice")
+    key = "posts/alice/uploaded-around-the-api.png"
+    get_client("s3").put_object(Bucket=S3_BUCKET, Key=key, Body=b"png", ContentType="image/png")
+
+    assert commit(client, "alice", [key]).status_code == 400
+
+def test_failed_commit_leaves_other_keys_usable(client, add_user):
+    add_user("alice")
+    used, fresh = presign(client, "alice"), presign(client, "alice")
+    assert commit(client, "alice", used).status_code == 200
+
+    assert commit(client, "alice", fresh + used).status_code == 400
+    assert commit(client, "alice", fresh).status_code == 200
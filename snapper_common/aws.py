@@ -0,0 +1,99 @@
+import os
+import boto3
+import threading
+from dotenv import load_dotenv
+from botocore.config import Config
+from snapper_common.storage import STORAGE_MAX_WORKERS
+
+load_dotenv()
+
+# Check AWS credentials
+AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
+AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
+AWS_REGION = os.getenv("AWS_REGION")
+
+if not AWS_ACCESS_KEY or not AWS_SECRET_KEY:
+    raise RuntimeError("AWS_ACCESS_KEY_ID or AWS_SECRET_ACCESS_KEY environment variable is not set.")
+
+# One connection per storage worker plus headroom for threads outside the storage executor
+# (table bootstrap, scripts). botocore's default pool of 10 would queue the storage workers.
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", str(STORAGE_MAX_WORKERS + 8)))
+AWS_CONNECT_TIMEOUT = float(os.getenv("AWS_CONNECT_TIMEOUT", "2"))
+AWS_READ_TIMEOUT = float(os.getenv("AWS_READ_TIMEOUT", "10"))
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "5"))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "adaptive")
+
+client_config = Config(
+    region_name=AWS_REGION,
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    tcp_keepalive=True,
+    connect_timeout=AWS_CONNECT_TIMEOUT,
+    read_timeout=AWS_READ_TIMEOUT,
+    retries={"mode": AWS_RETRY_MODE, "max_attempts": AWS_MAX_ATTEMPTS}
+)
+
+# Process-wide session, clients and resources, created on first use. Clients are thread safe
+# and shared by every storage worker, so each process keeps one warm connection pool per client.
+_lock = threading.Lock()
+_session = None
+_clients = {}
+_resources = {}
+
+def get_session():
+    global _session
+    with _lock:
+        if _session is None:
+            _session = boto3.session.Session(
+                aws_access_key_id=AWS_ACCESS_KEY,
+                aws_secret_access_key=AWS_SECRET_KEY,
+                region_name=AWS_REGION
+            )
+        return _session
+
+def get_resource(service_name: str):
+    resource = _resources.get(service_name)
+    if resource is None:
+        session = get_session()
+        with _lock:
+            if service_name not in _resources:
+                _resources[service_name] = session.resource(service_name, config=client_config)
+            resource = _resources[service_name]
+    return resource
+
+# Low-level client: parameters go to the wire as given, so DynamoDB values must already be in
+# attribute-value form (see snapper_common.dynamo.serialize). A resource's meta.client is not a
+# substitute, it runs the resource's parameter transformation and would serialize them twice.
+def get_client(service_name: str, endpoint_url: str = None):
+    key = (service_name, endpoint_url)
+    client = _clients.get(key)
+    if client is None:
+        session = get_session()
+        with _lock:
+            if key not in _clients:
+                _clients[key] = session.client(service_name, endpoint_url=endpoint_url, config=client_config)
+            client = _clients[key]
+    return client
+
+# Stand-in for a boto3 object that is built on first attribute access, lets modules
+# declare their tables and clients at import time without touching the network
+class LazyProxy:
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+
+    def _resolve(self):
+        if self._target is None:
+            self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+def lazy_resource(service_name: str):
+    return LazyProxy(lambda: get_resource(service_name))
+
+def lazy_client(service_name: str, endpoint_url: str = None):
+    return LazyProxy(lambda: get_client(service_name, endpoint_url))
+
+def lazy_table(table_name: str):
+    return LazyProxy(lambda: get_resource("dynamodb").Table(table_name))
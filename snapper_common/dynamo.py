@@ -0,0 +1,115 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from boto3.dynamodb.types import TypeSerializer
+from snapper_common.aws import get_client
+
+load_dotenv()
+
+# Create missing tables when a service starts, off for deployments where tables are provisioned elsewhere
+SCHEMA_BOOTSTRAP = os.getenv("SCHEMA_BOOTSTRAP", "true").lower() == "true"
+
+# Low-level attribute values for TransactWriteItems
+_serializer = TypeSerializer()
+
+def serialize(values: dict):
+    return {k: _serializer.serialize(v) for k, v in values.items()}
+
+# Codes of a cancelled transaction, one per action in request order
+def cancellation_reasons(error: ClientError):
+    if error.response["Error"]["Code"] != "TransactionCanceledException":
+        return None
+    return [reason.get("Code") for reason in error.response.get("CancellationReasons", [])]
+
+def _error_code(error: ClientError):
+    return error.response["Error"]["Code"]
+
+# Enable TTL on the table
+def enable_ttl(table_name: str, ttl_attribute: str = "expires_at"):
+    client = get_client("dynamodb")
+    try:
+        desc = client.describe_time_to_live(TableName=table_name)
+        if desc["TimeToLiveDescription"]["TimeToLiveStatus"] in ("ENABLED", "ENABLING"):
+            print(f"TTL already enabled on '{table_name}'.")
+            return
+    except ClientError as e:
+        print(f"TTL error: {e}")
+    try:
+        client.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={
+                "Enabled": True,
+                "AttributeName": ttl_attribute
+            }
+        )
+        print(f"TTL enabled on '{table_name}' using attribute '{ttl_attribute}'.")
+    except ClientError as e:
+        print(f"Enable TTL error: {e}")
+
+# CreateTable arguments of a table plus its TTL attribute, billed on demand unless told otherwise
+class TableSchema:
+    def __init__(self, ttl_attribute: str = None, **definition):
+        self.ttl_attribute = ttl_attribute
+        self.definition = {"BillingMode": "PAY_PER_REQUEST", **definition}
+
+    @property
+    def name(self):
+        return self.definition["TableName"]
+
+# Create the table unless it exists. An existing table costs a single DescribeTable
+# (plus DescribeTimeToLive for TTL tables) instead of listing every table in the account,
+# and a replica that loses the creation race just waits for the winner's table.
+def ensure_table(schema: TableSchema):
+    client = get_client("dynamodb")
+    try:
+        try:
+            client.describe_table(TableName=schema.name)
+            print(f"Table '{schema.name}' already exists.")
+        except ClientError as e:
+            if _error_code(e) != "ResourceNotFoundException":
+                raise
+            try:
+                client.create_table(**schema.definition)
+                print(f"Table '{schema.name}' created.")
+            except ClientError as e:
+                if _error_code(e) != "ResourceInUseException":
+                    raise
+            client.get_waiter("table_exists").wait(TableName=schema.name)
+            print(f"Table '{schema.name}' ready to use.")
+
+        if schema.ttl_attribute:
+            enable_ttl(schema.name, schema.ttl_attribute)
+    except ClientError as e:
+        print(f"Create table error: {e}")
+
+# Blocking variant for the create_*_table scripts
+def create_tables(*schemas: TableSchema):
+    for schema in schemas:
+        ensure_table(schema)
+
+# Ensures the service's tables next to the running app instead of before it, so workers
+# accept traffic right away. Requests that touch a table that is still being created fail
+# like any other storage error until it is ACTIVE.
+class SchemaBootstrap:
+    def __init__(self, *schemas: TableSchema):
+        self.schemas = schemas
+        self.done = False
+        self._task = None
+
+    def start(self):
+        if SCHEMA_BOOTSTRAP and self.schemas and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run(self):
+        await asyncio.gather(*(asyncio.to_thread(ensure_table, schema) for schema in self.schemas))
+        self.done = True
@@ -0,0 +1,82 @@
+import os
+import random
+import asyncio
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool, keep-alive, timeout and retry settings for inter-service calls
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "50"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "5"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.1"))
+
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+class ServiceResponse:
+    def __init__(self, status: int, data):
+        self.status = status
+        self.data = data
+
+# One pooled aiohttp session per process, opened on startup and closed on shutdown
+class ServiceClient:
+    def __init__(self):
+        self._session = None
+
+    async def start(self):
+        if self._session is not None:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT)
+        )
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            raise RuntimeError("HTTP client is not started")
+        return self._session
+
+    # Send a request and return status + parsed body. Idempotent requests are
+    # retried on connection errors and 502/503/504 with jittered exponential backoff.
+    async def request(self, method: str, url: str, timeout: float = None, retries: int = None, **kwargs):
+        method = method.upper()
+        if retries is None:
+            retries = HTTP_RETRIES if method in IDEMPOTENT_METHODS else 0
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        attempt = 0
+        while True:
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    if resp.status in RETRY_STATUSES and attempt < retries:
+                        raise aiohttp.ServerConnectionError(f"Retryable status {resp.status}")
+                    try:
+                        data = await resp.json(content_type=None)
+                    except ValueError:
+                        data = {"detail": await resp.text()}
+                    return ServiceResponse(resp.status, data)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= retries:
+                    raise
+                delay = HTTP_RETRY_BACKOFF * (2 ** attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+                attempt += 1
+
+http_client = ServiceClient()
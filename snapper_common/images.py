@@ -0,0 +1,88 @@
+import io
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from snapper_common.storage import AsyncStorage, run_storage
+from snapper_common.s3 import S3_BUCKET, s3_client, object_url
+
+load_dotenv()
+
+# Longest edge of each size class, every variant is stored as WebP next to the original
+IMAGE_SIZES = {
+    "thumb": int(os.getenv("IMAGE_THUMB_SIZE", "320")),
+    "medium": int(os.getenv("IMAGE_MEDIUM_SIZE", "1080"))
+}
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_TIMEOUT", "60"))
+
+s3_store = AsyncStorage(s3_client)
+
+# Decoding and resizing is CPU bound, it runs in worker processes off the event loop.
+# Workers are spawned rather than forked so they don't inherit the event loop and client pools.
+_image_pool = None
+
+def _get_image_pool():
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _image_pool
+
+def close_image_pool():
+    global _image_pool
+    if _image_pool is not None:
+        _image_pool.shutdown(wait=False, cancel_futures=True)
+        _image_pool = None
+
+def variant_key(key: str, size: str):
+    return f"{key.rsplit('.', 1)[0]}_{size}.webp"
+
+# Runs in a worker process: resize the original to every size class and encode as WebP
+def render_variants(data: bytes, sizes: dict, quality: int):
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        variants = {}
+        for size, edge in sizes.items():
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, format="WEBP", quality=quality, method=4)
+            variants[size] = buffer.getvalue()
+        return variants
+
+def _read_object(key: str):
+    return s3_client.get_object(Bucket=S3_BUCKET, Key=key)["Body"].read()
+
+# Build and store the variants of an uploaded image, returns {size class: url}
+async def generate_variants(key: str):
+    data = await run_storage(_read_object, key, timeout=IMAGE_TIMEOUT)
+
+    rendered = await asyncio.wait_for(
+        asyncio.get_running_loop().run_in_executor(_get_image_pool(), render_variants, data, IMAGE_SIZES, IMAGE_WEBP_QUALITY),
+        IMAGE_TIMEOUT
+    )
+
+    async def store(size, body):
+        await s3_store.put_object(
+            Bucket=S3_BUCKET,
+            Key=variant_key(key, size),
+            Body=body,
+            ContentType="image/webp",
+            CacheControl="public, max-age=31536000, immutable"
+        )
+
+    await asyncio.gather(*(store(size, body) for size, body in rendered.items()))
+    return {size: object_url(variant_key(key, size)) for size in rendered}
+
+# Pick the URL of a size class, falls back to the original while variants are missing
+def sized_url(url: str, variants: dict, size: str):
+    if not size or size == "original" or not variants:
+        return url
+    return variants.get(size, url)
@@ -0,0 +1,86 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from snapper_common.aws import lazy_table
+from snapper_common.storage import AsyncStorage
+from snapper_common.dynamo import TableSchema
+
+load_dotenv()
+
+# Per-user inbox: one row per conversation partner with the last message and unread count.
+# Created by message_service, updated by message_service and the WS service for every stored DM.
+inbox_table_name = "Inbox"
+inbox_last_activity_index = "LastActivityIndex"
+inbox_table = lazy_table(inbox_table_name)
+inbox_store = AsyncStorage(inbox_table)
+
+# The LSI lists a user's conversations by last activity
+inbox_schema = TableSchema(
+    TableName=inbox_table_name,
+    KeySchema=[
+        {"AttributeName": "username", "KeyType": "HASH"},
+        {"AttributeName": "other_user", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "username", "AttributeType": "S"},
+        {"AttributeName": "other_user", "AttributeType": "S"},
+        {"AttributeName": "last_activity", "AttributeType": "S"},
+    ],
+    LocalSecondaryIndexes=[
+        {
+            "IndexName": inbox_last_activity_index,
+            "KeySchema": [
+                {"AttributeName": "username", "KeyType": "HASH"},
+                {"AttributeName": "last_activity", "KeyType": "RANGE"}
+            ],
+            "Projection": {"ProjectionType": "ALL"}
+        }
+    ],
+    ttl_attribute="expires_at"
+)
+
+# Characters of the last message kept on the inbox row
+INBOX_PREVIEW_LENGTH = int(os.getenv("INBOX_PREVIEW_LENGTH", "100"))
+
+def _is_conditional_failure(error: ClientError):
+    return error.response["Error"]["Code"] == "ConditionalCheckFailedException"
+
+# Move one side of the conversation to the new message. The row expires with
+# the message it previews, so the inbox follows the 24h message TTL.
+async def _update_row(owner: str, other_user: str, item: dict, unread: bool):
+    values = {
+        ":t": item["created_at"],
+        ":mid": item["message_id"],
+        ":sender": item["sender"],
+        ":preview": item["content"][:INBOX_PREVIEW_LENGTH],
+        ":exp": int(item["expires_at"]),
+        ":n": 1 if unread else 0
+    }
+    update = "SET last_activity = :t, last_message_id = :mid, last_sender = :sender, preview = :preview, expires_at = :exp"
+    # The recipient gains an unread message, the sender has obviously read the conversation
+    update += " ADD unread_count :n" if unread else ", unread_count = :n"
+    try:
+        await inbox_store.update_item(
+            Key={"username": owner, "other_user": other_user},
+            UpdateExpression=update,
+            # A message that lands after a newer one must not roll the preview back
+            ConditionExpression="attribute_not_exists(last_activity) OR last_activity <= :t",
+            ExpressionAttributeValues=values
+        )
+    except ClientError as e:
+        if not _is_conditional_failure(e):
+            raise
+        if unread:
+            await inbox_store.update_item(
+                Key={"username": owner, "other_user": other_user},
+                UpdateExpression="ADD unread_count :n",
+                ExpressionAttributeValues={":n": 1}
+            )
+
+# Reflect a stored message in both participants' inboxes
+async def record_message(item: dict):
+    await asyncio.gather(
+        _update_row(item["sender"], item["recipient"], item, unread=False),
+        _update_row(item["recipient"], item["sender"], item, unread=True)
+    )
@@ -0,0 +1,28 @@
+import os
+from dotenv import load_dotenv
+from snapper_common.aws import AWS_REGION, lazy_client
+
+load_dotenv()
+
+S3_BUCKET = os.getenv("S3_BUCKET")
+
+# Optional S3-compatible endpoint (e.g. a local MinIO) and the public base URL objects are served from
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_PUBLIC_URL = os.getenv("S3_PUBLIC_URL") or None
+
+s3_client = lazy_client("s3", endpoint_url=S3_ENDPOINT_URL)
+
+# Public URL of an uploaded object
+def object_url(key: str):
+    if S3_PUBLIC_URL:
+        return f"{S3_PUBLIC_URL.rstrip('/')}/{key}"
+    if S3_ENDPOINT_URL:
+        return f"{S3_ENDPOINT_URL.rstrip('/')}/{S3_BUCKET}/{key}"
+    return f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{key}"
+
+# Object key of a URL built by object_url (also accepts the legacy amazonaws URLs)
+def object_key(url: str):
+    for base in (S3_PUBLIC_URL, f"{S3_ENDPOINT_URL}/{S3_BUCKET}" if S3_ENDPOINT_URL else None):
+        if base and url.startswith(base.rstrip("/") + "/"):
+            return url[len(base.rstrip("/")) + 1:]
+    return url.split(".amazonaws.com/")[-1]
@@ -0,0 +1,143 @@
+import os
+import time
+import jwt
+import asyncio
+import aiohttp
+from collections import OrderedDict
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from fastapi import HTTPException, Request
+from snapper_common.http_client import http_client
+from snapper_common.storage import StorageTimeoutError
+
+load_dotenv()
+
+# .env variables
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM")
+AUTH_PATH = os.getenv("AUTH_PATH")
+AUTH_REMOTE_FALLBACK = os.getenv("AUTH_REMOTE_FALLBACK", "false").lower() == "true"
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+# A cached token_epoch is trusted for this long when verifying a token, which bounds how long
+# a revoked token keeps working here (same knob and default as auth_service)
+AUTH_EPOCH_CACHE_TTL = float(os.getenv("AUTH_EPOCH_CACHE_TTL", "5"))
+
+# Bounded LRU of "user exists" lookups, entries expire after ttl seconds
+class UserCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+
+    def get(self, username: str):
+        entry = self._items.get(username)
+        if entry is None:
+            return None
+        expires, user = entry
+        if expires < time.monotonic():
+            self._items.pop(username, None)
+            return None
+        self._items.move_to_end(username)
+        return user
+
+    def set(self, username: str, user: dict):
+        self._items[username] = (time.monotonic() + self.ttl, user)
+        self._items.move_to_end(username)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def invalidate(self, username: str):
+        self._items.pop(username, None)
+
+# Read the bearer token from the Authorization header
+def get_bearer_token(request: Request):
+    header = request.headers.get("Authorization")
+    if not header or not header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Token not found")
+    return header.split("Bearer ")[1]
+
+# Call auth service to verify user token (used only as a fallback)
+async def verify_remote(token: str):
+    try:
+        resp = await http_client.request("GET", AUTH_PATH, headers={"Authorization": f"Bearer {token}"})
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        raise HTTPException(status_code=503, detail="Auth service unavailable")
+    if resp.status != 200:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return resp.data
+
+# Verifies JWTs locally (signature + exp) and checks that the user still exists.
+# Usable directly as a FastAPI dependency.
+class TokenVerifier:
+    def __init__(self, users_store, remote_fallback: bool = AUTH_REMOTE_FALLBACK):
+        self.users_store = users_store
+        self.remote_fallback = remote_fallback
+        self.cache = UserCache(AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL)
+
+    async def __call__(self, request: Request):
+        return await self.verify(get_bearer_token(request))
+
+    async def verify(self, token: str):
+        if not JWT_SECRET_KEY:
+            if self.remote_fallback:
+                return await verify_remote(token)
+            raise HTTPException(status_code=500, detail="Token verification is not configured")
+
+        try:
+            payload = jwt.decode(
+                token,
+                JWT_SECRET_KEY,
+                algorithms=[JWT_ALGORITHM],
+                options={"require": ["exp", "sub"]}
+            )
+        except jwt.ExpiredSignatureError:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        except jwt.InvalidTokenError:
+            # Signature mismatch can mean the secret was rotated, let auth service decide
+            if self.remote_fallback:
+                return await verify_remote(token)
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        username = payload["sub"]
+        try:
+            user = await self.load_user(username, max_age=AUTH_EPOCH_CACHE_TTL)
+        except (ClientError, StorageTimeoutError):
+            if self.remote_fallback:
+                return await verify_remote(token)
+            raise HTTPException(status_code=503, detail="Failed to verify user")
+
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid token")
+
+        # Tokens issued before the user's last revocation carry an older epoch
+        if int(payload.get("epoch", 0)) < user["token_epoch"]:
+            raise HTTPException(status_code=401, detail="Token revoked")
+
+        return {"username": user["username"], "email": user["email"]}
+
+    # Return {"username", "email", "token_epoch"} for an existing user, None otherwise.
+    # max_age re-reads entries cached longer ago than that, for checks that need a fresh epoch.
+    async def load_user(self, username: str, max_age: float = None):
+        user = self.cache.get(username)
+        if user is not None and (max_age is None or time.monotonic() - user["loaded_at"] <= max_age):
+            return user
+
+        response = await self.users_store.get_item(
+            Key={"username": username},
+            ProjectionExpression="username, email, token_epoch"
+        )
+        item = response.get("Item")
+        if not item:
+            self.cache.invalidate(username)
+            return None
+
+        user = {
+            "username": item["username"],
+            "email": item.get("email"),
+            "token_epoch": int(item.get("token_epoch", 0)),
+            "loaded_at": time.monotonic()
+        }
+        self.cache.set(username, user)
+
+        return user
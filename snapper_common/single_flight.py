@@ -0,0 +1,45 @@
+import copy
+import asyncio
+from functools import wraps
+
+# Single-flight: concurrent identical reads share one in-flight backend call and its result.
+# Only calls that overlap are collapsed, nothing is served after the call completes.
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.collapsed = 0
+        self._inflight = {}
+
+    async def do(self, key, fn, *args, **kwargs):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.collapsed += 1
+            # Callers may mutate what they get back, followers receive their own copy
+            return copy.deepcopy(await asyncio.shield(future))
+
+        self.calls += 1
+        future = asyncio.ensure_future(fn(*args, **kwargs))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+single_flight_groups = []
+
+# Decorator for async storage accessors, key_fn maps the call arguments to the coalescing key
+def single_flight(key_fn=None):
+    def decorator(fn):
+        group = SingleFlight(fn.__name__)
+        single_flight_groups.append(group)
+
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = key_fn(*args, **kwargs) if key_fn else repr((args, sorted(kwargs.items())))
+            return await group.do(key, fn, *args, **kwargs)
+
+        wrapper.flight = group
+        return wrapper
+    return decorator
+
+def single_flight_metrics():
+    return {group.name: {"calls": group.calls, "collapsed": group.collapsed} for group in single_flight_groups}
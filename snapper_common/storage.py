@@ -0,0 +1,50 @@
+import os
+import asyncio
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Non-blocking storage layer: boto3 calls run on a bounded executor so the
+# event loop never waits on DynamoDB/S3, with a concurrency cap and per-call timeout
+STORAGE_MAX_WORKERS = int(os.getenv("STORAGE_MAX_WORKERS", "32"))
+STORAGE_MAX_CONCURRENCY = int(os.getenv("STORAGE_MAX_CONCURRENCY", "64"))
+STORAGE_TIMEOUT = float(os.getenv("STORAGE_TIMEOUT", "10"))
+
+storage_executor = ThreadPoolExecutor(max_workers=STORAGE_MAX_WORKERS, thread_name_prefix="storage")
+_storage_semaphore = None
+
+class StorageTimeoutError(Exception):
+    pass
+
+def _get_storage_semaphore():
+    global _storage_semaphore
+    if _storage_semaphore is None:
+        _storage_semaphore = asyncio.Semaphore(STORAGE_MAX_CONCURRENCY)
+    return _storage_semaphore
+
+# Run a blocking boto3 call on the storage executor
+async def run_storage(fn, *args, timeout: float = None, **kwargs):
+    async with _get_storage_semaphore():
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(storage_executor, partial(fn, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, timeout or STORAGE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise StorageTimeoutError(f"{getattr(fn, '__name__', 'storage call')} timed out")
+
+# Async facade over a boto3 Table or client, every method call goes through run_storage
+class AsyncStorage:
+    def __init__(self, target):
+        self._target = target
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        async def call(*args, **kwargs):
+            return await run_storage(attr, *args, **kwargs)
+
+        return call
@@ -0,0 +1,38 @@
+# Shared pytest setup for the service suites: fake credentials, an in-memory AWS (moto)
+# per test and token helpers. Imported by each service's tests/conftest.py, never by the apps.
+import os
+import time
+
+TEST_ENV = {
+    "AWS_ACCESS_KEY_ID": "testing",
+    "AWS_SECRET_ACCESS_KEY": "testing",
+    "AWS_REGION": "us-east-1",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "S3_BUCKET": "snapper-test",
+    "JWT_SECRET_KEY": "test-secret",
+    "JWT_ALGORITHM": "HS256",
+    "BCRYPT_ROUNDS": "4",
+    "REAPER_ENABLED": "false",
+    "SCHEMA_BOOTSTRAP": "false"
+}
+# Set before any service module reads its configuration
+os.environ.update(TEST_ENV)
+
+import jwt
+import pytest
+from moto import mock_aws
+from snapper_common.aws import get_client
+
+def make_token(username: str, epoch: int = 0, expires_in: int = 3600):
+    payload = {"sub": username, "exp": int(time.time()) + expires_in, "epoch": epoch}
+    return jwt.encode(payload, TEST_ENV["JWT_SECRET_KEY"], algorithm=TEST_ENV["JWT_ALGORITHM"])
+
+def auth_headers(username: str, epoch: int = 0):
+    return {"Authorization": f"Bearer {make_token(username, epoch)}"}
+
+# Fresh moto backend with the S3 bucket, tables are created by each suite's own fixture
+@pytest.fixture(autouse=True)
+def aws():
+    with mock_aws():
+        get_client("s3").create_bucket(Bucket=TEST_ENV["S3_BUCKET"])
+        yield
@@ -0,0 +1,69 @@
+import asyncio
+from snapper_common.aws import get_client, get_resource, lazy_table
+from snapper_common.dynamo import TableSchema, SchemaBootstrap, ensure_table, serialize, cancellation_reasons
+from snapper_common.storage import AsyncStorage
+
+def things_schema(ttl_attribute=None):
+    return TableSchema(
+        TableName="Things",
+        KeySchema=[{"AttributeName": "thing_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "thing_id", "AttributeType": "S"}],
+        ttl_attribute=ttl_attribute
+    )
+
+def test_low_level_client_is_not_the_resource_client():
+    assert get_client("dynamodb") is not get_resource("dynamodb").meta.client
+    assert get_client("dynamodb") is get_client("dynamodb")
+
+def test_serialized_transaction_round_trips():
+    ensure_table(things_schema())
+    client = AsyncStorage(get_client("dynamodb"))
+
+    asyncio.run(client.transact_write_items(TransactItems=[{"Put": {
+        "TableName": "Things",
+        "Item": serialize({"thing_id": "a", "count": 2, "tags": {"x"}}),
+        "ConditionExpression": "attribute_not_exists(thing_id)"
+    }}]))
+
+    item = lazy_table("Things").get_item(Key={"thing_id": "a"})["Item"]
+    assert item == {"thing_id": "a", "count": 2, "tags": {"x"}}
+
+def test_cancellation_reasons_follow_action_order():
+    ensure_table(things_schema())
+    lazy_table("Things").put_item(Item={"thing_id": "taken"})
+    client = get_client("dynamodb")
+
+    try:
+        client.transact_write_items(TransactItems=[
+            {"Put": {"TableName": "Things", "Item": serialize({"thing_id": "free"}), "ConditionExpression": "attribute_not_exists(thing_id)"}},
+            {"Put": {"TableName": "Things", "Item": serialize({"thing_id": "taken"}), "ConditionExpression": "attribute_not_exists(thing_id)"}}
+        ])
+    except client.exceptions.TransactionCanceledException as e:
+        assert cancellation_reasons(e) == ["None", "ConditionalCheckFailed"]
+    else:
+        raise AssertionError("transaction should have been cancelled")
+
+def test_ensure_table_is_idempotent_and_enables_ttl():
+    schema = things_schema(ttl_attribute="expires_at")
+    ensure_table(schema)
+    ensure_table(schema)
+
+    client = get_client("dynamodb")
+    assert client.describe_table(TableName="Things")["Table"]["TableStatus"] == "ACTIVE"
+    ttl = client.describe_time_to_live(TableName="Things")["TimeToLiveDescription"]
+    assert ttl["TimeToLiveStatus"] == "ENABLED"
+    assert ttl["AttributeName"] == "expires_at"
+
+def test_schema_bootstrap_runs_in_the_background(monkeypatch):
+    monkeypatch.setattr("snapper_common.dynamo.SCHEMA_BOOTSTRAP", True)
+    bootstrap = SchemaBootstrap(things_schema())
+
+    async def run():
+        bootstrap.start()
+        assert not bootstrap.done
+        await bootstrap._task
+        await bootstrap.close()
+
+    asyncio.run(run())
+    assert bootstrap.done
+    assert "Things" in get_client("dynamodb").list_tables()["TableNames"]
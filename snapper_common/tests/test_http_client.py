@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from aiohttp import web
+import snapper_common.http_client as http_client_module
+from snapper_common.http_client import ServiceClient
+
+# Local server that answers with the scripted statuses in order, then 200
+async def serve(statuses, requests):
+    async def handler(request):
+        requests.append(request.method)
+        status = statuses.pop(0) if statuses else 200
+        return web.json_response({"ok": status == 200}, status=status)
+
+    app = web.Application()
+    app.router.add_route("*", "/", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/"
+
+def call(method, statuses, **kwargs):
+    async def scenario():
+        requests = []
+        runner, url = await serve(list(statuses), requests)
+        client = ServiceClient()
+        await client.start()
+        try:
+            response = await client.request(method, url, **kwargs)
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return response, requests
+    return asyncio.run(scenario())
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(http_client_module, "HTTP_RETRY_BACKOFF", 0.001)
+
+def test_idempotent_requests_retry_unavailable_upstream():
+    response, requests = call("GET", [503, 502])
+    assert response.status == 200
+    assert response.data == {"ok": True}
+    assert requests == ["GET", "GET", "GET"]
+
+def test_retries_are_bounded():
+    response, requests = call("GET", [503, 503, 503, 503], retries=1)
+    assert response.status == 503
+    assert len(requests) == 2
+
+def test_post_is_not_retried():
+    response, requests = call("POST", [503])
+    assert response.status == 503
+    assert requests == ["POST"]
+
+def test_session_is_reused_across_requests():
+    async def scenario():
+        requests = []
+        runner, url = await serve([], requests)
+        client = ServiceClient()
+        await client.start()
+        session = client.session
+        await client.request("GET", url)
+        await client.request("GET", url)
+        reused = client.session is session
+        await client.close()
+        await runner.cleanup()
+        return reused, len(requests)
+
+    assert asyncio.run(scenario()) == (True, 2)
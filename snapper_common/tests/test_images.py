@@ -0,0 +1,31 @@
+import io
+import asyncio
+import pytest
+from PIL import Image
+from snapper_common.aws import get_client
+from snapper_common.s3 import S3_BUCKET, object_url
+from snapper_common.images import generate_variants, close_image_pool, sized_url, variant_key, IMAGE_SIZES
+
+@pytest.fixture
+def image_pool():
+    yield
+    close_image_pool()
+
+def test_generate_variants_stores_webp_per_size_class(image_pool):
+    buffer = io.BytesIO()
+    Image.new("RGB", (2000, 1000), "red").save(buffer, format="PNG")
+    get_client("s3").put_object(Bucket=S3_BUCKET, Key="users/alice/pic.png", Body=buffer.getvalue())
+
+    variants = asyncio.run(generate_variants("users/alice/pic.png"))
+
+    assert variants == {size: object_url(variant_key("users/alice/pic.png", size)) for size in IMAGE_SIZES}
+    thumb = get_client("s3").get_object(Bucket=S3_BUCKET, Key="users/alice/pic_thumb.webp")
+    assert thumb["ContentType"] == "image/webp"
+    with Image.open(io.BytesIO(thumb["Body"].read())) as image:
+        assert image.size == (IMAGE_SIZES["thumb"], IMAGE_SIZES["thumb"] // 2)
+
+def test_sized_url_falls_back_to_original():
+    variants = {"thumb": "t.webp", "medium": "m.webp"}
+    assert sized_url("o.png", variants, "thumb") == "t.webp"
+    assert sized_url("o.png", variants, "original") == "o.png"
+    assert sized_url("o.png", None, "thumb") == "o.png"
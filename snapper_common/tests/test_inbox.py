@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from snapper_common.dynamo import create_tables
+from snapper_common.inbox import inbox_schema, inbox_table, record_message
+
+@pytest.fixture(autouse=True)
+def tables():
+    create_tables(inbox_schema)
+
+def message(sender, recipient, created_at, content):
+    return {
+        "sender": sender,
+        "recipient": recipient,
+        "created_at": created_at,
+        "message_id": f"{sender}-{created_at}",
+        "content": content,
+        "expires_at": 2000000000
+    }
+
+def row(owner, other_user):
+    return inbox_table.get_item(Key={"username": owner, "other_user": other_user})["Item"]
+
+def test_record_message_updates_both_sides():
+    asyncio.run(record_message(message("alice", "bob", "2026-01-01T00:00:01", "hi")))
+    asyncio.run(record_message(message("alice", "bob", "2026-01-01T00:00:02", "there")))
+
+    assert row("bob", "alice")["unread_count"] == 2
+    assert row("bob", "alice")["preview"] == "there"
+    assert row("alice", "bob")["unread_count"] == 0
+
+def test_late_message_counts_but_keeps_newer_preview():
+    asyncio.run(record_message(message("alice", "bob", "2026-01-01T00:00:05", "newer")))
+    asyncio.run(record_message(message("alice", "bob", "2026-01-01T00:00:03", "older")))
+
+    inbox = row("bob", "alice")
+    assert inbox["preview"] == "newer"
+    assert inbox["last_activity"] == "2026-01-01T00:00:05"
+    assert inbox["unread_count"] == 2
@@ -0,0 +1,45 @@
+import time
+import asyncio
+import pytest
+from fastapi import HTTPException
+from snapper_common.aws import lazy_table
+from snapper_common.dynamo import create_tables
+from snapper_common.security import TokenVerifier
+from snapper_common.storage import AsyncStorage
+from snapper_common.testing import make_token
+from snapper_common.users import users_table_name, users_schema
+
+users_table = lazy_table(users_table_name)
+
+@pytest.fixture
+def verifier():
+    create_tables(users_schema)
+    users_table.put_item(Item={"username": "alice", "email": "alice@example.com", "token_epoch": 1})
+    return TokenVerifier(AsyncStorage(users_table), remote_fallback=False)
+
+def rejection(verifier, token):
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(verifier.verify(token))
+    return e.value.status_code, e.value.detail
+
+def test_current_epoch_is_accepted(verifier):
+    assert asyncio.run(verifier.verify(make_token("alice", epoch=1))) == {"username": "alice", "email": "alice@example.com"}
+
+def test_token_from_before_revocation_is_rejected(verifier):
+    assert rejection(verifier, make_token("alice", epoch=0)) == (401, "Token revoked")
+
+def test_unknown_user_and_expired_token_are_rejected(verifier):
+    assert rejection(verifier, make_token("mallory")) == (401, "Invalid token")
+    assert rejection(verifier, make_token("alice", epoch=1, expires_in=-10)) == (401, "Invalid token")
+
+def test_revocation_reaches_cached_verifiers_after_the_epoch_ttl(verifier, monkeypatch):
+    import snapper_common.security as security
+    monkeypatch.setattr(security, "AUTH_EPOCH_CACHE_TTL", 0.05)
+    token = make_token("alice", epoch=1)
+    assert asyncio.run(verifier.verify(token))["username"] == "alice"
+
+    # Revoked elsewhere (auth_service bumps the epoch), the cached user entry is still fresh
+    users_table.update_item(Key={"username": "alice"}, UpdateExpression="SET token_epoch = :e", ExpressionAttributeValues={":e": 2})
+    assert verifier.cache.get("alice") is not None
+    time.sleep(0.1)
+    assert rejection(verifier, token) == (401, "Token revoked")
@@ -0,0 +1,64 @@
+import asyncio
+import pytest
+from snapper_common.single_flight import single_flight, single_flight_metrics
+
+def test_concurrent_calls_share_one_read():
+    backend_calls = []
+
+    @single_flight(key_fn=lambda username: username)
+    async def get_user(username):
+        backend_calls.append(username)
+        await asyncio.sleep(0.05)
+        return {"username": username, "tags": []}
+
+    async def scenario():
+        results = await asyncio.gather(*(get_user("alice") for _ in range(5)), get_user("bob"))
+        # Followers get copies, mutating one result leaves the others alone
+        results[0]["tags"].append("mutated")
+        later = await get_user("alice")
+        return results, later
+
+    results, later = asyncio.run(scenario())
+    assert backend_calls == ["alice", "bob", "alice"]
+    assert [result["tags"] for result in results[1:5]] == [[]] * 4
+    assert later == {"username": "alice", "tags": []}
+    assert single_flight_metrics()["get_user"] == {"calls": 3, "collapsed": 4}
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    attempts = 0
+
+    @single_flight()
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.05)
+        if attempts == 1:
+            raise RuntimeError("backend down")
+        return "ok"
+
+    async def scenario():
+        first = await asyncio.gather(flaky(), flaky(), return_exceptions=True)
+        return first, await flaky()
+
+    first, second = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in first)
+    assert second == "ok"
+    assert attempts == 2
+
+def test_cancelled_caller_does_not_cancel_the_shared_read():
+    @single_flight()
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def scenario():
+        leader = asyncio.create_task(slow())
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(slow())
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(scenario()) == 42
@@ -0,0 +1,41 @@
+import time
+import asyncio
+import pytest
+from snapper_common.storage import AsyncStorage, StorageTimeoutError, run_storage
+
+class SlowTable:
+    name = "Slow"
+
+    def get_item(self, Key):
+        time.sleep(0.2)
+        return {"Item": Key}
+
+def test_blocking_calls_leave_the_event_loop_free():
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        results = await asyncio.gather(*(AsyncStorage(SlowTable()).get_item(Key={"id": i}) for i in range(4)))
+        elapsed = time.monotonic() - started
+        task.cancel()
+        return results, elapsed, ticks
+
+    results, elapsed, ticks = asyncio.run(scenario())
+    assert [result["Item"]["id"] for result in results] == [0, 1, 2, 3]
+    # The four calls overlap on the executor and the loop keeps running meanwhile
+    assert elapsed < 0.6
+    assert ticks >= 5
+
+def test_slow_calls_time_out():
+    with pytest.raises(StorageTimeoutError):
+        asyncio.run(run_storage(time.sleep, 0.5, timeout=0.05))
+
+def test_plain_attributes_pass_through():
+    assert AsyncStorage(SlowTable()).name == "Slow"
@@ -0,0 +1,46 @@
+import os
+from dotenv import load_dotenv
+from snapper_common.dynamo import TableSchema
+
+load_dotenv()
+
+# Users items are read by every service, created by whichever of auth/user service starts first
+users_table_name = "Users"
+
+users_schema = TableSchema(
+    TableName=users_table_name,
+    KeySchema=[{"AttributeName": "username", "KeyType": "HASH"}],
+    AttributeDefinitions=[{"AttributeName": "username", "AttributeType": "S"}]
+)
+
+# Prefix index for username search: one item per (lowercased prefix, username).
+# Sort key puts shorter usernames first so exact and close matches rank on top.
+# auth_service owns the table and is its only writer (at registration), user_service only queries it.
+username_index_table_name = "UsernameIndex"
+SEARCH_PREFIX_MAX_LEN = int(os.getenv("SEARCH_PREFIX_MAX_LEN", "20"))
+
+def username_rank_key(username: str):
+    return f"{len(username):03d}#{username.lower()}#{username}"
+
+def username_index_entries(username: str):
+    normalized = username.lower()
+    return [
+        {"prefix": normalized[:i], "rank_key": username_rank_key(username), "username": username}
+        for i in range(1, min(len(normalized), SEARCH_PREFIX_MAX_LEN) + 1)
+    ]
+
+# Index partition that holds the matches of a search query
+def search_prefix(query: str):
+    return query.lower()[:SEARCH_PREFIX_MAX_LEN]
+
+username_index_schema = TableSchema(
+    TableName=username_index_table_name,
+    KeySchema=[
+        {"AttributeName": "prefix", "KeyType": "HASH"},
+        {"AttributeName": "rank_key", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "prefix", "AttributeType": "S"},
+        {"AttributeName": "rank_key", "AttributeType": "S"},
+    ]
+)
@@ -1,52 +1,48 @@
-import os
-import boto3
-from dotenv import load_dotenv
-from botocore.exceptions import ClientError
-
-load_dotenv()
-
-# Check AWS credentials
-AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID")
-AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
-AWS_REGION = os.getenv("AWS_REGION")
-
-if not AWS_ACCESS_KEY or not AWS_SECRET_KEY:
-    raise RuntimeError("AWS_ACCESS_KEY_ID or AWS_SECRET_ACCESS_KEY environment variable is not set.")
-
-dynamodb = boto3.resource(
-    "dynamodb",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY
-)
+from snapper_common.aws import lazy_resource, lazy_client, lazy_table
+from snapper_common.s3 import S3_BUCKET, s3_client, object_url, object_key
+from snapper_common.storage import AsyncStorage, StorageTimeoutError, run_storage
+from snapper_common.dynamo import TableSchema, SchemaBootstrap, serialize, cancellation_reasons
+from snapper_common.single_flight import single_flight, single_flight_metrics
+from snapper_common.users import users_table_name, users_schema, username_index_table_name
+
+# Shared boto3 resource, built on first use (see snapper_common.aws)
+dynamodb = lazy_resource("dynamodb")
+
+table_name = users_table_name
+users_table = lazy_table(table_name)
+
+# Follow graph adjacency list: (username, "follower#other" | "following#other")
+follows_table_name = "Follows"
+follows_table = lazy_table(follows_table_name)
 
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY,
-    aws_secret_access_key=AWS_SECRET_KEY,
-    region_name=AWS_REGION,
+# Username search index, written by auth_service at registration and only queried here
+username_index_table = lazy_table(username_index_table_name)
+
+users_store = AsyncStorage(users_table)
+follows_store = AsyncStorage(follows_table)
+username_index_store = AsyncStorage(username_index_table)
+dynamodb_store = AsyncStorage(dynamodb)
+dynamodb_client_store = AsyncStorage(lazy_client("dynamodb"))
+s3_store = AsyncStorage(s3_client)
+
+# Full Users item, None if the user doesn't exist
+@single_flight()
+async def get_user_item(username: str):
+    response = await users_store.get_item(Key={"username": username})
+    return response.get("Item")
+
+# Tables owned by this service (Users shares its definition with auth_service)
+follows_schema = TableSchema(
+    TableName=follows_table_name,
+    KeySchema=[
+        {"AttributeName": "username", "KeyType": "HASH"},
+        {"AttributeName": "edge", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "username", "AttributeType": "S"},
+        {"AttributeName": "edge", "AttributeType": "S"},
+    ]
 )
-table_name = "Users"
-users_table = dynamodb.Table(table_name)
-
-# Create Users table if it doesn't exist
-def create_table():
-    try:
-        existing_tables = [table.name for table in dynamodb.tables.all()]
-        if table_name not in existing_tables:
-            table = dynamodb.create_table(
-                TableName=table_name,
-                KeySchema=[{"AttributeName": "username", "KeyType": "HASH"}],
-                AttributeDefinitions=[{"AttributeName": "username", "AttributeType": "S"}],
-                BillingMode="PAY_PER_REQUEST"
-            )
-            
-            print(f"Table '{table_name}' created.")
-            
-            table.wait_until_exists()
-            
-            print(f"Table '{table_name}' ready to use.")
-        else:
-            print(f"Table '{table_name}' already exists.")
-    except ClientError as e:
-        print(f"Create table error: {e}")
\ No newline at end of file
+
+SCHEMAS = (users_schema, follows_schema)
+schema_bootstrap = SchemaBootstrap(*SCHEMAS)
@@ -0,0 +1,101 @@
+import json
+import base64
+from boto3.dynamodb.conditions import Key
+from datetime import datetime
+from database import follows_store, dynamodb_client_store, follows_table_name, table_name, serialize
+
+# Edge directions stored under each user's partition
+FOLLOWER = "follower"
+FOLLOWING = "following"
+
+def edge_key(username: str, direction: str, other: str):
+    return {"username": username, "edge": f"{direction}#{other}"}
+
+# Opaque pagination cursor wrapping a DynamoDB LastEvaluatedKey
+def encode_cursor(last_key: dict):
+    return base64.urlsafe_b64encode(json.dumps(last_key).encode()).decode()
+
+# Back to an ExclusiveStartKey that has exactly key_names as string attributes and lies in
+# the queried partition (first key name), ValueError for anything else
+def decode_cursor(cursor: str, key_names: tuple, partition: str):
+    try:
+        last_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(last_key, dict) or set(last_key) != set(key_names):
+        raise ValueError("Invalid cursor")
+    if not all(isinstance(value, str) for value in last_key.values()) or last_key[key_names[0]] != partition:
+        raise ValueError("Invalid cursor")
+    return last_key
+
+# One page of a user's followers or following, ordered by username
+async def list_edges(username: str, direction: str, limit: int, cursor: str = None):
+    kwargs = {
+        "KeyConditionExpression": Key("username").eq(username) & Key("edge").begins_with(f"{direction}#"),
+        "ProjectionExpression": "other_user",
+        "Limit": limit
+    }
+    if cursor:
+        last_key = decode_cursor(cursor, ("username", "edge"), username)
+        if not last_key["edge"].startswith(f"{direction}#"):
+            raise ValueError("Invalid cursor")
+        kwargs["ExclusiveStartKey"] = last_key
+
+    response = await follows_store.query(**kwargs)
+    users = [item["other_user"] for item in response.get("Items", [])]
+    next_cursor = encode_cursor(response["LastEvaluatedKey"]) if "LastEvaluatedKey" in response else None
+    return users, next_cursor
+
+# Does follower follow followee, a single key lookup
+async def is_following(follower: str, followee: str):
+    response = await follows_store.get_item(
+        Key=edge_key(follower, FOLLOWING, followee),
+        ProjectionExpression="username"
+    )
+    return "Item" in response
+
+# Counter update on a Users item that must exist
+def _count_update(username: str, attribute: str, delta: int):
+    return {"Update": {
+        "TableName": table_name,
+        "Key": serialize({"username": username}),
+        "UpdateExpression": f"ADD {attribute} :delta",
+        "ConditionExpression": "attribute_exists(username)",
+        "ExpressionAttributeValues": serialize({":delta": delta})
+    }}
+
+# Both edges and both counters in one transaction.
+# Action order: [following edge, follower edge, followee count, follower count]
+async def follow(follower: str, followee: str):
+    created_at = datetime.utcnow().isoformat()
+    await dynamodb_client_store.transact_write_items(TransactItems=[
+        {"Put": {
+            "TableName": follows_table_name,
+            "Item": serialize({**edge_key(follower, FOLLOWING, followee), "other_user": followee, "created_at": created_at}),
+            "ConditionExpression": "attribute_not_exists(username)"
+        }},
+        {"Put": {
+            "TableName": follows_table_name,
+            "Item": serialize({**edge_key(followee, FOLLOWER, follower), "other_user": follower, "created_at": created_at}),
+            "ConditionExpression": "attribute_not_exists(username)"
+        }},
+        _count_update(followee, "follower_count", 1),
+        _count_update(follower, "following_count", 1),
+    ])
+
+# Same layout as follow, edges must exist
+async def unfollow(follower: str, followee: str):
+    await dynamodb_client_store.transact_write_items(TransactItems=[
+        {"Delete": {
+            "TableName": follows_table_name,
+            "Key": serialize(edge_key(follower, FOLLOWING, followee)),
+            "ConditionExpression": "attribute_exists(username)"
+        }},
+        {"Delete": {
+            "TableName": follows_table_name,
+            "Key": serialize(edge_key(followee, FOLLOWER, follower)),
+            "ConditionExpression": "attribute_exists(username)"
+        }},
+        _count_update(followee, "follower_count", -1),
+        _count_update(follower, "following_count", -1),
+    ])
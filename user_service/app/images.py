@@ -0,0 +1,30 @@
+import asyncio
+from botocore.exceptions import ClientError
+from profile_cache import profile_cache
+from database import users_store, StorageTimeoutError, object_url
+from snapper_common.images import generate_variants, sized_url
+
+# Background task after a profile picture upload, skipped if the picture was replaced meanwhile
+async def process_profile_image(username: str, key: str):
+    try:
+        variants = await generate_variants(key)
+        await users_store.update_item(
+            Key={"username": username},
+            UpdateExpression="SET profile_picture_variants = :variants",
+            ConditionExpression="profile_picture_url = :url",
+            ExpressionAttributeValues={":variants": variants, ":url": object_url(key)}
+        )
+        await profile_cache.invalidate(username)
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            print(f"Image variants failed for {username}: {e}")
+    except (StorageTimeoutError, asyncio.TimeoutError, OSError) as e:
+        print(f"Image variants failed for {username}: {e}")
+
+# Swap the profile picture for the requested size class (originals where not generated yet)
+def with_picture_size(user: dict, size: str):
+    if size != "original":
+        variants = user.pop("profile_picture_variants", None)
+        if user.get("profile_picture_url"):
+            user["profile_picture_url"] = sized_url(user["profile_picture_url"], variants, size)
+    return user
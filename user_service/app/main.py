@@ -1,9 +1,37 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from database import StorageTimeoutError, single_flight_metrics, schema_bootstrap
 from routes import user
+from contextlib import asynccontextmanager
+from snapper_common.http_client import http_client
+from snapper_common.images import close_image_pool
+from profile_cache import profile_cache
 
-app = FastAPI()
+# Open shared resources on startup and release them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    schema_bootstrap.start()
+    await http_client.start()
+    await profile_cache.start()
+    yield
+    await profile_cache.close()
+    close_image_pool()
+    await http_client.close()
+    await schema_bootstrap.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(user.router, tags=["User"], prefix="/users")
 
+# Storage calls that exceed STORAGE_TIMEOUT surface as 503 instead of hanging the request
+@app.exception_handler(StorageTimeoutError)
+async def storage_timeout_handler(request: Request, exc: StorageTimeoutError):
+    return JSONResponse(status_code=503, content={"detail": "Storage timeout"})
+
+# Cache effectiveness counters
+@app.get("/metrics")
+async def get_metrics():
+    return {"profile_cache": profile_cache.metrics(), "single_flight": single_flight_metrics()}
+
 @app.get("/")
 async def root():
     return {"message": "User Service Running"}
@@ -0,0 +1,36 @@
+from datetime import datetime
+from database import users_table, follows_table
+from graph import FOLLOWER, FOLLOWING, edge_key
+
+# One-off: move follower/following string sets from Users items into the Follows table
+def migrate():
+    migrated = 0
+    created_at = datetime.utcnow().isoformat()
+    kwargs = {"ProjectionExpression": "username, followers, following"}
+    while True:
+        response = users_table.scan(**kwargs)
+        for user in response.get("Items", []):
+            followers = user.get("followers", set())
+            following = user.get("following", set())
+            if not followers and not following:
+                continue
+
+            with follows_table.batch_writer(overwrite_by_pkeys=["username", "edge"]) as batch:
+                for other in followers:
+                    batch.put_item(Item={**edge_key(user["username"], FOLLOWER, other), "other_user": other, "created_at": created_at})
+                for other in following:
+                    batch.put_item(Item={**edge_key(user["username"], FOLLOWING, other), "other_user": other, "created_at": created_at})
+
+            users_table.update_item(
+                Key={"username": user["username"]},
+                UpdateExpression="SET follower_count = :followers, following_count = :following REMOVE followers, following",
+                ExpressionAttributeValues={":followers": len(followers), ":following": len(following)}
+            )
+            migrated += 1
+        if "LastEvaluatedKey" not in response:
+            break
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    print(f"Migrated follow graph of {migrated} users.")
+
+if __name__ == "__main__":
+    migrate()
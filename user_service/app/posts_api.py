@@ -0,0 +1,19 @@
+import os
+import asyncio
+import aiohttp
+from dotenv import load_dotenv
+from snapper_common.http_client import http_client
+
+load_dotenv()
+
+POSTS_PATH = os.getenv("POSTS_PATH")
+
+# Ask post_service to add (POST) or drop (DELETE) an author's posts on the token owner's
+# timeline. Runs after the follow/unfollow response, a failure only leaves the feed stale.
+async def sync_timeline(method: str, author: str, authorization: str):
+    try:
+        resp = await http_client.request(method, f"{POSTS_PATH}/timeline/{author}", headers={"Authorization": authorization})
+        if resp.status != 200:
+            print(f"Timeline sync {method} {author} failed ({resp.status})")
+    except (RuntimeError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Timeline sync {method} {author} failed: {e}")
@@ -0,0 +1,145 @@
+import os
+import json
+from decimal import Decimal
+from dotenv import load_dotenv
+from snapper_common.security import UserCache
+from database import get_user_item
+
+load_dotenv()
+
+# Read-through cache of user profiles: "memory" is a per-process LRU with TTL,
+# "redis" is shared by every replica so an invalidation is seen everywhere
+PROFILE_CACHE_BACKEND = os.getenv("PROFILE_CACHE_BACKEND", "memory").lower()
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "30"))
+PROFILE_CACHE_PREFIX = os.getenv("PROFILE_CACHE_PREFIX", "profile:")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Never cached, follow lists live in the Follows table
+UNCACHED_FIELDS = {"password", "followers", "following"}
+
+class MemoryBackend:
+    # Exceptions that mean the backend is unavailable
+    errors = ()
+
+    def __init__(self, max_size: int, ttl: float):
+        self._cache = UserCache(max_size, ttl)
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def get(self, username: str):
+        return self._cache.get(username)
+
+    async def set(self, username: str, profile: dict):
+        self._cache.set(username, profile)
+
+    async def delete(self, *usernames: str):
+        for username in usernames:
+            self._cache.invalidate(username)
+
+def _to_json(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, set):
+        return list(value)
+    raise TypeError(f"Unsupported type {type(value).__name__}")
+
+class RedisBackend:
+    def __init__(self, url: str, ttl: float, prefix: str = PROFILE_CACHE_PREFIX):
+        self.url = url
+        self.ttl = ttl
+        self.prefix = prefix
+        self.errors = (OSError,)
+        self._redis = None
+
+    async def start(self):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self.errors = (RedisError, OSError)
+        self._redis = redis.from_url(self.url, decode_responses=True)
+
+    async def close(self):
+        if self._redis:
+            await self._redis.aclose()
+
+    async def get(self, username: str):
+        value = await self._redis.get(f"{self.prefix}{username}")
+        return json.loads(value) if value else None
+
+    async def set(self, username: str, profile: dict):
+        await self._redis.set(f"{self.prefix}{username}", json.dumps(profile, default=_to_json), px=int(self.ttl * 1000))
+
+    async def delete(self, *usernames: str):
+        await self._redis.delete(*(f"{self.prefix}{username}" for username in usernames))
+
+class ProfileCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def start(self):
+        await self.backend.start()
+
+    async def close(self):
+        await self.backend.close()
+
+    # Cached profile or a fresh read, None if the user doesn't exist (misses are not cached).
+    # A failing shared backend degrades to reading DynamoDB.
+    async def get(self, username: str):
+        try:
+            profile = await self.backend.get(username)
+        except self.backend.errors as e:
+            profile = None
+            self._backend_error("read", e)
+        if profile is not None:
+            self.hits += 1
+            return profile
+
+        self.misses += 1
+        item = await get_user_item(username)
+        if not item:
+            return None
+        profile = {k: v for k, v in item.items() if k not in UNCACHED_FIELDS}
+        try:
+            await self.backend.set(username, profile)
+        except self.backend.errors as e:
+            self._backend_error("write", e)
+        return profile
+
+    # Drop cached profiles after a write that changes them
+    async def invalidate(self, *usernames: str):
+        self.invalidations += len(usernames)
+        try:
+            await self.backend.delete(*usernames)
+        except self.backend.errors as e:
+            self._backend_error("invalidate", e)
+
+    def _backend_error(self, action: str, error: Exception):
+        self.errors += 1
+        print(f"Profile cache {action} failed: {error}")
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": PROFILE_CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+            "errors": self.errors
+        }
+
+def create_profile_cache():
+    if PROFILE_CACHE_BACKEND == "redis":
+        return ProfileCache(RedisBackend(REDIS_URL, PROFILE_CACHE_TTL))
+    return ProfileCache(MemoryBackend(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL))
+
+profile_cache = create_profile_cache()
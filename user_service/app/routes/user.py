@@ -1,11 +1,19 @@
 import os
 import uuid
-import aiohttp
+import asyncio
+from typing import Literal
 from dotenv import load_dotenv
 from passlib.context import CryptContext
-from boto3.dynamodb.conditions import Attr
-from database import users_table, s3_client
-from fastapi import APIRouter, HTTPException, Request, Depends, UploadFile, File, Query
+from boto3.dynamodb.conditions import Key
+from snapper_common.security import TokenVerifier
+from botocore.exceptions import ClientError
+from images import process_profile_image, with_picture_size
+from posts_api import sync_timeline
+from profile_cache import profile_cache
+from graph import FOLLOWER, FOLLOWING, list_edges, is_following, follow, unfollow, encode_cursor, decode_cursor
+from database import users_store, s3_store, object_url, cancellation_reasons, username_index_store, dynamodb_store
+from snapper_common.users import search_prefix
+from fastapi import APIRouter, HTTPException, Request, Depends, UploadFile, File, Query, BackgroundTasks
 
 load_dotenv()
 
@@ -21,34 +29,44 @@ ALLOWED_CT = {"image/jpeg", "image/png"}
 router = APIRouter()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Call auth service to verify user token
-async def get_current_user(request: Request):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(AUTH_PATH, headers=request.headers) as resp:
-            if resp.status != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return await resp.json()
+# Verify user token locally (signature, exp and user existence)
+get_current_user = TokenVerifier(users_store)
 
-# Get full user data
+# Get full user data (through the profile cache)
 async def get_full_user(user: dict):
-    response = users_table.get_item(Key={"username": user["username"]})
-    full_user = response.get("Item")
+    full_user = await profile_cache.get(user["username"])
     if not full_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     return full_user
 
+# Profile fields never returned, follow lists live in the Follows table
+PRIVATE_FIELDS = {"password", "followers", "following"}
+
+# Add follower/following counts (0 for users that never had an edge)
+def with_counts(user: dict):
+    user.setdefault("follower_count", 0)
+    user.setdefault("following_count", 0)
+    return user
+
 # Fetch current logged in user
 @router.get("/me")
-async def get_me(user: dict = Depends(get_current_user)):
+async def get_me(
+    size: Literal["original", "medium", "thumb"] = "original",
+    user: dict = Depends(get_current_user)
+):
     full_user = await get_full_user(user)
-    safe_user = {k: v for k, v in full_user.items() if k not in {"password"}} 
+    safe_user = {k: v for k, v in full_user.items() if k not in PRIVATE_FIELDS} 
     
-    return {"user": safe_user}
+    return {"user": with_picture_size(with_counts(safe_user), size)}
 
 # Post a profile picture
 @router.post("/profile-picture")
-async def upload_image(file: UploadFile = File(...), user_data: dict = Depends(get_current_user)):
+async def upload_image(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    user_data: dict = Depends(get_current_user)
+):
     username = user_data["username"]
     filename = file.filename or ""
     ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ""
@@ -60,143 +78,205 @@ async def upload_image(file: UploadFile = File(...), user_data: dict = Depends(g
         ext = "jpg"
         
     s3_key = f"users/{username}/{uuid.uuid4()}.{ext}"
-    s3_client.upload_fileobj(
+    await s3_store.upload_fileobj(
         file.file,
         S3_BUCKET,
         s3_key,
-        ExtraArgs={"ContentType": ctype}
+        ExtraArgs={"ContentType": ctype},
+        timeout=60
     )
     
-    file_url = f"https://{S3_BUCKET}.s3.{AWS_REGION}.amazonaws.com/{s3_key}"
+    file_url = object_url(s3_key)
     
-    users_table.update_item(
+    # Variants of the previous picture no longer apply, new ones are generated in the background
+    await users_store.update_item(
         Key={"username": username},
-        UpdateExpression="SET profile_picture_url = :url",
+        UpdateExpression="SET profile_picture_url = :url REMOVE profile_picture_variants",
         ExpressionAttributeValues={":url": file_url}
     )
+    await profile_cache.invalidate(username)
+    background_tasks.add_task(process_profile_image, username, s3_key)
 
     return {"message": "Profile picture updated", "url": file_url}
 
+# Page through a user's followers or following
+async def list_graph(username: str, direction: str, limit: int, cursor: str):
+    try:
+        users, next_cursor = await list_edges(username, direction, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    response_key = "followers" if direction == FOLLOWER else "following"
+    
+    return {response_key: users, "next_cursor": next_cursor}
+
+# Fail with 404 when the user doesn't exist
+async def ensure_user_exists(username: str):
+    if not await profile_cache.get(username):
+        raise HTTPException(status_code=404, detail="User not found")
+
 # Get my followers
 @router.get("/followers")
-async def get_my_followers(user_data: dict = Depends(get_current_user)):
-    response = users_table.get_item(Key={"username": user_data["username"]})
-    user = response.get("Item")
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    return {"followers": user.get("followers", [])}
+async def get_my_followers(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    user_data: dict = Depends(get_current_user)
+):
+    return await list_graph(user_data["username"], FOLLOWER, limit, cursor)
 
 # Get other users followers
 @router.get("/followers/{username}")
-async def get_user_followers(username: str, user_data: dict = Depends(get_current_user)):
-    response = users_table.get_item(Key={"username": username})
-    user = response.get("Item")
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_user_followers(
+    username: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    user_data: dict = Depends(get_current_user)
+):
+    await ensure_user_exists(username)
     
-    return {"followers": user.get("followers", [])}
+    return await list_graph(username, FOLLOWER, limit, cursor)
 
 # Get my following
 @router.get("/following")
-async def get_my_following(user_data: dict = Depends(get_current_user)):
-    response = users_table.get_item(Key={"username": user_data["username"]})
-    user = response.get("Item")
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    return {"following": user.get("following", [])}
+async def get_my_following(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    user_data: dict = Depends(get_current_user)
+):
+    return await list_graph(user_data["username"], FOLLOWING, limit, cursor)
 
 # Get other users following
 @router.get("/following/{username}")
-async def get_user_following(username: str, user_data: dict = Depends(get_current_user)):
-    response = users_table.get_item(Key={"username": username})
-    user = response.get("Item")
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+async def get_user_following(
+    username: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str = None,
+    user_data: dict = Depends(get_current_user)
+):
+    await ensure_user_exists(username)
     
-    return {"following": user.get("following", [])}
+    return await list_graph(username, FOLLOWING, limit, cursor)
 
-# Search users
+# Search users by username prefix, shortest (closest) matches first
 @router.get("/search")
-async def search_users(q: str = Query(..., min_length=1), user_data: dict = Depends(get_current_user)):
-    response = users_table.scan(
-        FilterExpression=Attr("username").contains(q),
-    )
-    items = response.get("Items", [])
-    safe_users = [
-        {k: v for k, v in user.items() if k not in {"password", "email", "following", "followers"}}
-        for user in items
+async def search_users(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=50),
+    cursor: str = None,
+    size: Literal["original", "medium", "thumb"] = "original",
+    user_data: dict = Depends(get_current_user)
+):
+    normalized = q.lower()
+    kwargs = {
+        "KeyConditionExpression": Key("prefix").eq(search_prefix(q)),
+        "Limit": limit
+    }
+    if cursor:
+        try:
+            kwargs["ExclusiveStartKey"] = decode_cursor(cursor, ("prefix", "rank_key"), search_prefix(q))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    response = await username_index_store.query(**kwargs)
+    usernames = [
+        item["username"] for item in response.get("Items", [])
+        if item["username"].lower().startswith(normalized)
     ]
     
-    return {"users": safe_users}
+    users = {}
+    if usernames:
+        request = {"Users": {
+            "Keys": [{"username": username} for username in usernames],
+            "ProjectionExpression": "username, user_id, profile_picture_url, profile_picture_variants"
+        }}
+        while request:
+            batch = await dynamodb_store.batch_get_item(RequestItems=request)
+            for item in batch.get("Responses", {}).get("Users", []):
+                users[item["username"]] = item
+            request = batch.get("UnprocessedKeys") or None
+    
+    next_cursor = encode_cursor(response["LastEvaluatedKey"]) if "LastEvaluatedKey" in response else None
+    
+    return {
+        "users": [with_picture_size(users[username], size) for username in usernames if username in users],
+        "next_cursor": next_cursor
+    }
 
 # Get another user profile
 @router.get("/{username}")
-async def get_user(username: str, user_data: dict = Depends(get_current_user)):
-    response = users_table.get_item(Key={"username": username})
-    user = response.get("Item")
+async def get_user(
+    username: str,
+    size: Literal["original", "medium", "thumb"] = "original",
+    user_data: dict = Depends(get_current_user)
+):
+    user = await profile_cache.get(username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    safe_user = {k: v for k, v in user.items() if k not in {"password", "email"}}
+    safe_user = {k: v for k, v in user.items() if k not in PRIVATE_FIELDS | {"email"}}
     
-    return {"user": safe_user}
+    return {"user": with_picture_size(with_counts(safe_user), size)}
+
+# Does the current user follow username, and does username follow back
+@router.get("/{username}/follow-status")
+async def get_follow_status(username: str, user: dict = Depends(get_current_user)):
+    following, followed_by = await asyncio.gather(
+        is_following(user["username"], username),
+        is_following(username, user["username"])
+    )
+    
+    return {"following": following, "followed_by": followed_by}
+
+# Map a cancelled follow/unfollow transaction to an HTTP error
+def raise_for_graph_error(error: ClientError, edge_detail: str):
+    reasons = cancellation_reasons(error)
+    if reasons is None:
+        raise error
+    if len(reasons) > 2 and reasons[2] == "ConditionalCheckFailed":
+        raise HTTPException(status_code=404, detail="User not found")
+    if "ConditionalCheckFailed" in reasons[:2]:
+        raise HTTPException(status_code=400, detail=edge_detail)
+    raise HTTPException(status_code=409, detail="Conflicting follow update, please retry")
 
 # Follow a user
 @router.post("/{username}/follow")
-async def follow_user(username: str, user: dict = Depends(get_current_user)):
+async def follow_user(
+    username: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(get_current_user)
+):
     if username == user["username"]:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
     
-    response = users_table.get_item(Key={"username": username})
-    target_user = response.get("Item")
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    followers = set(target_user.get("followers", []))
-    if user["username"] in followers:
-        raise HTTPException(status_code=400, detail=f"You are already following {username}")
-    
-    users_table.update_item(
-        Key={"username": username},
-        UpdateExpression="ADD followers :follower",
-        ExpressionAttributeValues={":follower": {user["username"]}}
-    )
-    
-    users_table.update_item(
-        Key={"username": user["username"]},
-        UpdateExpression="ADD following :following",
-        ExpressionAttributeValues={":following": {username}}
-    )
+    try:
+        await follow(user["username"], username)
+    except ClientError as e:
+        raise_for_graph_error(e, f"You are already following {username}")
+    # Both profiles show follower/following counts
+    await profile_cache.invalidate(user["username"], username)
+    # The new followee's recent posts show up in the feed right away
+    background_tasks.add_task(sync_timeline, "POST", username, request.headers.get("Authorization"))
     
     return {"message": f"You are now following {username}"}
 
 # Unfollow a user
 @router.post("/{username}/unfollow")
-async def unfollow_user(username: str, user: dict = Depends(get_current_user)):
+async def unfollow_user(
+    username: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user: dict = Depends(get_current_user)
+):
     if username == user["username"]:
         raise HTTPException(status_code=400, detail="Cannot unfollow yourself")
     
-    response = users_table.get_item(Key={"username": username})
-    target_user = response.get("Item")
-    if not target_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    followers = set(target_user.get("followers", []))
-    if user["username"] not in followers:
-        raise HTTPException(status_code=400, detail=f"You are not following {username}")
-    
-    users_table.update_item(
-        Key={"username": username},
-        UpdateExpression="DELETE followers :follower",
-        ExpressionAttributeValues={":follower": {user["username"]}}
-    )
-    
-    users_table.update_item(
-        Key={"username": user["username"]},
-        UpdateExpression="DELETE following :following",
-        ExpressionAttributeValues={":following": {username}}
-    )
+    try:
+        await unfollow(user["username"], username)
+    except ClientError as e:
+        raise_for_graph_error(e, f"You are not following {username}")
+    # Both profiles show follower/following counts
+    await profile_cache.invalidate(user["username"], username)
+    background_tasks.add_task(sync_timeline, "DELETE", username, request.headers.get("Authorization"))
     
-    return {"message": f"You unfollowed {username}"}
\ No newline at end of file
+    return {"message": f"You unfollowed {username}"}
@@ -0,0 +1,51 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(TESTS_DIR)))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "app"))
+
+from snapper_common.testing import aws  # noqa: F401
+import pytest
+from fastapi.testclient import TestClient
+from snapper_common.dynamo import create_tables
+from snapper_common.users import username_index_schema
+from database import SCHEMAS, users_table
+
+# UsernameIndex is created by auth_service in a deployment
+@pytest.fixture(autouse=True)
+def tables(aws):
+    create_tables(*SCHEMAS, username_index_schema)
+
+# Process-wide caches start empty in every test
+@pytest.fixture
+def client(monkeypatch):
+    from main import app
+    from routes.user import get_current_user
+    from profile_cache import profile_cache, MemoryBackend, PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+    from snapper_common.security import UserCache
+
+    monkeypatch.setattr(profile_cache, "backend", MemoryBackend(PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL))
+    monkeypatch.setattr(get_current_user, "cache", UserCache(get_current_user.cache.max_size, get_current_user.cache.ttl))
+    with TestClient(app) as client:
+        yield client
+
+# post_service timeline calls made after follow/unfollow: [(method, author, authorization)]
+@pytest.fixture(autouse=True)
+def timeline_calls(monkeypatch):
+    from routes import user as user_routes
+    calls = []
+
+    async def sync_timeline(method: str, author: str, authorization: str):
+        calls.append((method, author, authorization))
+    monkeypatch.setattr(user_routes, "sync_timeline", sync_timeline)
+    return calls
+
+# Users item as auth_service writes it at registration
+@pytest.fixture
+def add_user():
+    def add(username: str, **attributes):
+        item = {"username": username, "user_id": f"id-{username}", "email": f"{username}@example.com", **attributes}
+        users_table.put_item(Item=item)
+        return item
+    return add
@@ -0,0 +1,53 @@
+from graph import encode_cursor
+from snapper_common.testing import auth_headers
+
+def test_follow_unfollow_round_trip(client, add_user):
+    add_user("alice")
+    add_user("bob")
+    alice, bob = auth_headers("alice"), auth_headers("bob")
+
+    assert client.post("/users/bob/follow", headers=alice).status_code == 200
+    assert client.get("/users/followers", headers=bob).json()["followers"] == ["alice"]
+    assert client.get("/users/following", headers=alice).json()["following"] == ["bob"]
+    assert client.get("/users/bob/follow-status", headers=alice).json() == {"following": True, "followed_by": False}
+    assert client.get("/users/bob", headers=alice).json()["user"]["follower_count"] == 1
+    assert client.get("/users/me", headers=alice).json()["user"]["following_count"] == 1
+
+    assert client.post("/users/bob/follow", headers=alice).status_code == 400
+
+    assert client.post("/users/bob/unfollow", headers=alice).status_code == 200
+    assert client.get("/users/followers", headers=bob).json()["followers"] == []
+    assert client.get("/users/bob", headers=alice).json()["user"]["follower_count"] == 0
+    assert client.post("/users/bob/unfollow", headers=alice).status_code == 400
+
+def test_follow_unknown_user(client, add_user):
+    add_user("carol")
+    response = client.post("/users/nobody/follow", headers=auth_headers("carol"))
+    assert response.status_code == 404
+
+def test_follow_and_unfollow_sync_the_timeline(client, add_user, timeline_calls):
+    add_user("erin")
+    add_user("frank")
+    headers = auth_headers("erin")
+
+    client.post("/users/frank/follow", headers=headers)
+    client.post("/users/frank/follow", headers=headers)
+    client.post("/users/frank/unfollow", headers=headers)
+
+    assert timeline_calls == [("POST", "frank", headers["Authorization"]), ("DELETE", "frank", headers["Authorization"])]
+
+def test_graph_pages_and_rejects_malformed_cursors(client, add_user):
+    add_user("gina")
+    for name in ("f1", "f2", "f3"):
+        add_user(name)
+        client.post("/users/gina/follow", headers=auth_headers(name))
+    headers = auth_headers("gina")
+
+    first = client.get("/users/followers", params={"limit": 2}, headers=headers).json()
+    second = client.get("/users/followers", params={"limit": 2, "cursor": first["next_cursor"]}, headers=headers).json()
+    assert first["followers"] + second["followers"] == ["f1", "f2", "f3"]
+
+    other_user = encode_cursor({"username": "f1", "edge": "follower#f2"})
+    wrong_direction = encode_cursor({"username": "gina", "edge": "following#f2"})
+    for cursor in ("WzFd", "%%%", encode_cursor({"username": "gina"}), encode_cursor({"username": "gina", "edge": 5}), other_user, wrong_direction):
+        assert client.get("/users/followers", params={"cursor": cursor}, headers=headers).status_code == 400
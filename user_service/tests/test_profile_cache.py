@@ -0,0 +1,58 @@
+import asyncio
+from snapper_common.testing import auth_headers
+from database import users_table
+from profile_cache import ProfileCache, MemoryBackend
+
+def test_profiles_are_served_from_cache_until_invalidated(client, add_user):
+    from profile_cache import profile_cache
+    add_user("alice", bio="old", password="hash")
+    add_user("bob")
+    bob = auth_headers("bob")
+
+    first = client.get("/users/alice", headers=bob).json()["user"]
+    assert first["bio"] == "old"
+    assert "password" not in first
+    # Written behind the cache's back: still stale on the next read
+    users_table.update_item(Key={"username": "alice"}, UpdateExpression="SET bio = :b", ExpressionAttributeValues={":b": "new"})
+    assert client.get("/users/alice", headers=bob).json()["user"]["bio"] == "old"
+    assert profile_cache.hits >= 1
+
+    # A follow changes both profiles and invalidates them
+    assert client.post("/users/alice/follow", headers=bob).status_code == 200
+    user = client.get("/users/alice", headers=bob).json()["user"]
+    assert user["bio"] == "new"
+    assert user["follower_count"] == 1
+    assert client.get("/users/me", headers=bob).json()["user"]["following_count"] == 1
+
+def test_missing_users_are_not_cached(client, add_user):
+    bob = auth_headers("bob")
+    add_user("bob")
+    assert client.get("/users/alice", headers=bob).status_code == 404
+    add_user("alice")
+    assert client.get("/users/alice", headers=bob).status_code == 200
+
+# Backend that is always down, like an unreachable Redis
+class BrokenBackend(MemoryBackend):
+    errors = (ConnectionError,)
+
+    async def get(self, username: str):
+        raise ConnectionError("down")
+
+    async def set(self, username: str, profile: dict):
+        raise ConnectionError("down")
+
+    async def delete(self, *usernames: str):
+        raise ConnectionError("down")
+
+def test_unavailable_backend_falls_back_to_storage(add_user):
+    add_user("alice", bio="hi")
+    cache = ProfileCache(BrokenBackend(10, 30))
+
+    async def scenario():
+        profile = await cache.get("alice")
+        await cache.invalidate("alice")
+        return profile
+
+    assert asyncio.run(scenario())["bio"] == "hi"
+    assert cache.metrics()["errors"] == 3
+    assert cache.metrics()["misses"] == 1
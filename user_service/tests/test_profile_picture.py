@@ -0,0 +1,26 @@
+from snapper_common.testing import auth_headers
+
+PICTURE = "https://cdn.example.com/users/bob/pic.png"
+VARIANTS = {"thumb": "https://cdn.example.com/users/bob/pic_thumb.webp", "medium": "https://cdn.example.com/users/bob/pic_medium.webp"}
+
+def test_profile_size_selects_variant(client, add_user):
+    add_user("alice")
+    add_user("bob", profile_picture_url=PICTURE, profile_picture_variants=VARIANTS)
+
+    thumb = client.get("/users/bob", params={"size": "thumb"}, headers=auth_headers("alice")).json()["user"]
+    assert thumb["profile_picture_url"] == VARIANTS["thumb"]
+    assert "profile_picture_variants" not in thumb
+
+    original = client.get("/users/bob", headers=auth_headers("alice")).json()["user"]
+    assert original["profile_picture_url"] == PICTURE
+    assert original["profile_picture_variants"] == VARIANTS
+
+def test_me_without_variants_keeps_original(client, add_user):
+    add_user("carol", profile_picture_url=PICTURE)
+
+    me = client.get("/users/me", params={"size": "medium"}, headers=auth_headers("carol")).json()["user"]
+    assert me["profile_picture_url"] == PICTURE
+
+def test_unknown_size_is_rejected(client, add_user):
+    add_user("dave")
+    assert client.get("/users/me", params={"size": "huge"}, headers=auth_headers("dave")).status_code == 422
@@ -0,0 +1,34 @@
+from database import username_index_table
+from snapper_common.testing import auth_headers
+from snapper_common.users import username_index_entries
+from graph import encode_cursor
+
+def index(username):
+    for entry in username_index_entries(username):
+        username_index_table.put_item(Item=entry)
+
+def test_search_ranks_shorter_usernames_first(client, add_user):
+    for username in ("bob", "Bobby", "bobcat", "alice"):
+        add_user(username)
+        index(username)
+
+    response = client.get("/users/search", params={"q": "BOB"}, headers=auth_headers("alice"))
+    assert response.status_code == 200
+    assert [user["username"] for user in response.json()["users"]] == ["bob", "Bobby", "bobcat"]
+
+def test_search_pages_with_cursor(client, add_user):
+    for username in ("bob", "Bobby", "bobcat", "alice"):
+        add_user(username)
+        index(username)
+
+    headers = auth_headers("alice")
+    first = client.get("/users/search", params={"q": "bob", "limit": 2}, headers=headers).json()
+    second = client.get("/users/search", params={"q": "bob", "limit": 2, "cursor": first["next_cursor"]}, headers=headers).json()
+    assert [user["username"] for user in first["users"] + second["users"]] == ["bob", "Bobby", "bobcat"]
+
+def test_malformed_cursors_are_rejected(client, add_user):
+    add_user("alice")
+    headers = auth_headers("alice")
+    other_prefix = encode_cursor({"prefix": "zz", "rank_key": "002#zz#zz"})
+    for cursor in ("WzFd", "not-base64!", encode_cursor({"prefix": "bob"}), other_prefix):
+        assert client.get("/users/search", params={"q": "bob", "cursor": cursor}, headers=headers).status_code == 400
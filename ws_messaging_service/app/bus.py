@@ -0,0 +1,175 @@
+import os
+import json
+import uuid
+import asyncio
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "memory" keeps routing inside this process, "redis" routes DMs across workers and nodes
+WS_BUS_BACKEND = os.getenv("WS_BUS_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+WS_CHANNEL_PREFIX = os.getenv("WS_CHANNEL_PREFIX", "ws:user:")
+# Backoff between attempts to restore a lost pub/sub connection, doubled per failure
+WS_BUS_RECONNECT_MIN = float(os.getenv("WS_BUS_RECONNECT_MIN", "0.5"))
+WS_BUS_RECONNECT_MAX = float(os.getenv("WS_BUS_RECONNECT_MAX", "30"))
+
+# Single-process bus: there are no other nodes to reach
+class InProcessBus:
+    # Exceptions that mean the bus is unavailable
+    errors = ()
+
+    async def start(self, deliver):
+        pass
+
+    async def close(self):
+        pass
+
+    async def subscribe(self, username: str):
+        pass
+
+    async def unsubscribe(self, username: str):
+        pass
+
+    async def publish(self, username: str, payload: dict):
+        return False
+
+# Redis pub/sub bus: each node subscribes to the channels of users connected to it.
+# A lost connection is restored in the background and every channel subscribed again.
+class RedisBus:
+    def __init__(self, url: str, prefix: str = WS_CHANNEL_PREFIX):
+        self.url = url
+        self.prefix = prefix
+        self.node_channel = f"{prefix}#node:{uuid.uuid4()}"
+        self.errors = (OSError,)
+        self.reconnects = 0
+        self._redis = None
+        self._pubsub = None
+        self._reader = None
+        self._users = set()
+
+    async def start(self, deliver):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self.errors = (RedisError, OSError)
+        self._redis = redis.from_url(self.url, decode_responses=True)
+        await self._connect()
+        self._reader = asyncio.create_task(self._read(deliver))
+
+    # Fresh pubsub connection subscribed to the node channel (keeps it subscribed
+    # while no users are connected) and to every local user
+    async def _connect(self):
+        if self._pubsub:
+            await self._pubsub.aclose()
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.node_channel, *(f"{self.prefix}{username}" for username in self._users))
+
+    async def close(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub:
+            await self._pubsub.aclose()
+        if self._redis:
+            await self._redis.aclose()
+
+    async def _read(self, deliver):
+        delay = WS_BUS_RECONNECT_MIN
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    delay = WS_BUS_RECONNECT_MIN
+                    if message["type"] != "message" or message["channel"] == self.node_channel:
+                        continue
+                    username = message["channel"][len(self.prefix):]
+                    try:
+                        await deliver(username, json.loads(message["data"]))
+                    except Exception as e:
+                        print(f"Failed to deliver bus message to {username}: {e}")
+                # listen() only returns when the pubsub has no subscriptions left
+                await self._connect()
+            except self.errors as e:
+                print(f"Bus connection lost, reconnecting in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, WS_BUS_RECONNECT_MAX)
+                try:
+                    await self._connect()
+                    self.reconnects += 1
+                except self.errors as e:
+                    print(f"Bus reconnect failed: {e}")
+
+    # The user is remembered even if Redis is down, the reconnect subscribes it
+    async def subscribe(self, username: str):
+        self._users.add(username)
+        try:
+            await self._pubsub.subscribe(f"{self.prefix}{username}")
+        except self.errors as e:
+            print(f"Bus subscribe for {username} failed: {e}")
+
+    async def unsubscribe(self, username: str):
+        self._users.discard(username)
+        try:
+            await self._pubsub.unsubscribe(f"{self.prefix}{username}")
+        except self.errors as e:
+            print(f"Bus unsubscribe for {username} failed: {e}")
+
+    # True when at least one node holds a socket for the user
+    async def publish(self, username: str, payload: dict):
+        receivers = await self._redis.publish(f"{self.prefix}{username}", json.dumps(payload))
+        return receivers > 0
+
+# Connections held by this process, everything else goes through the bus
+class ConnectionRegistry:
+    def __init__(self, bus):
+        self.bus = bus
+        self.connections = {}
+
+    async def start(self):
+        await self.bus.start(self._deliver_local)
+
+    async def close(self):
+        await self.bus.close()
+
+    async def register(self, connection):
+        self.connections[connection.username] = connection
+        await self.bus.subscribe(connection.username)
+
+    async def unregister(self, connection):
+        # A newer connection of the same user may have replaced this one
+        if self.connections.get(connection.username) is not connection:
+            return
+        self.connections.pop(connection.username, None)
+        await self.bus.unsubscribe(connection.username)
+
+    # Deliver to the user's socket wherever it lives, False if the user is offline
+    # or the bus is down (the message is still stored and shows up in history)
+    async def send(self, username: str, payload: dict):
+        if username in self.connections:
+            return await self._deliver_local(username, payload)
+        try:
+            return await self.bus.publish(username, payload)
+        except self.bus.errors as e:
+            print(f"Bus publish to {username} failed: {e}")
+            return False
+
+    # Only enqueues, the connection's writer task does the socket I/O
+    async def _deliver_local(self, username: str, payload: dict):
+        connection = self.connections.get(username)
+        if connection is None:
+            return False
+        return connection.send(payload)
+
+    # Outbound queue depth per local connection
+    def queue_depths(self):
+        return {username: connection.depth for username, connection in self.connections.items()}
+
+def create_registry():
+    if WS_BUS_BACKEND == "redis":
+        return ConnectionRegistry(RedisBus(REDIS_URL))
+    return ConnectionRegistry(InProcessBus())
+
+registry = create_registry()
@@ -0,0 +1,118 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+from fastapi import WebSocket
+
+load_dotenv()
+
+# Bounded outbound buffer of DM frames per socket and what to do when a slow client fills it:
+# "drop" discards the frame, "disconnect" closes the socket, "resync" discards it too (DMs are
+# persisted before they are acked) and sends a resync frame once the client catches up, so it
+# refetches the conversation. Control frames (acks, errors, resync) are never discarded: they
+# get WS_OUTBOUND_QUEUE_SIZE frames of their own and a client that lets those fill up is disconnected.
+WS_OUTBOUND_QUEUE_SIZE = int(os.getenv("WS_OUTBOUND_QUEUE_SIZE", "256"))
+WS_OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "resync").lower()
+
+# Close code for clients disconnected because they can't keep up
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Frames the overflow policy applies to, everything else is a control frame
+DM_FRAME = "dm"
+
+# Process-wide outbound counters
+class OutboundMetrics:
+    def __init__(self):
+        self.sent = 0
+        self.dropped = 0
+        self.resynced = 0
+        self.disconnected = 0
+
+metrics = OutboundMetrics()
+
+# Close tasks of disconnected slow consumers, kept until they finish
+closing_tasks = set()
+
+# A client socket with its own queue and writer task, so a stalled client
+# never blocks the loops of the users sending to it
+class ClientConnection:
+    def __init__(self, websocket: WebSocket, username: str):
+        self.websocket = websocket
+        self.username = username
+        # Bounds are enforced per frame kind in send
+        self.queue = asyncio.Queue()
+        self.queued_dms = 0
+        self.missed = 0
+        self.closed = False
+        self._writer = None
+
+    def start(self):
+        self._writer = asyncio.create_task(self._drain())
+
+    # Queue a frame without waiting, False if the frame won't reach the client
+    def send(self, frame: dict):
+        if self.closed:
+            return False
+        if frame.get("type") == DM_FRAME:
+            if self.queued_dms >= WS_OUTBOUND_QUEUE_SIZE:
+                return self._overflow()
+            self.queued_dms += 1
+        elif self.queue.qsize() - self.queued_dms >= WS_OUTBOUND_QUEUE_SIZE:
+            self._disconnect()
+            return False
+        self.queue.put_nowait(frame)
+        return True
+
+    def _overflow(self):
+        if WS_OVERFLOW_POLICY == "disconnect":
+            self._disconnect()
+            return False
+        if WS_OVERFLOW_POLICY == "resync":
+            metrics.resynced += 1
+            self.missed += 1
+            return True
+        metrics.dropped += 1
+        return False
+
+    def _disconnect(self):
+        metrics.disconnected += 1
+        self.closed = True
+        task = asyncio.create_task(self.close(code=SLOW_CONSUMER_CLOSE_CODE))
+        closing_tasks.add(task)
+        task.add_done_callback(closing_tasks.discard)
+
+    async def _drain(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                if frame.get("type") == DM_FRAME:
+                    self.queued_dms -= 1
+                await self.websocket.send_json(frame)
+                metrics.sent += 1
+                if self.missed and not self.queued_dms:
+                    missed, self.missed = self.missed, 0
+                    await self.websocket.send_json({"type": "resync", "missed": missed})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket went away, the receive loop cleans up
+            self.closed = True
+
+    async def close(self, code: int = 1000):
+        if self.closed and self._writer is None:
+            return
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
@@ -0,0 +1,16 @@
+from snapper_common.aws import lazy_resource, lazy_table
+from snapper_common.storage import AsyncStorage, StorageTimeoutError, run_storage
+
+# Shared boto3 resource, built on first use (see snapper_common.aws)
+dynamodb = lazy_resource("dynamodb")
+
+# Tables are owned (and created) by message_service and user/auth service,
+# the WS service writes DMs directly and checks recipients without HTTP hops.
+# Inbox rows are updated through snapper_common.inbox.
+messages_table_name = "Messages"
+messages_table = lazy_table(messages_table_name)
+users_table = lazy_table("Users")
+
+dynamodb_store = AsyncStorage(dynamodb)
+messages_store = AsyncStorage(messages_table)
+users_store = AsyncStorage(users_table)
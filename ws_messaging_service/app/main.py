@@ -1,9 +1,41 @@
 from fastapi import FastAPI
 from routes import messaging
+from contextlib import asynccontextmanager
+from snapper_common.http_client import http_client
+from bus import registry
+from persistence import message_writer
+from connection import metrics, WS_OUTBOUND_QUEUE_SIZE, WS_OVERFLOW_POLICY
 
-app = FastAPI()
+# Open shared resources on startup and release them on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_client.start()
+    await registry.start()
+    await message_writer.start()
+    yield
+    await message_writer.close()
+    await registry.close()
+    await http_client.close()
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(messaging.router, tags=["Messaging"])
 
 @app.get("/")
 async def root():
     return {"message": "WS Service Running"}
+
+# Outbound queue metrics of this process
+@app.get("/metrics")
+async def get_metrics():
+    depths = registry.queue_depths()
+    return {
+        "connections": len(depths),
+        "queued_frames": sum(depths.values()),
+        "max_queue_depth": max(depths.values(), default=0),
+        "queue_capacity": WS_OUTBOUND_QUEUE_SIZE,
+        "overflow_policy": WS_OVERFLOW_POLICY,
+        "sent": metrics.sent,
+        "dropped": metrics.dropped,
+        "resynced": metrics.resynced,
+        "disconnected": metrics.disconnected
+    }
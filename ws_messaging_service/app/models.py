@@ -1,6 +1,13 @@
-from pydantic import BaseModel
+import os
+from dotenv import load_dotenv
+from pydantic import BaseModel, Field
+
+load_dotenv()
+
+# Longest DM accepted over the socket, keeps every message well inside DynamoDB's item limit
+WS_MAX_CONTENT_LENGTH = int(os.getenv("WS_MAX_CONTENT_LENGTH", "4000"))
 
 class DMMessage(BaseModel):
     type: str
     to: str
-    content: str
+    content: str = Field(..., min_length=1, max_length=WS_MAX_CONTENT_LENGTH)
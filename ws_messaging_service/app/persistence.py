@@ -0,0 +1,168 @@
+import os
+import uuid
+import random
+import asyncio
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from botocore.exceptions import ClientError
+from database import dynamodb_store, messages_store, messages_table_name, StorageTimeoutError
+from snapper_common.inbox import record_message
+
+load_dotenv()
+
+# DMs are grouped into BatchWriteItem calls of up to 25 items over short windows
+WS_BATCH_SIZE = min(int(os.getenv("WS_BATCH_SIZE", "25")), 25)
+WS_BATCH_WINDOW_MS = float(os.getenv("WS_BATCH_WINDOW_MS", "10"))
+WS_BATCH_RETRIES = int(os.getenv("WS_BATCH_RETRIES", "5"))
+WS_BATCH_CONCURRENCY = int(os.getenv("WS_BATCH_CONCURRENCY", "8"))
+WS_MESSAGE_TTL = int(os.getenv("WS_MESSAGE_TTL", "86400"))
+
+# Same item layout as message_service create_message
+def build_message(sender: str, recipient: str, content: str):
+    now = datetime.utcnow()
+    return {
+        "conversation_id": "#".join(sorted([sender, recipient])),
+        "created_at": now.isoformat(),
+        "message_id": str(uuid.uuid4()),
+        "sender": sender,
+        "recipient": recipient,
+        "content": content,
+        "expires_at": int((now + timedelta(seconds=WS_MESSAGE_TTL)).timestamp())
+    }
+
+def _is_validation_error(error: ClientError):
+    return error.response["Error"]["Code"] == "ValidationException"
+
+def _message_key(item: dict):
+    return item["conversation_id"], item["created_at"]
+
+# submit() while the writer is not running, the message would never be written
+class WriterClosed(RuntimeError):
+    pass
+
+# Collects messages from every connection and persists them in batches.
+# submit() returns a future that resolves once the message is stored.
+class MessageWriter:
+    def __init__(self):
+        self._queue = None
+        self._task = None
+        self._flushes = set()
+        self._flush_slots = None
+        self._keys = set()
+        self._accepting = False
+
+    async def start(self):
+        self._accepting = True
+        self._queue = asyncio.Queue()
+        self._flush_slots = asyncio.Semaphore(WS_BATCH_CONCURRENCY)
+        self._task = asyncio.create_task(self._run())
+
+    # Stop accepting work and wait for queued and in-flight batches
+    async def close(self):
+        if self._task is None:
+            return
+        self._accepting = False
+        await self._queue.put(None)
+        await self._task
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        self._task = None
+
+    # The item's key is final when this returns, so it can be delivered live right after.
+    # BatchWriteItem rejects two items with the same key (messages of one conversation created
+    # in the same microsecond), a colliding message is moved 1µs apart from the queued ones.
+    def submit(self, item: dict):
+        future = asyncio.get_running_loop().create_future()
+        if not self._accepting:
+            future.set_exception(WriterClosed("Message writer is not running"))
+            return future
+        while _message_key(item) in self._keys:
+            created_at = datetime.fromisoformat(item["created_at"]) + timedelta(microseconds=1)
+            item["created_at"] = created_at.isoformat(timespec="microseconds")
+        self._keys.add(_message_key(item))
+        self._queue.put_nowait((item, future))
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            deadline = loop.time() + WS_BATCH_WINDOW_MS / 1000
+            while len(batch) < WS_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            await self._flush_slots.acquire()
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch):
+        try:
+            failed = await self._write([item for item, _ in batch])
+            error = RuntimeError("Message was not persisted")
+        except Exception as e:
+            failed = None
+            error = e
+        finally:
+            self._flush_slots.release()
+            self._keys.difference_update(_message_key(item) for item, _ in batch)
+
+        stored = []
+        for item, future in batch:
+            if failed is None or item["message_id"] in failed:
+                if not future.done():
+                    future.set_exception(error)
+            else:
+                stored.append(item)
+                if not future.done():
+                    future.set_result(True)
+
+        # Inbox rows are updated after the ack, a failure here never fails the message
+        results = await asyncio.gather(*(record_message(item) for item in stored), return_exceptions=True)
+        for item, result in zip(stored, results):
+            if isinstance(result, (ClientError, StorageTimeoutError)):
+                print(f"Inbox update failed for {item['message_id']}: {result}")
+
+    # Returns ids of messages that were never written. One invalid item fails a whole
+    # BatchWriteItem, the batch is then written item by item so only that message fails.
+    async def _write(self, items):
+        try:
+            return await self._write_batch(items)
+        except ClientError as e:
+            if not _is_validation_error(e):
+                raise
+
+        results = await asyncio.gather(*(messages_store.put_item(Item=item) for item in items), return_exceptions=True)
+        failed = set()
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                print(f"Failed to persist message {item['message_id']}: {result}")
+                failed.add(item["message_id"])
+        return failed
+
+    # BatchWriteItem with jittered retries
+    async def _write_batch(self, items):
+        request = {messages_table_name: [{"PutRequest": {"Item": item}} for item in items]}
+        for attempt in range(WS_BATCH_RETRIES + 1):
+            response = await dynamodb_store.batch_write_item(RequestItems=request)
+            request = response.get("UnprocessedItems") or {}
+            if not request:
+                return set()
+            await asyncio.sleep(random.uniform(0, 0.05 * (2 ** attempt)))
+        return {entry["PutRequest"]["Item"]["message_id"] for entry in request.get(messages_table_name, [])}
+
+message_writer = MessageWriter()
@@ -1,33 +1,41 @@
-import aiohttp
-import os
-from dotenv import load_dotenv
+import json
+import asyncio
+from botocore.exceptions import ClientError
+from pydantic import ValidationError
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
 from models import DMMessage
-
-load_dotenv()
-
-AUTH_PATH = os.getenv("AUTH_PATH")
-USERS_PATH = os.getenv("USER_PATH")
-MESSAGES_PATH = os.getenv("MESSAGES_PATH")
+from bus import registry
+from connection import ClientConnection
+from snapper_common.security import TokenVerifier
+from database import users_store, StorageTimeoutError
+from persistence import message_writer, build_message
 
 router = APIRouter()
 
-# In-memory connection manager
-connections = {}
+# Verifies tokens locally and caches recipient existence (AUTH_USER_CACHE_TTL)
+verifier = TokenVerifier(users_store)
 
-# Call auth service to verify user token
+# Background tasks waiting for persistence to confirm a message
+pending_acks = set()
+
+# Verify user token
 async def verify_token(token: str):
     if not token:
         raise HTTPException(status_code=401, detail="Missing token")
-    async with aiohttp.ClientSession() as session:
-        async with session.get(AUTH_PATH, headers={"Authorization": f"Bearer {token}"}) as resp:
-            if resp.status != 200:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return await resp.json()
+    return await verifier.verify(token)
+
+# Queue an ack once the message is stored, or an error frame if the write failed
+async def confirm_persisted(connection: ClientConnection, message_id: str, persisted: asyncio.Future):
+    try:
+        await persisted
+        connection.send({"type": "ack", "message_id": message_id})
+    except Exception as e:
+        print(f"Failed to persist message {message_id}: {e}")
+        connection.send({"type": "error", "detail": "Failed to save message", "message_id": message_id})
 
 # WS route that receives the message, checks if the user is sending a message to him/herself
 # and checks if the user exists the message is sent to
-# Calls the message service to save the message in the db
+# Delivers the message live and hands it to the batched writer to save it in the db
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     token = websocket.query_params.get("token")
@@ -48,74 +56,69 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     
     username = user["username"]
-    connections[username] = websocket
+    connection = ClientConnection(websocket, username)
+    connection.start()
+    await registry.register(connection)
     
-    await websocket.send_json({"type": "info", "detail": f"Connected as {username}"})
+    connection.send({"type": "info", "detail": f"Connected as {username}"})
     
     try:
         while True:
-            msg = await websocket.receive_json()
-            if msg.get("type") != "dm":
-                await websocket.send_json({"type": "error", "detail": "Invalid message type"})
+            try:
+                msg = json.loads(await websocket.receive_text())
+            except ValueError:
+                connection.send({"type": "error", "detail": "Invalid JSON"})
+                continue
+            if not isinstance(msg, dict) or msg.get("type") != "dm":
+                connection.send({"type": "error", "detail": "Invalid message type"})
                 continue
             
-            dm = DMMessage(**msg)
+            try:
+                dm = DMMessage(**msg)
+            except ValidationError:
+                connection.send({"type": "error", "detail": "Invalid message"})
+                continue
             
             if dm.to == username:
-                await websocket.send_json({
+                connection.send({
                     "type": "error",
                     "detail": "Cannot send a message to yourself"
                 })
                 continue
             
-            async with aiohttp.ClientSession() as session:
-                resp = await session.get(
-                    f"{USERS_PATH}/{dm.to}",
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-                if resp.status == 404:
-                    await websocket.send_json({
-                        "type": "error",
-                        "detail": f"Recipient '{dm.to}' does not exist"
-                    })
-                    continue
-                elif resp.status != 200:
-                    await websocket.send_json({
-                        "type": "error",
-                        "detail": "Failed to validate recipient"
-                    })
-                    continue
-                
-            async with aiohttp.ClientSession() as session:
-                resp = await session.post(
-                    MESSAGES_PATH,
-                    json={"to": dm.to, "content": dm.content},
-                    headers={"Authorization": f"Bearer {token}"}
-                )
-                if resp.status != 200:
-                    try:
-                        error = await resp.json()
-                    except Exception:
-                        error = {"detail": await resp.text()}
-                    await websocket.send_json({
-                        "type": "error",
-                        "detail": error.get("detail", "Failed to save message")
-                    })
-                    continue
-                
-                saved_message = await resp.json()
-                
-            if dm.to in connections:
-                await connections[dm.to].send_json({
-                    "type": "dm",
-                    "from": username,
-                    "content": dm.content,
-                    "message_id": saved_message["message_id"],
-                    "created_at": saved_message["created_at"]
+            try:
+                recipient = await verifier.load_user(dm.to)
+            except (ClientError, StorageTimeoutError):
+                connection.send({
+                    "type": "error",
+                    "detail": "Failed to validate recipient"
                 })
-                
-            await websocket.send_json({"type": "ack", "message_id": saved_message["message_id"]})
+                continue
+            if not recipient:
+                connection.send({
+                    "type": "error",
+                    "detail": f"Recipient '{dm.to}' does not exist"
+                })
+                continue
+            
+            # Deliver live first, persistence is confirmed by a separate ack.
+            # submit() settles the stored key, the live frame carries the same created_at.
+            message = build_message(username, dm.to, dm.content)
+            persisted = message_writer.submit(message)
+            
+            await registry.send(dm.to, {
+                "type": "dm",
+                "from": username,
+                "content": dm.content,
+                "message_id": message["message_id"],
+                "created_at": message["created_at"]
+            })
+            
+            task = asyncio.create_task(confirm_persisted(connection, message["message_id"], persisted))
+            pending_acks.add(task)
+            task.add_done_callback(pending_acks.discard)
     except WebSocketDisconnect:
         pass
     finally:
-        connections.pop(username, None)
+        await registry.unregister(connection)
+        await connection.close()
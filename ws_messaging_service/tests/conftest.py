@@ -0,0 +1,30 @@
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(os.path.dirname(TESTS_DIR)))
+sys.path.insert(0, os.path.join(os.path.dirname(TESTS_DIR), "app"))
+
+from snapper_common.testing import aws  # noqa: F401
+import pytest
+from snapper_common.dynamo import TableSchema, create_tables
+from snapper_common.inbox import inbox_schema
+from snapper_common.users import users_schema
+from database import messages_table_name
+
+# Same layout as message_service's Messages table, which creates it in a deployment
+messages_schema = TableSchema(
+    TableName=messages_table_name,
+    KeySchema=[
+        {"AttributeName": "conversation_id", "KeyType": "HASH"},
+        {"AttributeName": "created_at", "KeyType": "RANGE"}
+    ],
+    AttributeDefinitions=[
+        {"AttributeName": "conversation_id", "AttributeType": "S"},
+        {"AttributeName": "created_at", "AttributeType": "S"},
+    ]
+)
+
+@pytest.fixture(autouse=True)
+def tables(aws):
+    create_tables(messages_schema, inbox_schema, users_schema)
@@ -0,0 +1,95 @@
+import json
+import asyncio
+import pytest
+import redis.asyncio
+from redis.exceptions import ConnectionError
+import bus
+from bus import RedisBus, ConnectionRegistry
+
+# Minimal stand-in for redis.asyncio pub/sub: each listen() replays one scripted session
+class FakePubSub:
+    def __init__(self, server):
+        self.server = server
+        self.channels = set()
+
+    async def subscribe(self, *channels):
+        if self.server.down:
+            raise ConnectionError("connection refused")
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+
+    async def listen(self):
+        session = self.server.sessions.pop(0) if self.server.sessions else []
+        for event in session:
+            if isinstance(event, Exception):
+                raise event
+            yield event
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        pass
+
+class FakeRedis:
+    def __init__(self):
+        self.sessions = []
+        self.pubsubs = []
+        self.down = False
+
+    def pubsub(self):
+        self.pubsubs.append(FakePubSub(self))
+        return self.pubsubs[-1]
+
+    async def publish(self, channel, data):
+        if self.down:
+            raise ConnectionError("connection refused")
+        return 1
+
+    async def aclose(self):
+        pass
+
+@pytest.fixture
+def server(monkeypatch):
+    server = FakeRedis()
+    monkeypatch.setattr(redis.asyncio, "from_url", lambda url, **kwargs: server)
+    monkeypatch.setattr(bus, "WS_BUS_RECONNECT_MIN", 0.01)
+    return server
+
+def dm(channel, payload):
+    return {"type": "message", "channel": channel, "data": json.dumps(payload)}
+
+def test_reader_reconnects_and_resubscribes(server):
+    delivered = []
+
+    async def deliver(username, payload):
+        delivered.append((username, payload))
+
+    async def scenario():
+        redis_bus = RedisBus("redis://test", prefix="ws:")
+        server.sessions = [[ConnectionError("reset by peer")], [dm("ws:bob", {"n": 1})]]
+        await redis_bus.start(deliver)
+        await redis_bus.subscribe("bob")
+        await redis_bus.subscribe("carol")
+        for _ in range(100):
+            if delivered:
+                break
+            await asyncio.sleep(0.01)
+        await redis_bus.close()
+        return redis_bus
+
+    redis_bus = asyncio.run(scenario())
+    assert delivered == [("bob", {"n": 1})]
+    assert redis_bus.reconnects == 1
+    assert server.pubsubs[-1].channels == {redis_bus.node_channel, "ws:bob", "ws:carol"}
+
+def test_publish_failure_reports_offline(server):
+    async def scenario():
+        registry = ConnectionRegistry(RedisBus("redis://test"))
+        await registry.start()
+        server.down = True
+        sent = await registry.send("bob", {"type": "dm"})
+        await registry.close()
+        return sent
+
+    assert asyncio.run(scenario()) is False
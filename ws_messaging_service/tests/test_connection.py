@@ -0,0 +1,113 @@
+import asyncio
+import pytest
+import connection
+from connection import ClientConnection, OutboundMetrics, SLOW_CONSUMER_CLOSE_CODE, closing_tasks
+
+# WebSocket stand-in whose sends block until the test releases them
+class SlowSocket:
+    def __init__(self):
+        self.frames = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+
+    async def send_json(self, frame):
+        await self.gate.wait()
+        self.frames.append(frame)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+@pytest.fixture(autouse=True)
+def small_queue(monkeypatch):
+    monkeypatch.setattr(connection, "WS_OUTBOUND_QUEUE_SIZE", 2)
+    monkeypatch.setattr(connection, "metrics", OutboundMetrics())
+
+def dm(n):
+    return {"type": "dm", "n": n}
+
+async def flood(policy, monkeypatch, frames=5):
+    monkeypatch.setattr(connection, "WS_OVERFLOW_POLICY", policy)
+    socket = SlowSocket()
+    conn = ClientConnection(socket, "bob")
+    conn.start()
+    # The writer holds the first frame while the socket is stalled, the queue takes two more
+    accepted = [conn.send(dm(0))]
+    await asyncio.sleep(0.01)
+    accepted += [conn.send(dm(i)) for i in range(1, frames)]
+    socket.gate.set()
+    for _ in range(100):
+        if conn.closed or (conn.queue.empty() and not conn.missed):
+            break
+        await asyncio.sleep(0.01)
+    await conn.close()
+    return socket, accepted
+
+def test_stalled_client_never_blocks_the_sender(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(connection, "WS_OVERFLOW_POLICY", "drop")
+        conn = ClientConnection(SlowSocket(), "bob")
+        conn.start()
+        await asyncio.sleep(0.01)
+        # send() never awaits, so a socket that never drains can't hold up the caller
+        results = [conn.send(dm(i)) for i in range(50)]
+        await conn.close()
+        return results
+
+    results = asyncio.run(scenario())
+    assert results.count(True) <= 3
+    assert connection.metrics.dropped == 50 - results.count(True)
+
+def test_drop_policy_discards_overflow(monkeypatch):
+    socket, accepted = asyncio.run(flood("drop", monkeypatch))
+    assert accepted == [True, True, True, False, False]
+    assert socket.frames == [dm(0), dm(1), dm(2)]
+    assert connection.metrics.dropped == 2
+    assert connection.metrics.sent == 3
+
+def test_resync_policy_sends_resync_once_caught_up(monkeypatch):
+    socket, accepted = asyncio.run(flood("resync", monkeypatch))
+    assert accepted == [True] * 5
+    assert socket.frames == [dm(0), dm(1), dm(2), {"type": "resync", "missed": 2}]
+    assert connection.metrics.resynced == 2
+
+def test_disconnect_policy_closes_slow_consumer(monkeypatch):
+    socket, accepted = asyncio.run(flood("disconnect", monkeypatch))
+    assert accepted[:3] == [True, True, True]
+    assert accepted[3] is False
+    assert socket.closed_with == SLOW_CONSUMER_CLOSE_CODE
+    assert connection.metrics.disconnected >= 1
+
+def test_control_frames_are_delivered_past_a_full_dm_queue(monkeypatch):
+    async def scenario():
+        monkeypatch.setattr(connection, "WS_OVERFLOW_POLICY", "drop")
+        socket = SlowSocket()
+        conn = ClientConnection(socket, "bob")
+        conn.start()
+        dms = [conn.send(dm(i)) for i in range(3)]
+        acks = [conn.send({"type": "ack", "message_id": "m1"}), conn.send({"type": "error", "detail": "x"})]
+        socket.gate.set()
+        await asyncio.sleep(0.05)
+        await conn.close()
+        return socket, dms, acks
+
+    socket, dms, acks = asyncio.run(scenario())
+    assert dms == [True, True, False]
+    assert acks == [True, True]
+    assert socket.frames[-2:] == [{"type": "ack", "message_id": "m1"}, {"type": "error", "detail": "x"}]
+
+def test_control_backlog_disconnects_instead_of_dropping(monkeypatch):
+    async def scenario():
+        socket = SlowSocket()
+        conn = ClientConnection(socket, "bob")
+        conn.start()
+        # The writer holds the first ack while the socket is stalled
+        results = [conn.send({"type": "ack", "message_id": "0"})]
+        await asyncio.sleep(0.01)
+        results += [conn.send({"type": "ack", "message_id": str(i)}) for i in range(1, 4)]
+        assert closing_tasks
+        await asyncio.gather(*closing_tasks)
+        return socket, results
+
+    socket, results = asyncio.run(scenario())
+    assert results == [True, True, True, False]
+    assert socket.closed_with == SLOW_CONSUMER_CLOSE_CODE
@@ -0,0 +1,24 @@
+from fastapi.testclient import TestClient
+from snapper_common.testing import make_token
+from database import users_table
+from models import WS_MAX_CONTENT_LENGTH
+
+def test_invalid_dm_keeps_the_socket_open():
+    from main import app
+    users_table.put_item(Item={"username": "alice", "email": "alice@example.com"})
+
+    with TestClient(app) as client:
+        with client.websocket_connect(f"/ws?token={make_token('alice')}") as socket:
+            assert socket.receive_json()["type"] == "info"
+
+            socket.send_json({"type": "dm", "to": "bob", "content": "x" * (WS_MAX_CONTENT_LENGTH + 1)})
+            assert socket.receive_json() == {"type": "error", "detail": "Invalid message"}
+
+            socket.send_text("{not json")
+            assert socket.receive_json() == {"type": "error", "detail": "Invalid JSON"}
+
+            socket.send_json(["dm", "bob"])
+            assert socket.receive_json() == {"type": "error", "detail": "Invalid message type"}
+
+            socket.send_json({"type": "dm", "to": "alice", "content": "hi"})
+            assert socket.receive_json()["detail"] == "Cannot send a message to yourself"
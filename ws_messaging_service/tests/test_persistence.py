@@ -0,0 +1,47 @@
+import asyncio
+from boto3.dynamodb.conditions import Key
+from database import messages_table
+import pytest
+from persistence import MessageWriter, WriterClosed, build_message
+
+def persist(items):
+    async def scenario():
+        writer = MessageWriter()
+        await writer.start()
+        futures = [writer.submit(item) for item in items]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        await writer.close()
+        return results
+    return asyncio.run(scenario())
+
+def stored(conversation_id):
+    return messages_table.query(KeyConditionExpression=Key("conversation_id").eq(conversation_id))["Items"]
+
+def test_same_timestamp_messages_are_all_stored():
+    first = build_message("alice", "bob", "one")
+    second = {**build_message("bob", "alice", "two"), "created_at": first["created_at"]}
+
+    assert persist([first, second]) == [True, True]
+    # Keys were settled at submit, the items (and any live frame built from them) match storage
+    assert {item["created_at"] for item in stored("alice#bob")} == {first["created_at"], second["created_at"]}
+    assert first["created_at"] != second["created_at"]
+    assert sorted(item["content"] for item in stored("alice#bob")) == ["one", "two"]
+
+def test_invalid_item_fails_alone():
+    good = build_message("alice", "bob", "fine")
+    too_big = build_message("carol", "dave", "x" * 500_000)
+
+    results = persist([good, too_big])
+    assert results[0] is True
+    assert isinstance(results[1], RuntimeError)
+    assert [item["content"] for item in stored("alice#bob")] == ["fine"]
+
+def test_submit_after_close_fails_instead_of_hanging():
+    async def scenario():
+        writer = MessageWriter()
+        await writer.start()
+        await writer.close()
+        return await asyncio.wait_for(writer.submit(build_message("alice", "bob", "late")), 1)
+
+    with pytest.raises(WriterClosed):
+        asyncio.run(scenario())